@@ -1,168 +1,435 @@
-import logging, math, time, threading
+import contextvars, hashlib, json, logging, math, os, queue, time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 import pytz
-from flask import Flask, render_template, request, url_for, redirect, jsonify
+from flask import Flask, Response, render_template, request, url_for, redirect, jsonify, stream_with_context
 
-from railway_app_v2.fetchers.erail import ErailFetcher
-from railway_app_v2.fetchers.overpass import OverpassFetcher
+from railway_app_v2.config import Config, ConfigWatcher
+from railway_app_v2.logsetup import configure_logging
+from railway_app_v2.cache import CacheEntry, KeyedTTLCache
+from railway_app_v2.scheduler import RefreshScheduler
+from railway_app_v2.utils import dedupe_by_proximity, km_to_minutes, minutes
+from railway_app_v2.main import create_fetcher
+from railway_app_v2.fetchers.overpass import OverpassFetcher, crossing_point, crossing_tiles, reprofile_cached_crossings
+from railway_app_v2.spatial import PointRTree, parse_bbox, parse_floats, radius_bbox, to_geojson
+from railway_app_v2.tiles import TilesUnavailable
+from railway_app_v2.route import RouteETAEngine, SectionGeometry
+from railway_app_v2.assets import IMMUTABLE_CACHE_CONTROL, StaticAssetPipeline
+from railway_app_v2.prerender import StaticSite
+from railway_app_v2.predictor import DelayPredictor
+from railway_app_v2.pipeline import ingest, merge, take
+from railway_app_v2.search import TrainIndex
+from railway_app_v2.alerts import AlertManager
+from railway_app_v2.ratelimit import Priority, UpstreamBudgetExceeded, upstream_priority
+from railway_app_v2.snapshot import (MSGPACK, SCHEMAS, TrainSnapshot, encode_envelope, encode_rows, format_cursor,
+                                     negotiate, parse_cursor, train_to_dict)
+from railway_app_v2.export import TRAIN_FIELDS, csv_lines, iter_window, ndjson_lines, parse_time_param, train_row
 
 app = Flask(__name__, static_folder='static', template_folder='templates')
-logging.basicConfig(level=logging.INFO)
+configure_logging()  # Queue-backed; request threads never write log output themselves
+logger = logging.getLogger(__name__)
 
-# Simple in-memory cache with hybrid refresh
+# Content-hashed, precompressed static files served with immutable caching
+static_assets = StaticAssetPipeline(app.static_folder)
+static_assets.init_app(app)
+
+# Per-station train cache: one TTL entry per station code in a bounded LRU,
+# with concurrent misses for the same station coalesced into one fetch
+TRAIN_CACHE = KeyedTTLCache(max_entries=Config.CACHE_MAX_ENTRIES,
+                            ttl_secs=Config.TRAIN_CACHE_TTL_SECS,
+                            name="trains")
+
+# Hybrid refresh bookkeeping
 TRAIN_DATA_CACHE = {
-    'data': None,
-    'timestamp': None,
-    'ttl_minutes': 2,  # Cache for 2 minutes
-    'last_user_activity': None,
-    'background_refresh_active': False
+    'ttl_minutes': Config.TRAIN_CACHE_TTL_SECS / 60,
+    'last_user_activity': {},  # station code -> last request time
 }
 
 # Background refresh settings
-BACKGROUND_REFRESH_INTERVAL = 90  # seconds
 USER_ACTIVITY_TIMEOUT = 300  # 5 minutes
+REFRESH_LEAD_SECS = 10  # Refresh this long before TTL expiry / next train passing
+MIN_REFRESH_SPACING_SECS = 30  # Never refresh one station more often than this
+REFRESH_RETRY_SECS = 30  # Retry delay after a failed background refresh
+CLIENT_MIN_POLL_SECS = 5  # Floor for the max-age / X-Next-Refresh hints sent to pollers
+CLIENT_POLL_GRACE_SECS = 2  # Let a due refresh land before clients come back for it
 
 PAGE_SIZE = 10
+RANGE_MAX_LIMIT = 500  # Most trains one /api/trains?from=&to= slice returns
+RANGE_PARAMS = ("from", "to", "limit", "cursor")
+BATCH_MAX_QUERIES = 50  # Most station / crossing queries one /api/batch request may carry
+
 
+def upcoming_trains(snapshot, now=None):
+    """Drop trains that have already passed from the head of a sorted snapshot."""
+    start = snapshot.upcoming_start(now)
+    return snapshot.trains[start:] if start else snapshot.trains
 
-def is_cache_valid():
-    """Check if cached data is still valid."""
-    if not TRAIN_DATA_CACHE['timestamp'] or not TRAIN_DATA_CACHE['data']:
+
+def is_cache_valid(entry):
+    """Check if a cached train entry is still valid."""
+    if entry is None or not entry.value:
         return False
     
-    ist = pytz.timezone('Asia/Kolkata')
-    now = datetime.now(ist)
-    
-    cache_age = now - TRAIN_DATA_CACHE['timestamp']
-    if cache_age.total_seconds() >= (TRAIN_DATA_CACHE['ttl_minutes'] * 60):
+    if not TRAIN_CACHE.is_fresh(entry):
         return False
     
-    # Invalidate cache if next train has passed
-    next_train = TRAIN_DATA_CACHE['data'][0] if TRAIN_DATA_CACHE['data'] else None
-    if next_train and next_train.eta_at_crossing < now:
-        logging.info(f"Invalidating cache because next train {next_train.train_no} has passed (ETA: {next_train.eta_at_crossing}, Now: {now})")
+    # Passed trains are trimmed on read; only a snapshot with nothing left is a miss
+    if entry.value.upcoming_start() == len(entry.value):
+        logger.info("Invalidating cache because every cached train has passed",
+                    extra={"station": entry.value.station_code, "throttle": 60})
         return False
     
     return True
 
 
-def record_user_activity():
-    """Record that a user is actively using the app."""
-    TRAIN_DATA_CACHE['last_user_activity'] = datetime.now()
-    if not TRAIN_DATA_CACHE['background_refresh_active']:
+def next_refresh_deadline(entry):
+    """
+    When a station's snapshot should be refreshed: just before its TTL runs
+    out or just before the next train passes the crossing, whichever is
+    first, but no sooner than MIN_REFRESH_SPACING_SECS from now.
+    """
+    now = time.time()
+    deadline = entry.timestamp + TRAIN_CACHE.ttl_secs - REFRESH_LEAD_SECS
+    for train in entry.value.trains:
+        eta = train.eta_at_crossing.timestamp()
+        if eta > now + REFRESH_LEAD_SECS:
+            deadline = min(deadline, eta - REFRESH_LEAD_SECS)
+            break
+    return max(deadline, now + MIN_REFRESH_SPACING_SECS)
+
+
+def next_change_at(entry, start):
+    """
+    Earliest time a station's /api/trains body can change: its next
+    scheduled refresh (or cache expiry if none is pending) or the next
+    train passing the crossing, whichever is first.
+    """
+    snapshot = entry.value
+    change = refresh_scheduler.deadline(snapshot.station_code) or entry.timestamp + TRAIN_CACHE.ttl_secs
+    if start < len(snapshot):
+        change = min(change, snapshot.trains[start].eta_at_crossing.timestamp())
+    return change
+
+
+def record_user_activity(station_code=Config.STATION_CODE):
+    """Record that a user is actively viewing a station."""
+    TRAIN_DATA_CACHE['last_user_activity'][station_code] = time.time()
+    if not refresh_scheduler.running:
         start_background_refresh()
+    if refresh_scheduler.deadline(station_code) is None:
+        entry = TRAIN_CACHE.peek(station_code)
+        if entry is not None:
+            refresh_scheduler.schedule(station_code, next_refresh_deadline(entry))
 
 
-def is_user_active():
-    """Check if users have been active recently."""
-    if not TRAIN_DATA_CACHE['last_user_activity']:
-        return False
-    
-    inactive_time = datetime.now() - TRAIN_DATA_CACHE['last_user_activity']
-    return inactive_time.total_seconds() < USER_ACTIVITY_TIMEOUT
+def active_stations():
+    """Station codes users have viewed recently or hold gate alert subscriptions for."""
+    cutoff = time.time() - USER_ACTIVITY_TIMEOUT
+    viewed = [code for code, seen in list(TRAIN_DATA_CACHE['last_user_activity'].items()) if seen >= cutoff]
+    return viewed + [code for code in alert_manager.stations() if code not in viewed]
 
 
-def fetch_fresh_train_data():
-    """Fetch fresh train data from Erail."""
-    logging.info("Fetching fresh train data from Erail")
-    erail = ErailFetcher()
-    all_trains = erail.fetch("VN", 100) or []
-    all_trains = sorted(all_trains, key=lambda t: getattr(t, "eta_at_crossing", None) or 9e18)
-    
-    # Update cache
-    TRAIN_DATA_CACHE['data'] = all_trains
-    TRAIN_DATA_CACHE['timestamp'] = datetime.now(pytz.timezone('Asia/Kolkata'))
-    
-    return all_trains
+def is_user_active(station_code=None):
+    """Check if users have been active recently (for one station, or any)."""
+    stations = active_stations()
+    return station_code in stations if station_code else bool(stations)
 
 
-def background_refresh_worker():
-    """Background worker that refreshes data when users are active."""
-    while TRAIN_DATA_CACHE['background_refresh_active']:
-        try:
-            if is_user_active():
-                # Refresh data proactively if cache is getting stale
-                cache_age = 0
-                if TRAIN_DATA_CACHE['timestamp']:
-                    cache_age = (datetime.now() - TRAIN_DATA_CACHE['timestamp']).total_seconds()
-                
-                if cache_age > 60:  # Refresh if data is older than 1 minute
-                    logging.info("Background refresh: updating train data")
-                    fetch_fresh_train_data()
-            else:
-                # Stop background refresh if no users are active
-                logging.info("No active users, stopping background refresh")
-                TRAIN_DATA_CACHE['background_refresh_active'] = False
-                break
-                
-        except Exception as e:
-            logging.error(f"Background refresh error: {e}")
-        
-        time.sleep(BACKGROUND_REFRESH_INTERVAL)
+# Train data source (Erail unless DATA_SOURCE selects simulate/replay/rapidapi)
+train_fetcher = create_fetcher()
+delay_predictor = DelayPredictor() if Config.PREDICT_DELAYS else None
+
+
+def fetch_fresh_train_data(station_code=Config.STATION_CODE):
+    """Fetch fresh train data for one station from the configured source."""
+    started = time.perf_counter()
+    hours = 100
+    now = datetime.now(pytz.timezone('Asia/Kolkata'))
+    # One lazy pass: out-of-window records are dropped before the single sort,
+    # then the rest are de-duplicated as they stream
+    records = train_fetcher.iter_fetch(station_code, hours)
+    trains = list(ingest([records], start=now, end=now + timedelta(hours=hours)))
+    logger.info("Fetched %d trains", len(trains),
+                extra={"station": station_code, "fetcher": Config.DATA_SOURCE.value,
+                       "duration_ms": round((time.perf_counter() - started) * 1000)})
+    return trains
+
+
+def load_station(station_code):
+    """Fetch a station's trains and schedule its next background refresh."""
+    trains = fetch_fresh_train_data(station_code)
+    if delay_predictor is not None:
+        # Learn from the raw ETAs, then shift timetable-only ones by the prediction
+        delay_predictor.observe_trains(station_code, trains)
+        trains = delay_predictor.apply(trains)
+    previous = TRAIN_CACHE.peek(station_code)
+    if previous is not None and previous.value.trains[previous.value.upcoming_start():] == trains:
+        # Same result: keep the old snapshot (and everything derived from it);
+        # only the cache entry's timestamp moves on
+        snapshot = previous.value
+        logger.debug("Trains unchanged for %s, keeping snapshot %d", station_code, snapshot.version)
+    else:
+        snapshot = TrainSnapshot(station_code, trains)
+    old_index = previous.value.cached("train_index") if previous else None
+    if old_index is not None and snapshot is not previous.value:
+        # This station is being searched: carry its index forward incrementally
+        snapshot.derived("train_index", lambda: TrainIndex.build(trains, old_index))
+    if is_user_active(station_code):
+        now = time.time()
+        deadline = next_refresh_deadline(CacheEntry(value=snapshot, timestamp=now))
+        refresh_scheduler.schedule(station_code, deadline)
+    return snapshot
+
+
+def refresh_station(station_code):
+    """Reload one station's cache entry, sharing any fetch already in flight."""
+    before = TRAIN_CACHE.peek(station_code)
+    entry = TRAIN_CACHE.load(station_code, lambda: load_station(station_code))
+    snapshot_changed(station_code, before, entry)
+    return entry
+
+
+def snapshot_changed(station_code, before, entry):
+    """Re-time gate alerts near a station once a load has stored a different snapshot."""
+    if before is None or before.value is not entry.value:
+        alert_manager.stations_changed([station_code, *route_geometry.neighbours(station_code)])
+        if static_site is not None and station_code == Config.STATION_CODE:
+            prerender_scheduler.schedule("site", time.time())
+
+
+def background_refresh(station_code):
+    """Scheduler callback: refresh a station while users are still watching it."""
+    if not is_user_active(station_code):
+        # Nobody is watching; let the key lapse until the next request re-arms it
+        logger.info("No active users for %s, stopping background refresh", station_code)
+        return
+    logger.debug("Background refresh: updating train data for %s", station_code)
+    try:
+        with upstream_priority(Priority.BACKGROUND):
+            refresh_station(station_code)
+    except Exception as e:
+        logger.error("Background refresh error for %s: %s", station_code, e, extra={"station": station_code})
+        refresh_scheduler.schedule(station_code, time.time() + REFRESH_RETRY_SECS)
+
+
+# Refresh deadlines come from each snapshot (TTL and next train passing)
+refresh_scheduler = RefreshScheduler(background_refresh)
 
 
 def start_background_refresh():
-    """Start background refresh if not already running."""
-    if not TRAIN_DATA_CACHE['background_refresh_active']:
-        TRAIN_DATA_CACHE['background_refresh_active'] = True
-        thread = threading.Thread(target=background_refresh_worker, daemon=True)
-        thread.start()
-        logging.info("Started background refresh worker")
+    """Start the background refresh scheduler if not already running."""
+    refresh_scheduler.start()
 
 
-def get_cached_trains():
-    """Get trains from cache if valid, otherwise fetch fresh data."""
-    record_user_activity()  # Track user activity
-    
-    if is_cache_valid() and TRAIN_DATA_CACHE['data']:
-        logging.info("Returning cached train data")
-        return TRAIN_DATA_CACHE['data']
-    
-    # Fetch fresh data
-    return fetch_fresh_train_data()
+# Off inside /api/batch workers, which record each station's activity once per batch up front
+recording_activity = contextvars.ContextVar("recording_activity", default=True)
+
+
+def get_cached_entry(station_code=Config.STATION_CODE):
+    """Get a station's cache entry if valid, otherwise fetch fresh data."""
+    if recording_activity.get():
+        record_user_activity(station_code)  # Track user activity
+    before = TRAIN_CACHE.peek(station_code)
+    try:
+        entry = TRAIN_CACHE.get_or_load(station_code,
+                                        lambda: load_station(station_code),
+                                        is_valid=is_cache_valid)
+    except UpstreamBudgetExceeded:
+        # Over the upstream budget: stale data beats no data
+        stale = TRAIN_CACHE.peek(station_code)
+        if stale is None:
+            raise
+        logger.info("Serving stale trains for %s (upstream budget exhausted)", station_code,
+                    extra={"station": station_code, "throttle": 30})
+        return stale
+    snapshot_changed(station_code, before, entry)
+    return entry
+
+
+def get_cached_trains(station_code=Config.STATION_CODE):
+    """Get upcoming trains for a station from cache if valid, otherwise fetch fresh data."""
+    return upcoming_trains(get_cached_entry(station_code).value)
+
+
+def poll_max_age(entry, start, now):
+    """Seconds until the station's trains can next change, as a max-age hint for pollers."""
+    next_change = max(next_change_at(entry, start), now) + CLIENT_POLL_GRACE_SECS
+    return min(max(math.ceil(next_change - now), CLIENT_MIN_POLL_SECS), math.ceil(TRAIN_CACHE.ttl_secs))
+
+
+def poll_headers(response, etag, max_age, now):
+    response.set_etag(etag, weak=True)
+    response.headers["Cache-Control"] = f"private, max-age={max_age}"
+    response.headers["X-Next-Refresh"] = str(math.ceil(now + max_age))
+    response.headers["Vary"] = "Accept"
+    return response
+
+
+def trains_response(station_code):
+    """
+    Build the /api/trains response for one station.
+
+    Content is negotiated from the Accept header (JSON or MessagePack) and
+    ?schema=iso|epoch. The trains array is encoded once per snapshot and
+    reused; only the small envelope is serialized per request.
+
+    Pollers get a weak ETag over the trains array (If-None-Match answers
+    304 without building a body) plus Cache-Control max-age and
+    X-Next-Refresh (epoch seconds) hints for when it can next change.
+    """
+    mimetype = negotiate(request.accept_mimetypes)
+    schema = request.args.get("schema") or ("epoch" if mimetype == MSGPACK else "iso")
+    if schema not in SCHEMAS:
+        return jsonify({'success': False, 'error': f"Unknown schema '{schema}'"}), 400
+    if any(name in request.args for name in RANGE_PARAMS):
+        return trains_range_response(station_code, mimetype, schema)
+
+    entry = get_cached_entry(station_code)
+    snapshot = entry.value
+    start = snapshot.upcoming_start()
+    total = len(snapshot) - start
+    next_train = snapshot.trains[start] if total else None
+
+    now = time.time()
+    max_age = poll_max_age(entry, start, now)
+    etag = snapshot.etag(mimetype, schema, start)
+
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        envelope = {
+            'success': True,
+            'station': station_code,
+            'next_train': SCHEMAS[schema](next_train) if next_train else None,
+            'total_trains': total,
+            'timestamp': math.floor(now * 1000),
+            'timezone': 'Asia/Kolkata',
+            'cache_info': {
+                'cached': is_cache_valid(entry),
+                'age_seconds': round(entry.age_seconds(), 1),
+                'ttl_minutes': TRAIN_DATA_CACHE['ttl_minutes']
+            }
+        }
+        body = encode_envelope(mimetype, envelope, snapshot.encoded_trains(mimetype, schema, start))
+        response = Response(body, mimetype=mimetype)
+    return poll_headers(response, etag, max_age, now)
+
+
+def trains_range_response(station_code, mimetype, schema):
+    """
+    One slice of a station's trains: ?from=&to= (as for exports, from
+    defaulting to now), ?limit= and ?cursor=.
+
+    The slice is found by binary search over the snapshot's precomputed
+    ETA keys, so its cost follows the slice, not the snapshot. next_cursor
+    names the last train returned and is null once the range is exhausted.
+    """
+    try:
+        start = parse_time_param(request.args.get("from"))
+        end = parse_time_param(request.args.get("to"))
+        after = parse_cursor(request.args.get("cursor"))
+    except (ValueError, OverflowError, OSError) as e:
+        return jsonify({'success': False, 'error': f"Bad from/to/cursor: {e}"}), 400
+    limit = min(max(request.args.get("limit", RANGE_MAX_LIMIT, type=int), 1), RANGE_MAX_LIMIT)
+
+    entry = get_cached_entry(station_code)
+    snapshot = entry.value
+    now = time.time()
+    start_ts = math.floor(start.timestamp()) if start else math.floor(now)
+    end_ts = math.floor(end.timestamp()) if end else None
+    trains, cursor = snapshot.time_range(start_ts, end_ts, after, limit)
+
+    trains_body = encode_rows(mimetype, [SCHEMAS[schema](t) for t in trains])
+    next_cursor = format_cursor(cursor) if cursor else None
+    etag = hashlib.blake2b(trains_body + str(next_cursor).encode(), digest_size=12).hexdigest()
+    max_age = poll_max_age(entry, snapshot.upcoming_start(), now)
+
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        envelope = {
+            'success': True,
+            'station': station_code,
+            'from': start_ts,
+            'to': end_ts,
+            'limit': limit,
+            'count': len(trains),
+            'next_cursor': next_cursor,
+            'timestamp': math.floor(now * 1000),
+            'timezone': 'Asia/Kolkata',
+        }
+        response = Response(encode_envelope(mimetype, envelope, trains_body), mimetype=mimetype)
+    return poll_headers(response, etag, max_age, now)
+
+
+def api_error(e, status=500):
+    logger.error("Error fetching train data: %s", e, extra={"throttle": 10})
+    response = jsonify({
+        'success': False,
+        'error': str(e),
+        'trains': [],
+        'next_train': None,
+        'total_trains': 0
+    })
+    if isinstance(e, UpstreamBudgetExceeded):
+        status = 503
+        response.headers["Retry-After"] = str(math.ceil(e.retry_after))
+    return response, status
+
+
+def unknown_station(code):
+    return jsonify({'success': False, 'error': f"Unknown station '{code}'"}), 404
 
 
 @app.route("/")
 def home():
     return redirect(url_for("trains"))
 
-@app.route("/trains")
-def trains():
-    all_trains = get_cached_trains()
-    next_train = all_trains[0] if all_trains else None
+def build_pages(current, total_pages, window=1):
+    pages = []
+    for p in range(1, total_pages + 1):
+        if p == 1 or p == total_pages or abs(p - current) <= window:
+            pages.append(p)
+        elif pages and pages[-1] != "...":
+            pages.append("...")
+    return pages
 
-    page = max(1, int(request.args.get("page", 1)))
+def render_trains_page(all_trains, page, page_url):
+    """One page of the trains view; page_url(n) links to page n."""
+    next_train = all_trains[0] if all_trains else None
     total_pages = max(1, math.ceil(len(all_trains) / PAGE_SIZE))
     page = min(page, total_pages)
     start, end = (page - 1) * PAGE_SIZE, (page - 1) * PAGE_SIZE + PAGE_SIZE
     page_trains = all_trains[start:end]
 
-    def build_pages(current, total_pages, window=1):
-        pages = []
-        for p in range(1, total_pages + 1):
-            if p == 1 or p == total_pages or abs(p - current) <= window:
-                pages.append(p)
-            elif pages and pages[-1] != "...":
-                pages.append("...")
-        return pages
-
     pages = build_pages(page, total_pages)
     return render_template("index.html",
                            trains=page_trains, next_train=next_train,
-                           page=page, total_pages=total_pages, pages=pages)
+                           page=page, total_pages=total_pages, pages=pages,
+                           page_url=page_url)
 
-@app.route("/crossings")
-def crossings():
-    data = OverpassFetcher.fetch_crossings()
-    show_all = request.args.get("all") == "1"
+def render_crossings_page(data, show_all, crossings_url):
+    """The crossings view; crossings_url(show_all) links to either listing."""
     show_list = data["crossings"] if show_all else data["crossings"][:5]
-    
     return render_template("crossings.html",
                            station=data["station"],
                            crossings=show_list,
                            total=data["total"],
                            showing=len(show_list),
-                           show_all=show_all)
+                           show_all=show_all,
+                           crossings_url=crossings_url)
+
+@app.route("/trains")
+def trains():
+    page = max(1, int(request.args.get("page", 1)))
+    return render_trains_page(get_cached_trains(), page, lambda p: url_for('trains', page=p))
+
+@app.route("/crossings")
+def crossings():
+    data = OverpassFetcher.for_station().fetch_crossings()
+    show_all = request.args.get("all") == "1"
+    return render_crossings_page(data, show_all,
+                                 lambda all_: url_for('crossings', all=1) if all_ else url_for('crossings'))
 
 @app.route("/help")
 def help_page():
@@ -172,60 +439,584 @@ def help_page():
 def api_trains():
     """API endpoint to get train data as JSON for AJAX updates."""
     try:
-        all_trains = get_cached_trains()
-        next_train = all_trains[0] if all_trains else None
-        
-        # Convert trains to JSON-serializable format
-        trains_data = []
-        for train in all_trains:
-            trains_data.append({
-                'train_no': train.train_no,
-                'name': train.name,
-                'eta_at_crossing': train.eta_at_crossing.isoformat(),
-                'eta_at_crossing_formatted': train.eta_at_crossing.strftime("%I:%M %p"),
-                'source': train.source
-            })
-        
-        next_train_data = None
-        if next_train:
-            next_train_data = {
-                'train_no': next_train.train_no,
-                'name': next_train.name,
-                'eta_at_crossing': next_train.eta_at_crossing.isoformat(),
-                'eta_at_crossing_formatted': next_train.eta_at_crossing.strftime("%I:%M %p"),
-                'source': next_train.source
-            }
-        
-        # Add cache information
-        cache_age_seconds = 0
-        if TRAIN_DATA_CACHE['timestamp']:
-            cache_age_seconds = (datetime.now() - TRAIN_DATA_CACHE['timestamp']).total_seconds()
-        
-        return jsonify({
-            'success': True,
-            'trains': trains_data,
-            'next_train': next_train_data,
-            'total_trains': len(all_trains),
-            'timestamp': math.floor(time.time() * 1000),
-            'timezone': 'Asia/Kolkata',
-            'cache_info': {
-                'cached': is_cache_valid(),
-                'age_seconds': round(cache_age_seconds, 1),
-                'ttl_minutes': TRAIN_DATA_CACHE['ttl_minutes']
-            }
-        })
-    
+        return trains_response(Config.STATION_CODE)
+    except Exception as e:
+        return api_error(e)
+
+@app.route("/api/stations/<code>/trains")
+def api_station_trains(code):
+    """Train data for any configured station."""
+    code = code.upper()
+    if not Config.station(code):
+        return unknown_station(code)
+    try:
+        return trains_response(code)
+    except Exception as e:
+        return api_error(e)
+
+def train_index(snapshot):
+    """Number and name index over a snapshot, built on first use."""
+    return snapshot.derived("train_index", lambda: TrainIndex.build(snapshot.trains))
+
+@app.route("/api/trains/search")
+def api_train_search():
+    """Upcoming trains whose name words (or number) start with ?q=, soonest first, over ?station=."""
+    query = request.args.get("q", "").strip()
+    if not query:
+        return jsonify({'success': False, 'error': "Missing ?q="}), 400
+    stations = requested_stations()
+    if stations is None:
+        return jsonify({'success': False, 'error': "Unknown station"}), 404
+    limit = min(max(request.args.get("limit", 20, type=int), 1), 100)
+    now = datetime.now(pytz.timezone('Asia/Kolkata'))
+    found = []
+    try:
+        for code in stations:
+            index = train_index(get_cached_entry(code).value)
+            for train_no in index.search(query, limit, now):
+                run = index.next_run(train_no, now)
+                found.append((run.eta_at_crossing, code, run))
+    except Exception as e:
+        return api_error(e)
+    found.sort(key=lambda f: f[0])
+    results = [{'station': code, **train_to_dict(t)} for _, code, t in found[:limit]]
+    return jsonify({'success': True, 'query': query, 'trains': results, 'total_trains': len(results)})
+
+@app.route("/api/trains/<train_no>")
+def api_train(train_no):
+    """Upcoming runs of one train at ?station= (comma list or all)."""
+    stations = requested_stations()
+    if stations is None:
+        return jsonify({'success': False, 'error': "Unknown station"}), 404
+    now = datetime.now(pytz.timezone('Asia/Kolkata'))
+    runs = []
+    try:
+        for code in stations:
+            runs.extend({'station': code, **train_to_dict(t)}
+                        for t in train_index(get_cached_entry(code).value).lookup(train_no)
+                        if t.eta_at_crossing >= now)
+    except Exception as e:
+        return api_error(e)
+    if not runs:
+        return jsonify({'success': False, 'error': f"Train {train_no} is not due at {','.join(stations)}"}), 404
+    runs.sort(key=lambda r: r['eta_at_crossing'])
+    return jsonify({'success': True, 'train_no': train_no, 'trains': runs, 'next_train': runs[0]})
+
+@app.route("/api/stations/<code>/crossings")
+def api_station_crossings(code):
+    """Crossings near a configured station, nearest first."""
+    fetcher = OverpassFetcher.for_station(code)
+    if fetcher is None:
+        return unknown_station(code)
+    data = fetcher.fetch_crossings()
+    return jsonify({'success': True, 'station_code': code.upper(), **data})
+
+def find_crossing(code, crossing_id):
+    """One of a station's crossings by id, or None."""
+    fetcher = OverpassFetcher.for_station(code)
+    return next((c for c in fetcher.fetch_crossings()["crossings"] if c["id"] == crossing_id), None)
+
+def crossing_train_etas(code, crossing):
+    """[(eta_at_crossing, train)] for one of a station's crossings, soonest first."""
+    override = Config.crossing(crossing["id"])
+    # A distance/speed override pins the crossing to the station, on or off the modelled line
+    etas = None if override else crossing_etas(code).get(crossing["id"])
+    if etas is None:
+        # Off the modelled line: offset from the station by the precomputed
+        # along-track time, or distance/speed if overridden or unmeasured
+        offset_min = crossing.get("offset_min")
+        if offset_min is None or override:
+            speed = override.get("speed_kmph") or Config.value("AVG_SPEED_KMPH", code)
+            distance = override.get("distance_km", crossing.get("track_km") or crossing["distance_km"])
+            offset_min = km_to_minutes(distance, speed)
+        offset = minutes(int(round(offset_min)))
+        etas = [(t.eta_at_station - offset, t) for t in get_cached_trains(code)]
+    return etas
+
+@app.route("/api/stations/<code>/crossings/<int:crossing_id>")
+def api_crossing_trains(code, crossing_id):
+    """Upcoming trains at one crossing, propagated along the line from the nearby stations."""
+    code = code.upper()
+    if OverpassFetcher.for_station(code) is None:
+        return unknown_station(code)
+    crossing = find_crossing(code, crossing_id)
+    if crossing is None:
+        return jsonify({'success': False, 'error': f"Unknown crossing {crossing_id} near '{code}'"}), 404
+    try:
+        return jsonify({'success': True, **crossing_trains_payload(code, crossing)})
     except Exception as e:
-        logging.error(f"Error fetching train data: {e}")
-        return jsonify({
-            'success': False,
-            'error': str(e),
-            'trains': [],
-            'next_train': None,
-            'total_trains': 0
-        }), 500
-
-import os
+        return api_error(e)
+
+def crossing_trains_payload(code, crossing, limit=None):
+    """Upcoming trains at one crossing (the first `limit` of them listed)."""
+    now = datetime.now(pytz.timezone('Asia/Kolkata'))
+    trains_data = [train_to_dict(t, eta) for eta, t in crossing_train_etas(code, crossing) if eta >= now]
+    return {
+        'station': code,
+        'crossing': crossing,
+        'trains': trains_data[:limit],
+        'next_train': trains_data[0] if trains_data else None,
+        'total_trains': len(trains_data)
+    }
+
+# Station chainage model used to propagate ETAs to crossings between stations
+route_geometry = SectionGeometry.from_config()
+route_engine = RouteETAEngine(route_geometry)
+_CROSSING_ETAS = {}  # station code -> (snapshot versions, crossings data, etas)
+
+def crossing_etas(code):
+    """
+    ETAs at every crossing in a station's area, computed in one batched pass
+    from the station's snapshot and its neighbours' and reused until any of
+    those snapshots or the crossings data is refreshed.
+    """
+    crossings_data = OverpassFetcher.for_station(code).fetch_crossings()
+    snapshots = {code: get_cached_entry(code).value}
+    # Neighbours are loaded for this station's sake: they are not being viewed, so
+    # they must not look active and be kept refreshed
+    token = recording_activity.set(False)
+    try:
+        for neighbour in route_geometry.neighbours(code):
+            try:
+                with upstream_priority(Priority.PREFETCH):
+                    snapshots[neighbour] = get_cached_entry(neighbour).value
+            except Exception as e:
+                logger.warning("Neighbour %s unavailable for crossing ETAs: %s", neighbour, e,
+                               extra={"station": code, "throttle": 60})
+    finally:
+        recording_activity.reset(token)
+    versions = tuple(sorted((c, s.version) for c, s in snapshots.items()))
+
+    cached = _CROSSING_ETAS.get(code)
+    if cached and cached[0] == versions and cached[1] is crossings_data:
+        return cached[2]
+    etas = route_engine.propagate({c: s.trains for c, s in snapshots.items()}, crossings_data["crossings"])
+    _CROSSING_ETAS[code] = (versions, crossings_data, etas)
+    return etas
+
+def apply_config_change(change):
+    """Drop only the cached data a config file reload made stale."""
+    global route_geometry, route_engine
+    for code in change.train_stations:
+        if TRAIN_CACHE.invalidate(code):
+            logger.info("Config change: invalidated cached trains for %s", code)
+        if is_user_active(code):
+            # Reload now in the background rather than on the next request
+            refresh_scheduler.schedule(code, time.time())
+    if change.location_stations:
+        # Crossings areas are keyed by bbox/name, so moved stations get fresh entries
+        route_geometry = SectionGeometry.from_config()
+        route_engine = RouteETAEngine(route_geometry)
+        _CROSSING_ETAS.clear()
+    elif "AVG_SPEED_KMPH" in change.globals:
+        _CROSSING_ETAS.clear()
+    for code in change.train_stations:
+        # Trains seen at one end are extrapolated at that station's speed, so neighbours are stale too
+        for stale in [code, *route_geometry.neighbours(code)]:
+            _CROSSING_ETAS.pop(stale, None)
+    if "TRACK_SPEED_PROFILE" in change.globals:
+        # Offsets of crossings off the modelled line come from the profile
+        reprofile_cached_crossings()
+    if change.crossings or "TRACK_SPEED_PROFILE" in change.globals:
+        # Overridden crossings switch between the line model and station offsets
+        _CROSSING_ETAS.clear()
+        alert_manager.stations_changed(Config.station_codes())
+
+# Overrides from Config.CONFIG_FILE, re-read when the file changes
+config_watcher = ConfigWatcher()
+config_watcher.add_listener(apply_config_change)
+config_watcher.check(force=True)
+
+@app.before_request
+def check_config_file():
+    config_watcher.check()
+
+def alert_etas(code, crossing_id):
+    """Crossing ETAs for the alert scheduler (an unknown crossing has none)."""
+    with upstream_priority(Priority.BACKGROUND):
+        crossing = find_crossing(code, crossing_id)
+        return crossing_train_etas(code, crossing) if crossing else []
+
+# Gate-closing alerts, timed per (station, crossing, lead) group and re-timed on refresh
+alert_manager = AlertManager(alert_etas)
+
+def alert_params(values):
+    """(station, crossing_id, lead_secs) from request values; raises ValueError or LookupError."""
+    code = str(values.get("station", Config.STATION_CODE)).upper()
+    crossing_id = int(values.get("crossing_id", values.get("crossing", "")))
+    lead = int(values.get("lead_secs", values.get("lead", 120)))
+    if not 0 <= lead <= Config.ALERT_MAX_LEAD_SECS:
+        raise ValueError(f"lead must be 0-{Config.ALERT_MAX_LEAD_SECS} seconds")
+    if not Config.station(code):
+        raise LookupError(f"Unknown station '{code}'")
+    if find_crossing(code, crossing_id) is None:
+        raise LookupError(f"Unknown crossing {crossing_id} near '{code}'")
+    return code, crossing_id, lead
+
+@app.route("/api/alerts", methods=["POST"])
+def api_alert_subscribe():
+    """Subscribe a local webhook: {"station", "crossing_id", "lead_secs", "webhook"}."""
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify({'success': False, 'error': "Expected a JSON object"}), 400
+    try:
+        code, crossing_id, lead = alert_params(body)
+        sub = alert_manager.subscribe(code, crossing_id, lead, webhook=str(body.get("webhook", "")))
+    except LookupError as e:
+        return jsonify({'success': False, 'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    record_user_activity(code)  # Arms the station's background refresh
+    return jsonify({'success': True, 'subscription': sub.to_dict()}), 201
+
+@app.route("/api/alerts/<int:sub_id>/renew", methods=["POST"])
+def api_alert_renew(sub_id):
+    """Keep a webhook subscription for another ALERT_SUBSCRIPTION_TTL_SECS."""
+    sub = alert_manager.renew(sub_id)
+    if sub is None:
+        return jsonify({'success': False, 'error': f"Unknown subscription {sub_id}"}), 404
+    return jsonify({'success': True, 'subscription': sub.to_dict()})
+
+@app.route("/api/alerts/<int:sub_id>", methods=["DELETE"])
+def api_alert_unsubscribe(sub_id):
+    if not alert_manager.unsubscribe(sub_id):
+        return jsonify({'success': False, 'error': f"Unknown subscription {sub_id}"}), 404
+    return jsonify({'success': True})
+
+@app.route("/api/alerts/stream")
+def api_alert_stream():
+    """Server-sent gate-closing events for ?station=&crossing=&lead= (seconds) while connected."""
+    try:
+        code, crossing_id, lead = alert_params(request.args)
+        events = queue.Queue(maxsize=16)
+        sub = alert_manager.subscribe(code, crossing_id, lead, events=events)
+    except LookupError as e:
+        return jsonify({'success': False, 'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    record_user_activity(code)
+
+    def stream():
+        try:
+            yield f"event: subscribed\ndata: {json.dumps(sub.to_dict())}\n\n"
+            while True:
+                try:
+                    event = events.get(timeout=Config.ALERT_KEEPALIVE_SECS)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: gate-closing\ndata: {json.dumps(event)}\n\n"
+        finally:
+            alert_manager.unsubscribe(sub.id)
+
+    response = Response(stream_with_context(stream()), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"  # Deliver events through nginx immediately
+    return response
+
+# Resolves /api/batch queries concurrently; cache misses still coalesce per key
+batch_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="batch")
+
+def resolve_batch_query(query):
+    """One /api/batch query as a result dict carrying its own HTTP-style status."""
+    try:
+        if not isinstance(query, dict):
+            raise ValueError("Each query must be an object")
+        code = str(query.get("station", Config.STATION_CODE)).upper()
+        if not Config.station(code):
+            raise LookupError(f"Unknown station '{code}'")
+        limit = min(max(int(query.get("limit", PAGE_SIZE)), 1), RANGE_MAX_LIMIT)
+        if query.get("crossing_id") is None:
+            trains = get_cached_trains(code)
+            rows = [train_to_dict(t) for t in trains[:limit]]
+            return {'status': 200, 'station': code, 'trains': rows,
+                    'next_train': rows[0] if rows else None, 'total_trains': len(trains)}
+        crossing_id = int(query["crossing_id"])
+        crossing = find_crossing(code, crossing_id)
+        if crossing is None:
+            raise LookupError(f"Unknown crossing {crossing_id} near '{code}'")
+        return {'status': 200, **crossing_trains_payload(code, crossing, limit)}
+    except LookupError as e:
+        return {'status': 404, 'error': str(e)}
+    except (TypeError, ValueError) as e:
+        return {'status': 400, 'error': str(e)}
+    except Exception as e:
+        logger.error("Batch query %s failed: %s", query, e, extra={"throttle": 10})
+        result = {'status': 500, 'error': str(e)}
+        if isinstance(e, UpstreamBudgetExceeded):
+            result.update(status=503, retry_after=math.ceil(e.retry_after))
+        return result
+
+@app.route("/api/batch", methods=["POST"])
+def api_batch():
+    """
+    Several station and crossing queries in one round trip:
+    {"queries": [{"station": "VN"}, {"station": "VN", "crossing_id": 123, "limit": 5}]}.
+
+    Queries are resolved concurrently against the caches, a miss joining
+    any load of the same key already in flight. The response is one JSON
+    document, {"success": true, "results": [...]}, streamed a result at a
+    time as each query finishes, so a slow station does not hold up the
+    rest; each result carries its query's index and its own status.
+    """
+    body = request.get_json(silent=True)
+    queries = body.get("queries") if isinstance(body, dict) else None
+    if not isinstance(queries, list) or not queries:
+        return jsonify({'success': False, 'error': "Expected {\"queries\": [...]}"}), 400
+    if len(queries) > BATCH_MAX_QUERIES:
+        return jsonify({'success': False, 'error': f"At most {BATCH_MAX_QUERIES} queries per batch"}), 400
+    for code in {str(q.get("station", Config.STATION_CODE)).upper() for q in queries if isinstance(q, dict)}:
+        if Config.station(code):
+            record_user_activity(code)
+
+    def resolve(query):
+        recording_activity.set(False)
+        return resolve_batch_query(query)
+
+    # Each query runs in a copy of this context, so it keeps the caller's upstream priority
+    futures = {batch_pool.submit(contextvars.copy_context().run, resolve, query): i
+               for i, query in enumerate(queries)}
+
+    def stream():
+        yield f'{{"success":true,"count":{len(queries)},"results":['
+        for n, future in enumerate(as_completed(futures)):
+            result = {'index': futures[future], **future.result()}
+            yield ("," if n else "") + json.dumps(result, separators=(",", ":"))
+        yield "]}"
+
+    return Response(stream_with_context(stream()), mimetype="application/json")
+
+def requested_stations():
+    """Station codes from ?station=VN,JTJ or ?station=all (default station if absent), or None if any is unknown."""
+    value = request.args.get("station", Config.STATION_CODE)
+    if value.lower() == "all":
+        return Config.station_codes()
+    codes = [c.strip().upper() for c in value.split(",") if c.strip()]
+    return codes if codes and all(Config.station(c) for c in codes) else None
+
+def export_train_rows(stations, start, end, limit=None):
+    """
+    Stream rows from the stations' cached snapshots without building a payload.
+
+    Snapshots are already ETA-sorted, so several stations are k-way merged
+    into one ETA-ordered stream, which stops pulling once `limit` rows are out.
+    """
+    def stream(code):
+        # A function, not a nested generator expression, so each stream keeps its own code
+        return ((train, code) for train in iter_window(get_cached_entry(code).value, start, end))
+
+    streams = [stream(code) for code in stations]
+    rows = merge(streams, key=lambda pair: pair[0].eta_at_crossing)
+    for train, code in take(rows, limit):
+        yield train_row(code, train)
+
+def export_params():
+    stations = requested_stations()
+    if stations is None:
+        return None, None, None, (jsonify({'success': False, 'error': "Unknown station"}), 404)
+    try:
+        start = parse_time_param(request.args.get("from"))
+        end = parse_time_param(request.args.get("to"))
+    except ValueError as e:
+        return None, None, None, (jsonify({'success': False, 'error': f"Bad from/to: {e}"}), 400)
+    return stations, start, end, None
+
+def export_limit():
+    """?limit= for "next N trains" exports; None when absent or invalid."""
+    limit = request.args.get("limit", type=int)
+    return limit if limit is not None and limit >= 0 else None
+
+@app.route("/api/trains.ndjson")
+def export_trains_ndjson():
+    """All cached trains as newline-delimited JSON (?station=, ?from=, ?to=)."""
+    stations, start, end, error = export_params()
+    if error:
+        return error
+    rows = export_train_rows(stations, start, end, export_limit())
+    return Response(stream_with_context(ndjson_lines(rows)), mimetype="application/x-ndjson")
+
+@app.route("/api/trains.csv")
+def export_trains_csv():
+    """All cached trains as CSV (?station=, ?from=, ?to=)."""
+    stations, start, end, error = export_params()
+    if error:
+        return error
+    rows = export_train_rows(stations, start, end, export_limit())
+    response = Response(stream_with_context(csv_lines(rows, TRAIN_FIELDS)), mimetype="text/csv")
+    response.headers["Content-Disposition"] = "attachment; filename=trains.csv"
+    return response
+
+@app.route("/api/crossings.ndjson")
+def export_crossings_ndjson():
+    """Cached crossings as newline-delimited JSON (?station=VN,JTJ)."""
+    stations = requested_stations()
+    if stations is None:
+        return jsonify({'success': False, 'error': "Unknown station"}), 404
+
+    def rows():
+        for code in stations:
+            for crossing in OverpassFetcher.for_station(code).fetch_crossings()["crossings"]:
+                yield {"station": code, **crossing}
+
+    return Response(stream_with_context(ndjson_lines(rows())), mimetype="application/x-ndjson")
+
+# Deduplicated R-tree per set of tiles, rebuilt only when one of the tiles is refetched
+_REGION_INDEXES = KeyedTTLCache(max_entries=Config.CACHE_MAX_ENTRIES, ttl_secs=float("inf"),
+                                name="region-index")
+
+def region_index(bbox):
+    """R-tree over the crossings in the tiles covering any bbox (missing tiles fetched)."""
+    tiles = crossing_tiles.covering(bbox)
+    key = tuple(tiles)
+    fetched_at = tuple(entry.timestamp for entry in tiles.values())
+    entry = _REGION_INDEXES.get(key)
+    if entry is None or entry.value[0] != fetched_at:
+        crossings = dedupe_by_proximity(crossing_tiles.assemble(tiles)["crossings"], threshold_m=35)
+        for c in crossings:
+            c["label"] = c.pop("name_tag", None) or "Level Crossing"
+        entry = _REGION_INDEXES.put(key, (fetched_at, PointRTree(crossings, crossing_point)))
+    return entry.value[1]
+
+@app.route("/api/crossings")
+def api_crossings():
+    """
+    Spatial crossing queries for map clients, answered from per-area R-trees.
+
+    ?bbox=south,west,north,east or ?near=lat,lon&radius=km (default 2 km),
+    over ?station=VN,JTJ|all, or ?station=none for any region (raw
+    crossings assembled from cached tiles). Paged with ?limit= and
+    ?offset=; ?format=geojson returns a FeatureCollection.
+    """
+    region = request.args.get("station", "").lower() == "none"
+    stations = None if region else requested_stations()
+    if stations is None and not region:
+        return jsonify({'success': False, 'error': "Unknown station"}), 404
+    try:
+        limit = max(1, min(int(request.args.get("limit", 50)), 500))
+        offset = max(0, int(request.args.get("offset", 0)))
+        if request.args.get("bbox"):
+            bbox = parse_bbox(request.args["bbox"])
+            near = None
+        elif request.args.get("near"):
+            lat, lon = parse_floats(request.args["near"], 2, "near (lat,lon)")
+            radius, = parse_floats(request.args.get("radius", "2"), 1, "radius")
+            if radius <= 0:
+                raise ValueError("radius must be positive")
+            bbox, near = None, (lat, lon, radius)
+        else:
+            return jsonify({'success': False, 'error': "Pass bbox=s,w,n,e or near=lat,lon"}), 400
+    except ValueError as e:
+        return jsonify({'success': False, 'error': f"Bad query: {e}"}), 400
+
+    if region:
+        try:
+            indexes = [region_index(bbox or radius_bbox(*near))]
+        except TilesUnavailable as e:
+            return jsonify({'success': False, 'error': f"Crossings unavailable: {e}"}), 503
+        except ValueError as e:
+            return jsonify({'success': False, 'error': f"Bad query: {e}"}), 400
+    else:
+        indexes = [OverpassFetcher.for_station(code).spatial_index() for code in stations]
+
+    seen, hits = set(), []
+    for index in indexes:
+        if near:
+            matches = [dict(c, query_distance_km=round(d, 3)) for d, c in index.nearby(*near, crossing_point)]
+        else:
+            matches = index.search(*bbox)
+        for c in matches:
+            if c["id"] not in seen:
+                seen.add(c["id"])
+                hits.append(c)
+    if near:
+        hits.sort(key=lambda c: c["query_distance_km"])
+    else:
+        hits.sort(key=lambda c: c["id"])
+
+    page = hits[offset:offset + limit]
+    paging = {'total': len(hits), 'offset': offset, 'limit': limit,
+              'next_offset': offset + limit if offset + limit < len(hits) else None}
+    if request.args.get("format") == "geojson":
+        return jsonify({**to_geojson(page), **paging})
+    return jsonify({'success': True, 'crossings': page, **paging})
+
+# Optional static site for edge hosting (Config.PRERENDER_DIR), re-published
+# whenever the default station's trains change or its next train passes
+static_site = StaticSite(Config.PRERENDER_DIR) if Config.PRERENDER_DIR else None
+
+def static_trains_url(page):
+    return "/trains/" if page <= 1 else f"/trains/page/{page}/"
+
+def static_crossings_url(show_all):
+    return "/crossings/all/" if show_all else "/crossings/"
+
+def prerender_site():
+    """
+    Render every page, the API snapshot and the hashed assets for the default
+    station and publish them. Returns (snapshot rendered, next change time).
+    """
+    code = Config.STATION_CODE
+    files = {}
+    with app.test_request_context("/api/trains"):
+        entry = get_cached_entry(code)
+        snapshot = entry.value
+        next_change = next_change_at(entry, snapshot.upcoming_start())
+        files["api/trains.json"] = trains_response(code).get_data()
+
+    all_trains = upcoming_trains(snapshot)
+    with app.test_request_context("/trains"):
+        for page in range(1, max(1, math.ceil(len(all_trains) / PAGE_SIZE)) + 1):
+            path = static_trains_url(page).strip("/") + "/index.html"
+            files[path] = render_trains_page(all_trains, page, static_trains_url).encode("utf-8")
+    files["index.html"] = files["trains/index.html"]
+    with app.test_request_context("/crossings"):
+        data = OverpassFetcher.for_station(code).fetch_crossings()
+        for show_all in (False, True):
+            path = static_crossings_url(show_all).strip("/") + "/index.html"
+            files[path] = render_crossings_page(data, show_all, static_crossings_url).encode("utf-8")
+    with app.test_request_context("/help"):
+        files["help/index.html"] = render_template("help.html").encode("utf-8")
+    for asset in static_assets.assets.values():
+        files[f"static/{asset.hashed_name}"] = asset.variants[None]
+
+    # Edges may keep pages until the next change; browsers revalidate with the edge
+    max_age = max(CLIENT_MIN_POLL_SECS, math.ceil(next_change - time.time()) + CLIENT_POLL_GRACE_SECS)
+    dynamic = {"Cache-Control": f"public, max-age=0, s-maxage={max_age}, stale-while-revalidate=30"}
+    headers = {path: dynamic for path in ("/", "/trains/*", "/crossings/*", "/help/*", "/api/*")}
+    headers["/static/*"] = {"Cache-Control": IMMUTABLE_CACHE_CONTROL}
+    # Page 1 lives at /trains/, so it needs its own rule ahead of the general one
+    rewrites = [("/api/trains", "/api/trains.json"),
+                ("/trains", "/trains/index.html", {"page": "1"}),
+                ("/trains", "/trains/page/:page/index.html", {"page": ":page"}),
+                ("/crossings", "/crossings/all/index.html", {"all": "1"})]
+    static_site.publish(files, headers, rewrites)
+    return snapshot, next_change
+
+def publish_static_site(_key=None):
+    """Scheduler callback: re-publish the static site and re-arm at the next change."""
+    next_at = time.time() + REFRESH_RETRY_SECS
+    try:
+        with upstream_priority(Priority.BACKGROUND):
+            snapshot, next_change = prerender_site()
+        current = TRAIN_CACHE.peek(Config.STATION_CODE)
+        # A refresh that landed mid-render asked for a publish we must not override
+        next_at = next_change + CLIENT_POLL_GRACE_SECS if current and current.value is snapshot else time.time()
+    except Exception as e:
+        logger.error("Pre-rendering failed: %s", e)
+    prerender_scheduler.schedule("site", max(next_at, time.time() + CLIENT_MIN_POLL_SECS))
+
+prerender_scheduler = RefreshScheduler(publish_static_site, name="prerender-scheduler")
+if static_site is not None:
+    prerender_scheduler.start()
+    prerender_scheduler.schedule("site", time.time())
+
+@app.cli.command("prerender")
+def prerender_command():
+    """Publish the static site once to PRERENDER_DIR (or ./prerendered)."""
+    global static_site
+    static_site = static_site or StaticSite(os.path.abspath("prerendered"))
+    prerender_site()
+    print(f"Published to {static_site.current}")
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))
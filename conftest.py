@@ -0,0 +1,17 @@
+#!/usr/bin/env python3
+"""
+Shared pytest fixtures.
+"""
+
+import pytest
+
+from railway_app_v2.ratelimit import budget
+
+
+@pytest.fixture(autouse=True)
+def isolated_upstream_budget(tmp_path):
+    """Give each test its own budget state file instead of the shared one in the temp dir."""
+    previous = budget.path
+    budget.use_path(str(tmp_path / "budget.sqlite"))
+    yield budget
+    budget.use_path(previous)
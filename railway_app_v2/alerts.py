@@ -0,0 +1,261 @@
+"""
+Gate-closing alert subscriptions.
+
+Clients subscribe to a crossing with a lead time and are pushed an event
+that long before the gate closes for each train (PRE_CLOSE_BUFFER_MIN
+before it reaches the crossing), instead of keeping a tab open on the
+countdown.
+
+Subscriptions sharing (station, crossing, lead) form one group, and only
+groups are timed: each has one deadline in a RefreshScheduler heap, at
+its next train's alert time. A refresh that changes a station's trains
+reschedules just that station's groups; no subscription is ever polled.
+"""
+
+import time
+import queue
+import logging
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+import requests
+
+from .config import Config
+from .models import TrainETA
+from .scheduler import RefreshScheduler
+
+logger = logging.getLogger(__name__)
+
+GroupKey = Tuple[str, int, int]  # (station code, crossing id, lead seconds)
+
+RETRY_SECS = 30  # Recheck a group this soon if its ETAs could not be computed
+RESEND_WINDOW_SECS = 30 * 60  # A train's ETA moving by less than this is the same run
+WEBHOOK_TIMEOUT_SECS = 5
+
+
+class Subscription:
+    """One subscriber: an SSE queue or a webhook URL."""
+
+    __slots__ = ("id", "group", "queue", "webhook", "expires_at")
+
+    def __init__(self, sub_id: int, group: GroupKey, expires_at: Optional[float],
+                 events: Optional[queue.Queue] = None, webhook: Optional[str] = None):
+        self.id = sub_id
+        self.group = group
+        self.queue = events
+        self.webhook = webhook
+        self.expires_at = expires_at
+
+    def to_dict(self) -> Dict:
+        station, crossing_id, lead = self.group
+        return {"id": self.id, "station": station, "crossing_id": crossing_id, "lead_secs": lead,
+                "webhook": self.webhook,
+                "expires_at": int(self.expires_at) if self.expires_at is not None else None}
+
+
+def validate_webhook(url: str):
+    """Raise ValueError unless url is an http(s) URL on an allowed (local) host."""
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or parts.hostname not in Config.ALERT_WEBHOOK_HOSTS:
+        raise ValueError(f"Webhooks must be http(s) URLs on {', '.join(Config.ALERT_WEBHOOK_HOSTS)}")
+
+
+class AlertManager:
+    """
+    Time gate-closing alerts per subscription group.
+
+    etas(station, crossing_id) returns that crossing's [(eta, train)]
+    sorted by ETA; it is only called when a group's deadline comes up.
+    """
+
+    def __init__(self, etas: Callable[[str, int], List[Tuple[datetime, TrainETA]]],
+                 pre_close_secs: float = Config.PRE_CLOSE_BUFFER_MIN * 60,
+                 max_subscriptions: int = Config.ALERT_MAX_SUBSCRIPTIONS,
+                 ttl_secs: float = Config.ALERT_SUBSCRIPTION_TTL_SECS):
+        self.etas = etas
+        self.pre_close_secs = pre_close_secs
+        self.max_subscriptions = max_subscriptions
+        self.ttl_secs = ttl_secs
+        self.scheduler = RefreshScheduler(self._fire, name="alert-scheduler")
+        self._subs: Dict[int, Subscription] = {}
+        self._groups: Dict[GroupKey, Dict[int, Subscription]] = {}
+        self._by_station: Dict[str, Set[GroupKey]] = {}
+        self._sent: Dict[GroupKey, Dict[str, float]] = {}  # group -> train_no -> alerted ETA
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._webhooks = ThreadPoolExecutor(max_workers=4, thread_name_prefix="alert-webhook")
+
+    def __len__(self) -> int:
+        return len(self._subs)
+
+    def subscribe(self, station_code: str, crossing_id: int, lead_secs: int,
+                  events: Optional[queue.Queue] = None, webhook: Optional[str] = None) -> Subscription:
+        """
+        Add a subscriber; raises ValueError when full or for a disallowed webhook.
+
+        Webhook subscriptions lapse after ttl_secs unless renewed; stream
+        subscriptions last as long as their connection.
+        """
+        if webhook is not None:
+            validate_webhook(webhook)
+        key = (station_code, crossing_id, int(lead_secs))
+        with self._lock:
+            if len(self._subs) >= self.max_subscriptions:
+                raise ValueError("Too many alert subscriptions")
+            expires_at = time.time() + self.ttl_secs if events is None else None
+            sub = Subscription(next(self._ids), key, expires_at, events, webhook)
+            self._subs[sub.id] = sub
+            new_group = key not in self._groups
+            self._groups.setdefault(key, {})[sub.id] = sub
+            self._by_station.setdefault(station_code, set()).add(key)
+        if new_group:
+            self.scheduler.start()
+            self.scheduler.schedule(key, time.time())
+        elif expires_at is not None:
+            # The group may have no train ahead to wake it before this lapses
+            pending = self.scheduler.deadline(key)
+            if pending is None or pending > expires_at:
+                self.scheduler.schedule(key, expires_at)
+        return sub
+
+    def unsubscribe(self, sub_id: int) -> bool:
+        with self._lock:
+            sub = self._subs.pop(sub_id, None)
+            if sub is None:
+                return False
+            self._remove(sub)
+        return True
+
+    def renew(self, sub_id: int) -> Optional[Subscription]:
+        """Push a webhook subscription's expiry ttl_secs out from now; None if unknown."""
+        with self._lock:
+            sub = self._subs.get(sub_id)
+            if sub is not None and sub.expires_at is not None:
+                sub.expires_at = time.time() + self.ttl_secs
+        return sub
+
+    def get(self, sub_id: int) -> Optional[Subscription]:
+        return self._subs.get(sub_id)
+
+    def stations(self) -> List[str]:
+        """Codes of stations with at least one subscriber."""
+        with self._lock:
+            return list(self._by_station)
+
+    def _remove(self, sub: Subscription):
+        """Drop sub from its group, and the group once empty (lock held)."""
+        group = self._groups.get(sub.group)
+        if group is None:
+            return
+        group.pop(sub.id, None)
+        if not group:
+            del self._groups[sub.group]
+            self._sent.pop(sub.group, None)
+            station_groups = self._by_station.get(sub.group[0])
+            if station_groups is not None:
+                station_groups.discard(sub.group)
+                if not station_groups:
+                    del self._by_station[sub.group[0]]
+            self.scheduler.cancel(sub.group)
+
+    def stations_changed(self, station_codes: Iterable[str]):
+        """Re-time every group at these stations (their crossing ETAs may have moved)."""
+        now = time.time()
+        with self._lock:
+            keys = [key for code in station_codes for key in self._by_station.get(code, ())]
+        for key in keys:
+            self.scheduler.schedule(key, now)
+
+    def _fire(self, key: Hashable):
+        """
+        Scheduler callback: reap lapsed webhooks, alert a group for trains now
+        inside its lead, then re-arm it at its next alert or expiry.
+        """
+        now = time.time()
+        with self._lock:
+            group = self._groups.get(key)
+            if group is None:
+                return
+            for sub in [s for s in group.values() if s.expires_at is not None and s.expires_at <= now]:
+                del self._subs[sub.id]
+                self._remove(sub)
+            if key not in self._groups:
+                return
+
+        station, crossing_id, lead = key
+        try:
+            etas = self.etas(station, crossing_id)
+        except Exception as e:
+            logger.warning("Alert ETAs unavailable for %s crossing %s: %s", station, crossing_id, e,
+                           extra={"station": station, "throttle": 60})
+            self.scheduler.schedule(key, now + RETRY_SECS)
+            return
+
+        due, next_at = [], None
+        for eta, train in etas:
+            eta_ts = eta.timestamp()
+            if eta_ts <= now:
+                continue
+            alert_at = eta_ts - self.pre_close_secs - lead
+            if alert_at > now:
+                next_at = alert_at
+                break
+            due.append((eta, eta_ts, train))
+
+        # _remove() drops a group's sent record under the lock, so it is only touched here with it held
+        with self._lock:
+            group = self._groups.get(key)
+            if group is None:
+                return
+            subscribers = list(group.values())
+            sent = self._sent.setdefault(key, {})
+            events = []
+            for eta, eta_ts, train in due:
+                previous = sent.get(train.train_no)
+                if previous is not None and abs(previous - eta_ts) < RESEND_WINDOW_SECS:
+                    continue
+                sent[train.train_no] = eta_ts
+                events.append({
+                    "station": station,
+                    "crossing_id": crossing_id,
+                    "lead_secs": lead,
+                    "train_no": train.train_no,
+                    "name": train.name,
+                    "eta_at_crossing": eta.isoformat(),
+                    "gate_closes_at": datetime.fromtimestamp(eta_ts - self.pre_close_secs, eta.tzinfo).isoformat(),
+                })
+            for train_no in [t for t, eta_ts in sent.items() if eta_ts < now - RESEND_WINDOW_SECS]:
+                del sent[train_no]
+            expiry = min((s.expires_at for s in subscribers if s.expires_at is not None), default=None)
+
+        for event in events:
+            self._deliver(subscribers, event)
+
+        # With no train ahead the group waits for the next stations_changed(), or for
+        # its first webhook to lapse so that subscription is not held indefinitely
+        deadlines = [t for t in (next_at, expiry) if t is not None]
+        if deadlines:
+            self.scheduler.schedule(key, min(deadlines))
+
+    def _deliver(self, subscribers: List[Subscription], event: Dict):
+        logger.info("Gate closing alert for train %s", event["train_no"],
+                    extra={"station": event["station"], "subscribers": len(subscribers)})
+        for sub in subscribers:
+            if sub.queue is not None:
+                try:
+                    sub.queue.put_nowait(event)
+                except queue.Full:
+                    pass  # A stalled stream misses this alert rather than holding up the rest
+            elif sub.webhook is not None:
+                self._webhooks.submit(self._post, sub.webhook, dict(event, subscription_id=sub.id))
+
+    @staticmethod
+    def _post(url: str, event: Dict):
+        try:
+            requests.post(url, json=event, timeout=WEBHOOK_TIMEOUT_SECS).raise_for_status()
+        except requests.RequestException as e:
+            logger.warning("Alert webhook %s failed: %s", url, e, extra={"throttle": 60})
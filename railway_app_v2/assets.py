@@ -0,0 +1,155 @@
+import os
+import gzip
+import json
+import hashlib
+import logging
+import mimetypes
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from flask import Flask, Response, request
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Assets referenced from the templates via url_for('static', ...)
+FINGERPRINTED_ASSETS = ("main.js", "styles.css", "favicon.svg")
+
+# Fingerprinted URLs never change content, so clients may keep them forever
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Preferred order when the client accepts several encodings
+ENCODING_PREFERENCE = ("br", "gzip")
+
+
+@dataclass
+class StaticAsset:
+    """One fingerprinted asset with its precompressed variants."""
+    filename: str
+    hashed_name: str
+    mimetype: str
+    digest: str
+    variants: Dict[Optional[str], bytes] = field(default_factory=dict)
+
+    def negotiate(self, accept_encodings) -> Optional[str]:
+        """Pick the best available encoding for an Accept-Encoding header."""
+        for encoding in ENCODING_PREFERENCE:
+            if encoding in self.variants and accept_encodings[encoding]:
+                return encoding
+        return None
+
+
+def _hashed_name(filename: str, digest: str) -> str:
+    stem, ext = os.path.splitext(filename)
+    return f"{stem}.{digest}{ext}"
+
+
+def _compress(body: bytes) -> Dict[str, bytes]:
+    """Pre-generate compressed variants, keeping only the ones that save bytes."""
+    variants = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants["br"] = brotli.compress(body, quality=11)
+    return {enc: data for enc, data in variants.items() if len(data) < len(body)}
+
+
+class StaticAssetPipeline:
+    """
+    Content-hash static assets and serve them with immutable caching.
+
+    At startup every asset in FINGERPRINTED_ASSETS is hashed and compressed
+    once. url_for('static', filename='main.js') then resolves to
+    /static/main.<hash>.js, and the static endpoint serves that name from
+    memory with Accept-Encoding negotiation. Unhashed names still fall
+    through to Flask's regular static handler.
+    """
+
+    def __init__(self, static_folder: str, filenames=FINGERPRINTED_ASSETS):
+        self.static_folder = static_folder
+        self.filenames = filenames
+        self.manifest: Dict[str, str] = {}
+        self.assets: Dict[str, StaticAsset] = {}
+
+    def build(self) -> Dict[str, str]:
+        """Hash and compress all assets, returning the filename manifest."""
+        manifest, assets = {}, {}
+        for filename in self.filenames:
+            path = os.path.join(self.static_folder, filename)
+            try:
+                with open(path, "rb") as f:
+                    body = f.read()
+            except OSError as e:
+                logger.warning("Static asset %s not fingerprinted: %s", filename, e)
+                continue
+
+            digest = hashlib.sha256(body).hexdigest()[:12]
+            hashed_name = _hashed_name(filename, digest)
+            mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+            variants = {None: body}
+            variants.update(_compress(body))
+
+            manifest[filename] = hashed_name
+            assets[hashed_name] = StaticAsset(filename, hashed_name, mimetype, digest, variants)
+
+        # Swap in one step so concurrent requests never see a half-built manifest
+        self.manifest, self.assets = manifest, assets
+        logger.info("Fingerprinted %d static assets (brotli=%s)", len(assets), brotli is not None)
+        return manifest
+
+    def write(self, out_dir: str) -> Dict[str, str]:
+        """Write hashed files, .gz/.br variants and manifest.json for static hosting."""
+        if not self.assets:
+            self.build()
+        os.makedirs(out_dir, exist_ok=True)
+        suffixes = {None: "", "gzip": ".gz", "br": ".br"}
+        for asset in self.assets.values():
+            for encoding, body in asset.variants.items():
+                with open(os.path.join(out_dir, asset.hashed_name + suffixes[encoding]), "wb") as f:
+                    f.write(body)
+        with open(os.path.join(out_dir, "manifest.json"), "w") as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        return self.manifest
+
+    def init_app(self, app: Flask):
+        """Rewrite static URLs to their hashed names and serve them from memory."""
+        if not self.assets:
+            self.build()
+
+        fallback = app.view_functions["static"]
+
+        @app.url_defaults
+        def _fingerprint_static_url(endpoint, values):
+            if endpoint == "static" and values.get("filename") in self.manifest:
+                values["filename"] = self.manifest[values["filename"]]
+
+        def serve_static(filename):
+            asset = self.assets.get(filename)
+            if asset is None:
+                return fallback(filename=filename)
+            return self.response_for(asset)
+
+        app.view_functions["static"] = serve_static
+        app.extensions["static_assets"] = self
+
+    def response_for(self, asset: StaticAsset) -> Response:
+        encoding = asset.negotiate(request.accept_encodings)
+        response = Response(asset.variants[encoding], mimetype=asset.mimetype)
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        response.headers["Vary"] = "Accept-Encoding"
+        response.set_etag(f"{asset.digest}-{encoding or 'identity'}")
+        return response.make_conditional(request)
+
+
+if __name__ == "__main__":
+    import sys
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = sys.argv[1] if len(sys.argv) > 1 else os.path.join(root, "static", "dist")
+    pipeline = StaticAssetPipeline(os.path.join(root, "static"))
+    for name, hashed in pipeline.write(out).items():
+        print(f"{name} -> {hashed}")
@@ -0,0 +1,142 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CacheEntry:
+    """A cached value and the wall-clock time it was loaded."""
+    value: Any
+    timestamp: float
+
+    def age_seconds(self) -> float:
+        return time.time() - self.timestamp
+
+
+class _Flight:
+    """An in-progress load that concurrent callers for the same key wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.entry: Optional[CacheEntry] = None
+        self.error: Optional[BaseException] = None
+
+
+class KeyedTTLCache:
+    """
+    Size-bounded LRU of per-key TTL entries with per-key single-flight.
+
+    Each key (station code, bbox, ...) has its own entry and timestamp.
+    Reads move a key to the most-recently-used end; once more than
+    max_entries keys are held the least recently used one is evicted, so
+    popular stations stay hot while rarely requested ones fall out.
+
+    Concurrent misses for the same key share one loader call; misses for
+    different keys load in parallel.
+    """
+
+    def __init__(self, max_entries: int, ttl_secs: float, name: str = "cache"):
+        self.max_entries = max_entries
+        self.ttl_secs = ttl_secs
+        self.name = name
+        self._entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def keys(self) -> List[Hashable]:
+        """Keys from least to most recently used."""
+        with self._lock:
+            return list(self._entries.keys())
+
+    def is_fresh(self, entry: Optional[CacheEntry]) -> bool:
+        return entry is not None and entry.age_seconds() < self.ttl_secs
+
+    def get(self, key: Hashable) -> Optional[CacheEntry]:
+        """Return the entry for key (fresh or not) and mark it recently used."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def peek(self, key: Hashable) -> Optional[CacheEntry]:
+        """Return the entry for key without touching its LRU position."""
+        with self._lock:
+            return self._entries.get(key)
+
+    def put(self, key: Hashable, value: Any, timestamp: Optional[float] = None) -> CacheEntry:
+        """Store value for key, as loaded at timestamp (default now)."""
+        entry = CacheEntry(value=value, timestamp=time.time() if timestamp is None else timestamp)
+        with self._lock:
+            self._store(key, entry)
+        return entry
+
+    def invalidate(self, key: Hashable) -> bool:
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any],
+                    is_valid: Optional[Callable[[CacheEntry], bool]] = None) -> CacheEntry:
+        """
+        Return a valid entry for key, calling loader() at most once per miss.
+
+        is_valid defaults to the TTL check. If another thread is already
+        loading this key the caller waits for that load instead of
+        starting its own.
+        """
+        is_valid = is_valid or self.is_fresh
+        entry = self.get(key)
+        if entry is not None and is_valid(entry):
+            return entry
+        return self.load(key, loader)
+
+    def load(self, key: Hashable, loader: Callable[[], Any]) -> CacheEntry:
+        """Unconditionally (re)load key, joining any load already in flight."""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.entry
+
+        try:
+            value = loader()
+            flight.entry = CacheEntry(value=value, timestamp=time.time())
+            with self._lock:
+                self._store(key, flight.entry)
+            return flight.entry
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def _store(self, key: Hashable, entry: CacheEntry):
+        # Caller holds self._lock
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            evicted, _ = self._entries.popitem(last=False)
+            logger.info("%s: evicted least recently used key %s", self.name, evicted)
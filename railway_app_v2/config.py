@@ -1,20 +1,92 @@
 from .models import DataSource
 import os
+import json
+import time
 import logging
+import threading
+from typing import Callable, Dict, List, Optional, Set
 
 # Configure logger
 logger = logging.getLogger(__name__)
+
+# Settings a station entry must have to be served
+STATION_FIELDS = ("name", "bbox", "lat", "lon")
+# Settings whose change alters computed ETAs (and so invalidates cached trains)
+ETA_SETTINGS = {"DIST_KM_FROM_STATION", "AVG_SPEED_KMPH"}
+# Settings read through Config.value(), so a config file override takes effect without a restart
+RELOADABLE_SETTINGS = ETA_SETTINGS | {"MAX_RETRIES", "REQUEST_TIMEOUT", "TRACK_SPEED_PROFILE"}
+# Per-crossing overrides
+CROSSING_FIELDS = ("distance_km", "speed_kmph")
+
+
+def data_source_from_env() -> DataSource:
+    """$DATA_SOURCE as a DataSource, falling back to Erail when it is not one."""
+    value = os.getenv("DATA_SOURCE", DataSource.ERAIL.value)
+    try:
+        return DataSource(value.strip().lower())
+    except ValueError:
+        logger.error("Unknown DATA_SOURCE %r (expected one of %s); using %s", value,
+                     ", ".join(s.value for s in DataSource), DataSource.ERAIL.value)
+        return DataSource.ERAIL
+
+
+class Overrides:
+    """
+    One parsed config file: global, per-station and per-crossing overrides.
+
+    {"globals": {"REQUEST_TIMEOUT": 15},
+     "stations": {"VN": {"DIST_KM_FROM_STATION": 1.4, "name": "Vaniyambadi"}},
+     "crossings": {"123456": {"distance_km": 0.8}}}
+
+    Instances are never mutated; a reload builds a new one and swaps it in
+    with a single assignment, so readers never see a half-applied file.
+    """
+
+    def __init__(self, data: Optional[dict] = None, mtime: Optional[float] = None):
+        data = data or {}
+        self.globals: Dict = dict(data.get("globals", {}))
+        self.stations: Dict[str, Dict] = {code.upper(): dict(v) for code, v in data.get("stations", {}).items()}
+        self.crossings: Dict[str, Dict] = {str(cid): dict(v) for cid, v in data.get("crossings", {}).items()}
+        self.mtime = mtime
+
+    def validate(self):
+        """Raise ValueError for overrides of unknown or non-reloadable settings."""
+        for name in self.globals:
+            if not name.isupper() or not hasattr(Config, name):
+                raise ValueError(f"Unknown setting '{name}'")
+            if name not in RELOADABLE_SETTINGS:
+                raise ValueError(f"Setting '{name}' cannot be changed without a restart")
+        for code, settings in self.stations.items():
+            for name in settings:
+                if name not in STATION_FIELDS and name not in ETA_SETTINGS:
+                    raise ValueError(f"Setting '{name}' cannot be overridden for station {code}")
+        for cid, settings in self.crossings.items():
+            for name in settings:
+                if name not in CROSSING_FIELDS:
+                    raise ValueError(f"Setting '{name}' cannot be overridden for crossing {cid}")
+
+
 class Config:
     """Centralized configuration management."""
     
     # Data source selection
-    DATA_SOURCE = DataSource.ERAIL  # Change to RAPIDAPI or SIMULATE as needed
+    DATA_SOURCE = data_source_from_env()  # erail, rapidapi, simulate or replay
     
     # Station and crossing details
     STATION_CODE = "VN"  # Nearest station to level crossing
     WINDOW_HOURS = 2  # Look-ahead window for trains
     DIST_KM_FROM_STATION = 1.0  # Distance of crossing from station
     
+    # Stations served by this deployment: name, Overpass bbox (S,W,N,E) and
+    # fallback coordinates used when Overpass does not return the station node
+    STATIONS = {
+        "VN": {"name": "Vaniyambadi", "bbox": "12.60,78.52,12.76,78.70", "lat": 12.68, "lon": 78.62},
+        "JTJ": {"name": "Jolarpettai", "bbox": "12.49,78.49,12.65,78.66", "lat": 12.57, "lon": 78.58},
+        "AB": {"name": "Ambur", "bbox": "12.71,78.63,12.87,78.80", "lat": 12.79, "lon": 78.72},
+        "GYM": {"name": "Gudiyattam", "bbox": "12.86,78.79,13.02,78.95", "lat": 12.94, "lon": 78.87},
+        "KPD": {"name": "Katpadi", "bbox": "12.89,79.06,13.05,79.22", "lat": 12.97, "lon": 79.14},
+    }
+    
     # Gate timing parameters
     PRE_CLOSE_BUFFER_MIN = 5  # Minutes before train arrival to close gate
     POST_OPEN_BUFFER_MIN = 3  # Minutes after train passes to open gate
@@ -24,20 +96,204 @@ class Config:
     MIN_SPEED_KMPH = 30  # Minimum speed near station
     AVG_SPEED_KMPH = 50  # Average speed for calculations
     MAX_SPEED_KMPH = 100  # Maximum speed for validation
+    # (up to km along the track from the station, kmph); turns track distances into ETA offsets
+    TRACK_SPEED_PROFILE = ((1.0, 30), (3.0, 50), (None, 80))
     
     # API Configuration
     RAPIDAPI_KEY = os.getenv("RAPIDAPI_KEY", "")
     RAPIDAPI_HOST = os.getenv("RAPIDAPI_HOST", "irctc1.p.rapidapi.com")
     
+    # Simulation / replay (DATA_SOURCE=simulate or replay)
+    SIM_TRAINS = int(os.getenv("SIM_TRAINS", "0"))  # 0 keeps the four built-in sample trains
+    SIM_STATIONS = int(os.getenv("SIM_STATIONS", "0"))  # Pad Config.STATIONS with synthetic stations
+    SIM_SEED = int(os.getenv("SIM_SEED", "0"))
+    SIM_DELAY = os.getenv("SIM_DELAY", "exponential")  # none, normal, exponential, lognormal
+    SIM_DELAY_MEAN_MIN = float(os.getenv("SIM_DELAY_MEAN_MIN", "6"))
+    ERAIL_RECORD_DIR = os.getenv("ERAIL_RECORD_DIR", "")  # Save raw Erail responses here for replay
+    REPLAY_DIR = os.getenv("REPLAY_DIR", "recordings")
+    REPLAY_SPEED = float(os.getenv("REPLAY_SPEED", "1"))  # Virtual seconds per real second
+    
     # Polling configuration
     POLL_INTERVAL_SECS = 60
     REQUEST_TIMEOUT = 30  # Increased timeout for slower connections
     MAX_RETRIES = 5  # Increased retries
     
+    # Shared request budget per upstream host (token bucket, tokens/minute and burst),
+    # kept in a SQLite file so every worker process draws from the same budget
+    UPSTREAM_BUDGET = os.getenv("UPSTREAM_BUDGET", "1") == "1"
+    UPSTREAM_BUDGET_PATH = os.getenv("UPSTREAM_BUDGET_PATH", "")  # Defaults to the temp dir
+    UPSTREAM_RATES = {
+        "erail.in": (30, 10),
+        "overpass-api.de": (6, 4),
+        "irctc1.p.rapidapi.com": (20, 5),
+    }
+    UPSTREAM_RESERVE_TOKENS = 1.0  # Headroom each lower priority leaves for the one above
+    UPSTREAM_USER_MAX_WAIT_SECS = 2.0  # A blocked user request may wait this long for a token
+    
+    # Per-key caches (one entry per station / crossing area)
+    CACHE_MAX_ENTRIES = 64  # Least recently used keys are evicted beyond this
+    TRAIN_CACHE_TTL_SECS = 120
+    CROSSINGS_CACHE_TTL_SECS = 3600
+    
+    # Crossings are fetched from Overpass per fixed lat/lon tile, cached in memory and on disk
+    CROSSING_TILE_DEG = 0.1
+    CROSSING_TILE_TTL_SECS = 7 * 24 * 3600
+    CROSSING_TILE_DIR = os.getenv("CROSSING_TILE_DIR", "")  # Defaults to the temp dir
+    CROSSING_TILE_BATCH = 16  # Missing tiles fetched per Overpass request
+    CROSSING_TILE_MAX_QUERY = 400  # Largest area one query may span, in tiles
+    
+    # Online delay predictor (adjusts timetable-only ETAs)
+    PREDICT_DELAYS = os.getenv("PREDICT_DELAYS", "1") == "1"
+    PREDICTOR_MAX_TRAINS = int(os.getenv("PREDICTOR_MAX_TRAINS", "5000"))
+    PREDICTOR_STATE_PATH = os.getenv("PREDICTOR_STATE_PATH", "")  # Empty keeps state in memory only
+    
+    # Gate-closing alert subscriptions (SSE streams or local webhooks)
+    ALERT_MAX_SUBSCRIPTIONS = 50000
+    ALERT_SUBSCRIPTION_TTL_SECS = 24 * 3600  # Webhook subscriptions lapse unless renewed
+    ALERT_MAX_LEAD_SECS = 3600
+    ALERT_KEEPALIVE_SECS = 25  # SSE comment interval, under typical proxy idle timeouts
+    ALERT_WEBHOOK_HOSTS = ("localhost", "127.0.0.1", "::1")  # Webhooks stand in for local push services
+    
+    # Worker processes for CPU-bound Erail parsing and crossings enrichment (0: run inline)
+    CPU_WORKERS = int(os.getenv("CPU_WORKERS", "0"))
+    
+    # Publish pre-rendered pages and API snapshots here for static / edge hosting (empty: off)
+    PRERENDER_DIR = os.getenv("PRERENDER_DIR", "")
+    
+    # Optional JSON file of overrides, re-read when its mtime changes
+    CONFIG_FILE = os.getenv("CONFIG_FILE", "")
+    CONFIG_CHECK_SECS = 5  # How often requests may stat the file
+    
+    _overrides = Overrides()
+    
+    @classmethod
+    def value(cls, name: str, station_code: Optional[str] = None):
+        """A setting as currently configured, with any station override applied."""
+        overrides = cls._overrides  # Read once: a reload may swap it meanwhile
+        if station_code:
+            station = overrides.stations.get(station_code.upper())
+            if station and name in station:
+                return station[name]
+        if name in overrides.globals:
+            return overrides.globals[name]
+        return getattr(cls, name)
+    
+    @classmethod
+    def station(cls, code: str):
+        """Return the station settings for a code, or None if not served."""
+        code = (code or "").upper()
+        base = cls.STATIONS.get(code)
+        extra = cls._overrides.stations.get(code)
+        if not extra:
+            return base
+        merged = {**(base or {}), **{k: v for k, v in extra.items() if k in STATION_FIELDS}}
+        return merged if all(k in merged for k in STATION_FIELDS) else base
+    
+    @classmethod
+    def station_codes(cls) -> List[str]:
+        """Codes of every served station, including ones added by the config file."""
+        extra = [code for code in cls._overrides.stations if code not in cls.STATIONS and cls.station(code)]
+        return list(cls.STATIONS) + extra
+    
+    @classmethod
+    def crossing(cls, crossing_id) -> Dict:
+        """Overrides for one crossing (empty if none)."""
+        return cls._overrides.crossings.get(str(crossing_id), {})
+    
     @classmethod
     def validate(cls) -> bool:
         """Validate configuration settings."""
         if cls.DATA_SOURCE == DataSource.RAPIDAPI and not cls.RAPIDAPI_KEY:
             logger.error("RapidAPI key not configured")
             return False
-        return True
\ No newline at end of file
+        return True
+
+
+class ConfigChange:
+    """What a reload changed, so callers invalidate only the affected entries."""
+
+    def __init__(self, old: Overrides, new: Overrides):
+        codes = set(Config.STATIONS) | set(old.stations) | set(new.stations)
+        eta_globals = {k for k in set(old.globals) | set(new.globals)
+                       if old.globals.get(k) != new.globals.get(k)} & ETA_SETTINGS
+        # Stations whose trains must be reloaded
+        self.train_stations: Set[str] = set(codes) if eta_globals else {
+            code for code in codes
+            if {k: v for k, v in old.stations.get(code, {}).items() if k in ETA_SETTINGS}
+            != {k: v for k, v in new.stations.get(code, {}).items() if k in ETA_SETTINGS}}
+        # Stations whose location (and so crossings area) changed
+        self.location_stations: Set[str] = {
+            code for code in codes
+            if {k: v for k, v in old.stations.get(code, {}).items() if k in STATION_FIELDS}
+            != {k: v for k, v in new.stations.get(code, {}).items() if k in STATION_FIELDS}}
+        self.crossings: Set[str] = {cid for cid in set(old.crossings) | set(new.crossings)
+                                    if old.crossings.get(cid) != new.crossings.get(cid)}
+        self.globals: Set[str] = {k for k in set(old.globals) | set(new.globals)
+                                  if old.globals.get(k) != new.globals.get(k)}
+
+    def __bool__(self):
+        return bool(self.train_stations or self.location_stations or self.crossings or self.globals)
+
+
+class ConfigWatcher:
+    """
+    Apply Config.CONFIG_FILE overrides and re-apply them when its mtime changes.
+
+    check() is cheap enough to call from request handlers: it stats the file
+    at most once per interval. A file that fails to parse or validate is
+    logged and ignored, keeping the previous overrides.
+    """
+
+    def __init__(self, path: str = None, interval_secs: float = Config.CONFIG_CHECK_SECS):
+        self.path = Config.CONFIG_FILE if path is None else path
+        self.interval_secs = interval_secs
+        self._listeners: List[Callable[[ConfigChange], None]] = []
+        self._lock = threading.Lock()
+        self._next_check = 0.0
+        self._mtime = None
+
+    def add_listener(self, listener: Callable[[ConfigChange], None]):
+        self._listeners.append(listener)
+
+    def check(self, force: bool = False) -> bool:
+        """Reload if the file changed; True if new overrides were applied."""
+        if not self.path:
+            return False
+        now = time.time()
+        if not force and now < self._next_check:
+            return False
+        if not self._lock.acquire(blocking=False):
+            return False  # Another thread is already checking
+        try:
+            self._next_check = now + self.interval_secs
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except OSError:
+                mtime = None
+            if mtime == self._mtime:
+                return False
+            self._mtime = mtime
+            if mtime is None:
+                new = Overrides()
+            else:
+                try:
+                    with open(self.path, encoding="utf-8") as f:
+                        new = Overrides(json.load(f), mtime)
+                    new.validate()
+                except (OSError, ValueError, AttributeError) as e:
+                    logger.error("Ignoring config file %s: %s", self.path, e)
+                    return False
+            old, Config._overrides = Config._overrides, new
+        finally:
+            self._lock.release()
+
+        change = ConfigChange(old, new)
+        logger.info("Applied config file %s (stations: %s, crossings: %s, globals: %s)",
+                    self.path, sorted(change.train_stations | change.location_stations),
+                    sorted(change.crossings), sorted(change.globals))
+        for listener in self._listeners:
+            try:
+                listener(change)
+            except Exception as e:
+                logger.error("Config change listener failed: %s", e)
+        return True
@@ -0,0 +1,77 @@
+"""
+Optional process pool for CPU-bound parsing and enrichment.
+
+Parsing Erail bodies and labelling crossings are pure Python and hold the
+GIL, so in a threaded web worker they stall every other request thread.
+With Config.CPU_WORKERS > 0 that work is shipped to worker processes
+instead; callers only wait on a future, which releases the GIL.
+
+Jobs are module-level functions over plain strings and tuples, and return
+tuples of primitives: pickling those is compact and cheap, unlike graphs
+of TrainETA / datetime objects. With no workers configured the same
+functions run inline, so callers never branch on whether the pool is on.
+"""
+
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+from .config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class CPUPool:
+    """
+    Lazily started ProcessPoolExecutor, or inline execution without workers.
+
+    The executor is created on first use rather than at import, so each
+    pre-forked web worker gets its own, and it uses the spawn start method
+    so children never inherit the parent's threads or held locks.
+    """
+
+    def __init__(self, workers: int = 0):
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0
+
+    def submit(self, fn: Callable[..., Any], *args) -> Future:
+        """Run fn(*args) in a worker process, or inline (as a completed future) without workers."""
+        if self.enabled:
+            try:
+                return self._pool().submit(fn, *args)
+            except BrokenProcessPool as e:
+                # A worker died (e.g. OOM-killed): start a fresh pool next time
+                logger.error("CPU pool broken, running inline: %s", e, extra={"throttle": 60})
+                self.shutdown()
+        future: Future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context("spawn"))
+                logger.info("Started %d CPU worker processes", self.workers)
+            return self._executor
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Shared by every fetcher in this process
+cpu_pool = CPUPool(Config.CPU_WORKERS)
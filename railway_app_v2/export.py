@@ -0,0 +1,85 @@
+import io
+import csv
+import json
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import pytz
+
+from .models import TrainETA
+from .snapshot import TrainSnapshot
+
+IST = pytz.timezone('Asia/Kolkata')
+
+TRAIN_FIELDS = ["station", "train_no", "name", "eta_at_station", "eta_at_crossing", "source", "delay_min", "predicted_delay_min"]
+
+
+def parse_time_param(value: Optional[str], base: Optional[datetime] = None) -> Optional[datetime]:
+    """
+    Parse a from/to query value: ISO 8601, epoch seconds or HH:MM.
+
+    HH:MM is taken as today in IST (relative to base). Naive ISO values are
+    assumed to be IST. Raises ValueError for anything else.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    base = base or datetime.now(IST)
+    if value.replace(".", "", 1).isdigit() and ":" not in value:
+        try:
+            return datetime.fromtimestamp(float(value), IST)
+        except (OverflowError, OSError) as e:
+            raise ValueError(f"epoch {value} is out of range") from e
+    if len(value) <= 5 and ":" in value:
+        hour, minute = map(int, value.split(":"))
+        return base.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    parsed = datetime.fromisoformat(value)
+    return IST.localize(parsed) if parsed.tzinfo is None else parsed
+
+
+def iter_window(snapshot: TrainSnapshot, start: Optional[datetime] = None,
+                end: Optional[datetime] = None, now: Optional[datetime] = None) -> Iterator[TrainETA]:
+    """
+    Yield a snapshot's trains that have not passed by now whose crossing ETA
+    is in [start, end], iterating from the first one's index rather than
+    copying the tail.
+    """
+    now = now or datetime.now(IST)
+    trains = snapshot.trains
+    for i in range(snapshot.upcoming_start(max(start, now) if start else now), len(trains)):
+        train = trains[i]
+        if end is not None and train.eta_at_crossing > end:
+            return
+        yield train
+
+
+def train_row(station_code: str, train: TrainETA) -> Dict:
+    return {
+        "station": station_code,
+        "train_no": train.train_no,
+        "name": train.name,
+        "eta_at_station": train.eta_at_station.isoformat(),
+        "eta_at_crossing": train.eta_at_crossing.isoformat(),
+        "source": train.source,
+        "delay_min": train.delay_min,
+        "predicted_delay_min": train.predicted_delay_min,
+    }
+
+
+def ndjson_lines(rows: Iterable[Dict]) -> Iterator[str]:
+    """One compact JSON document per line."""
+    for row in rows:
+        yield json.dumps(row, separators=(",", ":"), default=str) + "\n"
+
+
+def csv_lines(rows: Iterable[Dict], fields: List[str]) -> Iterator[str]:
+    """CSV header then one line per row, reusing a single small buffer."""
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=fields, extrasaction="ignore")
+    writer.writeheader()
+    yield buf.getvalue()
+    for row in rows:
+        buf.seek(0)
+        buf.truncate()
+        writer.writerow(row)
+        yield buf.getvalue()
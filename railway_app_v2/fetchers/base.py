@@ -1,4 +1,4 @@
-from typing import List
+from typing import Iterator, List
 from railway_app_v2.models import TrainETA
 
 class TrainDataFetcher:
@@ -7,3 +7,11 @@ class TrainDataFetcher:
     def fetch(self, station_code: str, hours: int) -> List[TrainETA]:
         """Fetch train data. Must be implemented by subclasses."""
         raise NotImplementedError
+    
+    def iter_fetch(self, station_code: str, hours: int) -> Iterator[TrainETA]:
+        """
+        Yield train records lazily, in no particular order, for the ingestion
+        pipeline (see railway_app_v2.pipeline). Fetchers that can parse
+        incrementally override this; the default wraps fetch().
+        """
+        yield from self.fetch(station_code, hours)
@@ -1,22 +1,33 @@
+import os
 import re
+import codecs
+import hashlib
 import logging
+import itertools
 import requests
-from typing import List, Optional
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
 from datetime import timedelta, datetime
 import pytz
 
 from railway_app_v2.config import Config
+from railway_app_v2.cpupool import cpu_pool
 from railway_app_v2.models import TrainETA
 from railway_app_v2.fetchers.base import TrainDataFetcher
+from railway_app_v2.pipeline import ingest
+from railway_app_v2.ratelimit import budget
 from railway_app_v2.utils import km_to_minutes, parse_time_string, minutes
 
 logger = logging.getLogger(__name__)
 
+STREAM_CHUNK_BYTES = 16 * 1024  # Read size while parsing a response as it downloads
+PARSE_BATCH_RECORDS = 256  # Records per CPU pool job when parsing in worker processes
+
 
 class ErailFetcher(TrainDataFetcher):
     """Fetch train data from Erail.in."""
     
-    ERAIL_URL = "https://erail.in/rail/getTrains.aspx"
+    ERAIL_URL = os.environ.get("ERAIL_URL", "https://erail.in/rail/getTrains.aspx")
     
     # Headers to make request look more like a browser
     HEADERS = {
@@ -28,6 +39,10 @@ class ErailFetcher(TrainDataFetcher):
         "Upgrade-Insecure-Requests": "1"
     }
     
+    def __init__(self):
+        # station code -> (body hash or response validator, {record text: parsed fields or None})
+        self._parsed = {}
+    
     @staticmethod
     def _safe_get(lst, idx, default=""):
         return lst[idx] if idx < len(lst) else default
@@ -57,7 +72,20 @@ class ErailFetcher(TrainDataFetcher):
         return None
     
     def fetch(self, station_code: str, hours: int) -> List[TrainETA]:
-        """Fetch trains from erail.in."""
+        """Fetch trains from erail.in, in the window and sorted by crossing ETA."""
+        now = datetime.now(pytz.timezone('Asia/Kolkata'))
+        return list(ingest([self.iter_fetch(station_code, hours)], start=now, end=now + timedelta(hours=hours)))
+    
+    def iter_fetch(self, station_code: str, hours: int) -> Iterator[TrainETA]:
+        """
+        Yield every parseable train in the Erail response (unfiltered, unsorted).
+
+        The body is streamed and parsed record by record as it downloads, so
+        the full payload is never held; a consumer that stops early closes
+        the connection without reading the rest.
+        """
+        # Raises UpstreamBudgetExceeded so callers keep serving cached data
+        budget.acquire(self.ERAIL_URL)
         try:
             params = {
                 "Station_From": station_code,
@@ -67,35 +95,103 @@ class ErailFetcher(TrainDataFetcher):
                 "Cache": "true"
             }
             
-            logger.info(f"Making request to Erail API with params: {params}")
+            logger.debug("Making request to Erail API with params: %s", params)
             response = requests.get(
                 self.ERAIL_URL, 
                 params=params, 
-                headers=self.HEADERS,
-                timeout=Config.REQUEST_TIMEOUT
+                headers={**self.HEADERS, **self._conditional_headers(station_code)},
+                timeout=Config.value("REQUEST_TIMEOUT"),
+                stream=True
             )
-            logger.info(f"Erail API response status: {response.status_code}")
+            logger.info("Erail API response status: %s", response.status_code,
+                        extra={"station": station_code, "fetcher": "erail",
+                               "duration_ms": round(response.elapsed.total_seconds() * 1000)})
             response.raise_for_status()
-            
-            if not response.text:
-                logger.error("Erail API returned empty response")
-                return []
-                
-            trains = self._parse_erail_response(response.text, station_code, hours)
-            logger.info(f"Successfully parsed {len(trains)} trains from Erail response")
-            return trains
-            
         except requests.Timeout:
-            logger.error(f"Timeout ({Config.REQUEST_TIMEOUT}s) while fetching from Erail")
-            return []
+            logger.error("Timeout (%ss) while fetching from Erail", Config.value("REQUEST_TIMEOUT"),
+                         extra={"station": station_code, "fetcher": "erail"})
+            return
         except requests.ConnectionError as e:
-            logger.error(f"Connection error while fetching from Erail: {e}")
-            return []
+            logger.error("Connection error while fetching from Erail: %s", e,
+                         extra={"station": station_code, "fetcher": "erail"})
+            return
         except requests.RequestException as e:
-            logger.error(f"Failed to fetch from Erail: {type(e).__name__}: {e}")
-            return []
+            logger.error("Failed to fetch from Erail: %s: %s", type(e).__name__, e,
+                         extra={"station": station_code, "fetcher": "erail"})
+            return
+        
+        try:
+            validator = self._validator(response)
+            unchanged = response.status_code == 304 or (
+                validator is not None and validator == self._parsed.get(station_code, (None,))[0])
+            # An unchanged body is not read at all: the last one's records are reused
+            body = None if unchanged else self._iter_body(response, station_code)
+            yield from self._iter_erail_records(body, station_code, validator=validator)
+        except requests.RequestException as e:
+            # The connection dropped mid-body: keep what was parsed so far
+            logger.error("Erail response interrupted: %s: %s", type(e).__name__, e,
+                         extra={"station": station_code, "fetcher": "erail"})
+        finally:
+            response.close()
     
-    def _parse_erail_response(self, raw_text: str, station_code: str, hours: int) -> List[TrainETA]:
+    def _conditional_headers(self, station_code: str) -> Dict[str, str]:
+        """If-None-Match / If-Modified-Since for the station's last fully read body, if it had a validator."""
+        key = self._parsed.get(station_code, (None,))[0]
+        if isinstance(key, tuple) and key[0] == "etag":
+            return {"If-None-Match": key[1]}
+        if isinstance(key, tuple) and key[0] == "modified":
+            return {"If-Modified-Since": key[1]}
+        return {}
+
+    @staticmethod
+    def _validator(response) -> Optional[tuple]:
+        """
+        What identifies a streamed body before it is read: a strong ETag, or
+        Last-Modified with Content-Length; None if the response has neither.
+        """
+        etag = response.headers.get("ETag")
+        if etag and not etag.startswith("W/"):
+            return "etag", etag
+        modified, length = response.headers.get("Last-Modified"), response.headers.get("Content-Length")
+        if modified and length:
+            return "modified", modified, length
+        return None
+
+    def _iter_body(self, response, station_code: str) -> Iterator[str]:
+        """Decoded text chunks of a streamed response, recorded once fully read."""
+        decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+        recorded = [] if Config.ERAIL_RECORD_DIR else None
+        received = 0
+        for raw in response.iter_content(chunk_size=STREAM_CHUNK_BYTES):
+            received += len(raw)
+            text = decoder.decode(raw)
+            if recorded is not None:
+                recorded.append(text)
+            yield text
+        text = decoder.decode(b"", final=True)
+        if recorded is not None:
+            recorded.append(text)
+        yield text
+        
+        if not received:
+            logger.error("Erail API returned empty response")
+        elif recorded is not None:
+            self._record("".join(recorded), station_code)
+    
+    @staticmethod
+    def _record(raw_text: str, station_code: str):
+        """Save a raw response for later replay (see ReplayFetcher)."""
+        try:
+            os.makedirs(Config.ERAIL_RECORD_DIR, exist_ok=True)
+            stamp = datetime.now(pytz.timezone('Asia/Kolkata')).strftime("%Y%m%dT%H%M%S")
+            path = os.path.join(Config.ERAIL_RECORD_DIR, f"{station_code}-{stamp}.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(raw_text)
+        except OSError as e:
+            logger.warning("Could not record Erail response: %s", e)
+    
+    def _parse_erail_response(self, raw_text: str, station_code: str, hours: int,
+                              base: Optional[datetime] = None) -> List[TrainETA]:
         """
         Parse Erail getTrains.aspx 'raw_text' into List[TrainETA].
 
@@ -119,102 +215,203 @@ class ErailFetcher(TrainDataFetcher):
         The Erail payload may contain short/metadata blocks like:
         "~VN~Vaniyambadi~~~~2025-8-26-0-8-6~~~..."
         These are skipped via validation checks.
+
+        base is the "current" time the window is measured from; it defaults
+        to now in IST and is overridden when replaying recorded payloads.
         """ 
 
-        trains: List[TrainETA] = []
         # Use Indian timezone for base time
         ist = pytz.timezone('Asia/Kolkata')
-        base = datetime.now(ist)
+        base = base or datetime.now(ist)
 
         if not raw_text:
             logger.warning("Empty Erail response")
-            return trains
+            return []
 
-        # Split into records, strip empties
-        records = [blk.strip() for blk in raw_text.split("^") if blk.strip()]
-        
-    
-        for rec in records:
-            parts = rec.split("~")
+        # Window, sort and de-duplicate by (train_no, eta_at_crossing minute)
+        records = self._iter_erail_records(raw_text, station_code, base)
+        return list(ingest([records], start=base, end=base + timedelta(hours=hours)))
 
-            # Basic sanity: many meta lines are too short or don't start with a train no
-            if len(parts) < 14:
+    def _iter_erail_records(self, body: Union[str, Iterable[str], None], station_code: str,
+                            base: Optional[datetime] = None,
+                            validator: Optional[tuple] = None) -> Iterator[TrainETA]:
+        """Yield a TrainETA for each parseable record of a body (or its chunks), in payload order."""
+        base = base or datetime.now(pytz.timezone('Asia/Kolkata'))
+        # Compute ETA at crossing by subtracting travel time from station to crossing
+        speed_kmph = Config.value("AVG_SPEED_KMPH", station_code)
+        offset_min = km_to_minutes(Config.value("DIST_KM_FROM_STATION", station_code), speed_kmph)
+        # Round to nearest minute to avoid off-by-1 jitter
+        offset = minutes(int(round(offset_min)))
+
+        for train_no, train_name, arr_hhmm, src_code, dst_code, via_code in self._records(body, station_code, validator):
+            # Convert to datetime (handles tomorrow rollover)
+            eta_station = parse_time_string(arr_hhmm, base)
+            if not eta_station:
+                logger.debug("Skipping train %s - parse_time_string failed (norm='%s').", train_no, arr_hhmm,
+                             extra={"throttle": 60})
                 continue
 
-            train_no = self._safe_get(parts, 0, "").strip()
-            train_name = self._safe_get(parts, 1, "").strip()
+            yield TrainETA(
+                train_no=train_no,
+                name=train_name,
+                eta_at_station=eta_station,
+                eta_at_crossing=eta_station - offset,
+                source="erail",
+                delay_min=None,
+                speed_kmph=speed_kmph,
+                src_code=src_code,
+                dst_code=dst_code,
+                via_code=via_code
+            )
 
-            # Train number should be mostly digits (allow a leading alpha in rare cases, but reject empty/garbage)
-            if not train_no or not any(ch.isdigit() for ch in train_no):
+    @staticmethod
+    def _split_records(chunks: Iterable[str]) -> Iterator[str]:
+        """Records of a body arriving in chunks, split on '^' as each chunk lands."""
+        tail = ""
+        for chunk in chunks:
+            if not chunk:
                 continue
+            blocks = (tail + chunk).split("^")
+            tail = blocks.pop()  # May continue in the next chunk
+            for blk in blocks:
+                yield blk.strip()
+        yield tail.strip()
 
-            # Core fields (not strictly needed for TrainETA but useful if you log/extend later)
-            src_name, src_code = self._safe_get(parts, 2, "").strip(), self._safe_get(parts, 3, "").strip()
-            dst_name, dst_code = self._safe_get(parts, 4, "").strip(), self._safe_get(parts, 5, "").strip()
-            via_name, via_code = self._safe_get(parts, 6, "").strip(), self._safe_get(parts, 7, "").strip()
-            final_dst_name, final_dst_code = self._safe_get(parts, 8, "").strip(), self._safe_get(parts, 9, "").strip()
+    @staticmethod
+    def _hashed(chunks: Iterable[str], digest) -> Iterator[str]:
+        for chunk in chunks:
+            digest.update(chunk.encode("utf-8"))
+            yield chunk
 
-            # Arrival at the queried station is typically at index 10.
-            arr_raw = self._safe_get(parts, 10, "").strip()
+    def _records(self, body: Union[str, Iterable[str], None], station_code: str,
+                 validator: Optional[tuple] = None) -> Iterator[tuple]:
+        """
+        Base-time independent fields of each parseable record, reusing earlier parses.
 
-            # Robust time normalization (handles '06.20' etc.)
-            arr_hhmm = self._normalize_hhmm(arr_raw)
+        Erail is queried with Cache=true and often returns the same body
+        between refreshes: only records whose text was not in the previous
+        body are parsed, and a whole body (str) that hashes the same as the
+        previous one skips splitting too. A streamed body can only be hashed
+        once it has been read, so iter_fetch compares its response validator
+        (see _validator) instead and passes body None when it matches, which
+        reuses the previous body's records unread. Without a validator a
+        streamed body is still split, but only new records are parsed.
+        Only the station's latest fully read body is kept, so a consumer
+        that stops early leaves the previous one in place.
+        """
+        previous_hash, previous = self._parsed.get(station_code, (None, {}))
+        digest = hashlib.blake2b(digest_size=16)
+        if body is None:
+            yield from (rec for rec in previous.values() if rec is not None)
+            return
+        if isinstance(body, str):
+            digest.update(body.encode("utf-8"))
+            if digest.digest() == previous_hash:
+                yield from (rec for rec in previous.values() if rec is not None)
+                return
+            chunks = (body,)
+        else:
+            chunks = self._hashed(body, digest)
 
-            # Fallback: scan nearby fields if 10 is blank/malformed
-            if not arr_hhmm:
-                arr_hhmm = self._first_time_candidate(parts[10:16])
+        parsed = {}
+        reparsed = 0
+        records = (rec for rec in self._split_records(chunks) if rec)
+        for rec, fields, fresh in self._reuse_or_parse(records, previous):
+            parsed[rec] = fields
+            reparsed += fresh
+            if fields is not None:
+                yield fields
+        self._parsed[station_code] = (validator or digest.digest(), parsed)
+        logger.debug("Erail body read: parsed %d of %d records", reparsed, len(parsed),
+                     extra={"station": station_code, "fetcher": "erail"})
 
-            if not arr_hhmm:
-                # No parseable arrival time → skip
-                logger.debug(f"Skipping train {train_no} - no parseable arrival time (raw='{arr_raw}').")
-                continue
+    def _reuse_or_parse(self, records: Iterable[str],
+                        previous: Dict[str, Optional[tuple]]) -> Iterator[Tuple[str, Optional[tuple], bool]]:
+        """
+        (record, fields, newly parsed) for each distinct record, in order.
 
-            # Convert to datetime (handles tomorrow rollover)
+        With the CPU pool on, records not in the previous body are parsed in
+        batches on worker processes while the body keeps downloading, and
+        batches are handed back in payload order as they finish.
+        """
+        seen = set()
+        if not cpu_pool.enabled:
+            for rec in records:
+                if rec in seen:
+                    continue
+                seen.add(rec)
+                if rec in previous:
+                    yield rec, previous[rec], False
+                else:
+                    yield rec, self._parse_record(rec), True
+            return
 
-            eta_station = parse_time_string(arr_hhmm, base)
-            if not eta_station:
-                logger.debug(f"Skipping train {train_no} - parse_time_string failed (norm='{arr_hhmm}').")
-                continue
-            
-            # Compute ETA at crossing by subtracting travel time from station to crossing
-            offset_min = km_to_minutes(Config.DIST_KM_FROM_STATION, Config.AVG_SPEED_KMPH)
-            # Round to nearest minute to avoid off-by-1 jitter
-            eta_crossing = eta_station - minutes(int(round(offset_min)))
-
-            # Filter out trains that have already passed or are too far in the future
-            # Use Indian timezone for current time
-            now = datetime.now(pytz.timezone('Asia/Kolkata'))
-            if eta_crossing < now:
-                logger.debug(f"Skipping train {train_no} - already passed (eta was {eta_crossing})")
-                continue
-            
-            if eta_crossing > now + timedelta(hours=hours):
-                logger.debug(f"Skipping train {train_no} - too far in future (eta {eta_crossing})")
-                continue
+        pending = deque()  # (batch, its new records, future parsing them or None)
+        batch: List[str] = []
+        for rec in itertools.chain(records, [None]):
+            if rec is not None:
+                if rec in seen:
+                    continue
+                seen.add(rec)
+                batch.append(rec)
+                if len(batch) < PARSE_BATCH_RECORDS:
+                    continue
+            if batch:
+                new = [r for r in batch if r not in previous]
+                pending.append((batch, new, cpu_pool.submit(parse_record_batch, new) if new else None))
+                batch = []
+            # Finished batches go out now; the rest wait until the body has ended
+            while pending and (rec is None or pending[0][2] is None or pending[0][2].done()):
+                done, new, future = pending.popleft()
+                fields = dict(zip(new, future.result())) if future else {}
+                for r in done:
+                    yield (r, fields[r], True) if r in fields else (r, previous[r], False)
 
-            trains.append(TrainETA(
-                train_no=train_no,
-                name=train_name,
-                eta_at_station=eta_station,
-                eta_at_crossing=eta_crossing,
-                source="erail",
-                delay_min=None,
-                speed_kmph=Config.AVG_SPEED_KMPH
-            ))
+    @classmethod
+    def _parse_record(cls, rec: str) -> Optional[tuple]:
+        """(train_no, name, HH:MM, src_code, dst_code, via_code) for one record, or None to skip it."""
+        parts = rec.split("~")
 
-        # Optional: de-duplicate by (train_no, eta_at_crossing minute)
-        keyd = {}
+        # Basic sanity: many meta lines are too short or don't start with a train no
+        if len(parts) < 14:
+            return None
 
-        for t in trains:
-            key = (t.train_no, t.eta_at_crossing.replace(second=0, microsecond=0))
-            # Keep earliest crossing if duplicates
-            if key not in keyd or t.eta_at_crossing < keyd[key].eta_at_crossing:
-                keyd[key] = t
+        train_no = cls._safe_get(parts, 0, "").strip()
+        train_name = cls._safe_get(parts, 1, "").strip()
+
+        # Train number should be mostly digits (allow a leading alpha in rare cases, but reject empty/garbage)
+        if not train_no or not any(ch.isdigit() for ch in train_no):
+            return None
+
+        # Route fields, used to work out direction of travel along the line
+        src_code = cls._safe_get(parts, 3, "").strip()
+        dst_code = cls._safe_get(parts, 5, "").strip()
+        via_code = cls._safe_get(parts, 7, "").strip()
+        final_dst_code = cls._safe_get(parts, 9, "").strip()
+
+        # Arrival at the queried station is typically at index 10.
+        arr_raw = cls._safe_get(parts, 10, "").strip()
+
+        # Robust time normalization (handles '06.20' etc.)
+        arr_hhmm = cls._normalize_hhmm(arr_raw)
+
+        # Fallback: scan nearby fields if 10 is blank/malformed
+        if not arr_hhmm:
+            arr_hhmm = cls._first_time_candidate(parts[10:16])
+
+        if not arr_hhmm:
+            # No parseable arrival time → skip
+            logger.debug("Skipping train %s - no parseable arrival time (raw='%s').", train_no, arr_raw,
+                         extra={"throttle": 60})
+            return None
 
-        result = sorted(keyd.values(), key=lambda x: x.eta_at_crossing)
+        return (train_no, train_name, arr_hhmm, src_code or None,
+                (final_dst_code or dst_code) or None, via_code or None)
 
-        return result
 
+def parse_record_batch(records: List[str]) -> List[Optional[tuple]]:
+    """CPU pool job: field tuples (or None) for raw Erail records."""
+    return [ErailFetcher._parse_record(rec) for rec in records]
 
 if __name__ == "__main__":
 
@@ -1,106 +1,191 @@
-import time, requests, os
+import re, time, requests, os
 import logging
+from ..config import Config
+from ..cache import KeyedTTLCache
+from ..cpupool import cpu_pool
+from ..ratelimit import budget
+from ..spatial import PointRTree, parse_bbox
+from ..tiles import CrossingTiles, TilesUnavailable, tile_of
+from ..trackgraph import SpeedProfile, TrackGraph
 from ..utils import haversine_km, dedupe_by_proximity
 
+logger = logging.getLogger(__name__)
+
 CITY_BBOX = os.environ.get("CITY_BBOX", "12.60,78.52,12.76,78.70")
 OVERPASS_URL = os.environ.get("OVERPASS_URL", "https://overpass-api.de/api/interpreter")
-_CROSSINGS_CACHE = {"ts": 0, "data": None}
+
+# Raw crossing and station nodes per fixed tile, shared by every area that overlaps them
+crossing_tiles = CrossingTiles.from_config(OVERPASS_URL)
+
+# One entry per (bbox, station name); rarely viewed areas are evicted first
+_CROSSINGS_CACHE = KeyedTTLCache(max_entries=Config.CACHE_MAX_ENTRIES,
+                                 ttl_secs=Config.CROSSINGS_CACHE_TTL_SECS,
+                                 name="crossings")
+
+# Spatial index per crossings cache key, rebuilt whenever the crossings data is refreshed
+_CROSSINGS_INDEXES = KeyedTTLCache(max_entries=Config.CACHE_MAX_ENTRIES,
+                                   ttl_secs=float("inf"),
+                                   name="crossings-index")
+
+def crossing_point(c):
+    return c["lat"], c["lon"]
+
+def label_crossings(crossings, roads, places, st_lat, st_lon):
+    """
+    CPU pool job: (id, label, road, place, distance_km) for (id, name_tag, lat, lon)
+    crossings, labelled from the nearest (name, lat, lon) road and place.
+    """
+    labelled = []
+    for cid, name_tag, lat, lon in crossings:
+        dist_km = haversine_km(st_lon, st_lat, lon, lat)
+        # nearest named road
+        nearest_road, min_r = None, 1e9
+        for r in roads:
+            d = haversine_km(lon, lat, r[2], r[1])
+            if d < min_r: min_r, nearest_road = d, r
+        # nearest place
+        nearest_place, min_p = None, 1e9
+        for p in places:
+            d = haversine_km(lon, lat, p[2], p[1])
+            if d < min_p: min_p, nearest_place = d, p
+
+        label = name_tag
+        if not label and nearest_road and min_r <= 1.0:
+            label = f"{nearest_road[0]} Crossing"
+        if not label and nearest_place and min_p <= 2.0:
+            label = f"Near {nearest_place[0]} Crossing"
+        if not label:
+            label = "Level Crossing"
+
+        labelled.append((cid, label, nearest_road[0] if nearest_road else None,
+                         nearest_place[0] if nearest_place else None, dist_km))
+    return labelled
+
+def set_offsets(crossings, profile):
+    """Set each crossing's offset_min, the along-track time from the station, from its track_km."""
+    for c in crossings:
+        km = c.get("track_km")
+        c["offset_min"] = round(profile.minutes(km), 1) if km is not None else None
+
+def reprofile_cached_crossings():
+    """
+    Recompute offset_min on every cached area for the current
+    TRACK_SPEED_PROFILE. track_km does not depend on it, so nothing is
+    refetched; each area gets a new data object, so whatever was derived
+    from the old one is rebuilt.
+    """
+    profile = SpeedProfile.from_config()
+    for key in _CROSSINGS_CACHE.keys():
+        entry = _CROSSINGS_CACHE.peek(key)
+        if entry is None:
+            continue
+        crossings = [dict(c) for c in entry.value["crossings"]]
+        set_offsets(crossings, profile)
+        _CROSSINGS_CACHE.put(key, {**entry.value, "crossings": crossings}, timestamp=entry.timestamp)
+
+class OverpassUnavailable(Exception):
+    """Raised when the crossings query fails, so the failure is not cached."""
 
 class OverpassFetcher:
-    def __init__(self, city_bbox=CITY_BBOX, overpass_url=OVERPASS_URL):
+    def __init__(self, city_bbox=CITY_BBOX, overpass_url=OVERPASS_URL,
+                 station_name="Vaniyambadi", station_lat=12.68, station_lon=78.62):
         self.city_bbox = city_bbox
         self.overpass_url = overpass_url
+        self.station_name = station_name
+        self.station_lat = station_lat
+        self.station_lon = station_lon
 
-    def fetch_crossings():
-        now = time.time()
-        if _CROSSINGS_CACHE["data"] and now - _CROSSINGS_CACHE["ts"] < 3600:
-            return _CROSSINGS_CACHE["data"]
+    @classmethod
+    def for_station(cls, station_code=None):
+        """Build a fetcher for a configured station (defaults to Config.STATION_CODE)."""
+        station = Config.station(station_code or Config.STATION_CODE)
+        if station is None:
+            return None
+        return cls(city_bbox=station["bbox"], station_name=station["name"],
+                   station_lat=station["lat"], station_lon=station["lon"])
 
-        # 1) Crossings + station
-        q1 = f"""
-    [out:json][timeout:25];
-    (
-    node["railway"="level_crossing"]({CITY_BBOX});
-    node["railway"="crossing"]({CITY_BBOX});
-    node["railway"="station"]["name"~"Vaniyambadi",i]({CITY_BBOX});
-    );
-    out body;
-    """
+    @property
+    def cache_key(self):
+        return (self.city_bbox, self.station_name)
+
+    def fetch_crossings(self):
+        """Return crossings near the station, cached per bbox/station."""
         try:
-            r = requests.post(OVERPASS_URL, data=q1, timeout=25)
-            r.raise_for_status()
-            nodes = r.json().get("elements", [])
-        except Exception as e:
-            logging.warning(f"Overpass q1 failed: {e}")
-            return {"station": None, "crossings": [], "total": 0}
-
-        station = next((n for n in nodes if n.get("tags", {}).get("railway") == "station"), None)
-        st_lon = station.get("lon", 78.62) if station else 78.62
-        st_lat = station.get("lat", 12.68) if station else 12.68
-
-        raw_crossings = [
-            {
-                "id": n["id"],
-                "name_tag": n.get("tags", {}).get("name") or n.get("tags", {}).get("name:en") or None,
-                "lat": n["lat"],
-                "lon": n["lon"]
-            }
-            for n in nodes
-            if n.get("tags", {}).get("railway") in ("level_crossing", "crossing")
-        ]
+            entry = _CROSSINGS_CACHE.get_or_load(self.cache_key, self._fetch_crossings_uncached)
+        except OverpassUnavailable:
+            # Serve the expired entry if we have one rather than an empty page
+            entry = _CROSSINGS_CACHE.peek(self.cache_key)
+            if entry is None:
+                return {"station": None, "crossings": [], "total": 0}
+        return entry.value
+
+    def spatial_index(self):
+        """R-tree over this area's crossings, built once per Overpass refresh."""
+        data = self.fetch_crossings()
+        entry = _CROSSINGS_INDEXES.get(self.cache_key)
+        if entry is None or entry.value[0] is not data:
+            tree = PointRTree(data["crossings"], crossing_point)
+            entry = _CROSSINGS_INDEXES.put(self.cache_key, (data, tree))
+        return entry.value[1]
+
+    def _fetch_crossings_uncached(self):
+        bbox = self.city_bbox
+        # 1) Crossings + station, from the tiles covering the area
+        try:
+            area = crossing_tiles.query(parse_bbox(bbox))
+        except (TilesUnavailable, ValueError) as e:
+            logger.warning("Crossing tiles unavailable for %s: %s", bbox, e, extra={"fetcher": "overpass"})
+            raise OverpassUnavailable(str(e)) from e
+
+        pattern = re.compile(re.escape(self.station_name), re.I)
+        station = next((n for n in area["stations"] if pattern.search(n["name"])), None)
+        st_lon = station["lon"] if station else self.station_lon
+        st_lat = station["lat"] if station else self.station_lat
+
         # Deduplicate by proximity (and implicitly by id since id differs)
-        raw_crossings = dedupe_by_proximity(raw_crossings, threshold_m=35)
+        raw_crossings = dedupe_by_proximity(area["crossings"], threshold_m=35)
 
         # 2) Named roads and places to craft friendly labels
         q2 = f"""
     [out:json][timeout:25];
     (
-    way["highway"]["name"]({CITY_BBOX});
-    node["place"]["name"]({CITY_BBOX});
+    way["highway"]["name"]({bbox});
+    node["place"]["name"]({bbox});
     );
     out center;
     """
         roads, places = [], []
         try:
-            r2 = requests.post(OVERPASS_URL, data=q2, timeout=25)
+            # Labels are optional: out of budget just means unnamed crossings
+            budget.acquire(self.overpass_url)
+            r2 = requests.post(self.overpass_url, data=q2, timeout=25)
             r2.raise_for_status()
             for el in r2.json().get("elements", []):
                 name = (el.get("tags") or {}).get("name")
                 if not name: continue
                 if el.get("type") == "way" and el.get("center"):
-                    roads.append({"name": name, "lat": el["center"]["lat"], "lon": el["center"]["lon"]})
+                    roads.append((name, el["center"]["lat"], el["center"]["lon"]))
                 elif el.get("type") == "node" and (el.get("tags") or {}).get("place"):
-                    places.append({"name": name, "lat": el["lat"], "lon": el["lon"]})
+                    places.append((name, el["lat"], el["lon"]))
         except Exception as e:
-            logging.warning(f"Overpass q2 failed: {e}")
+            logger.warning("Overpass q2 failed: %s", e, extra={"fetcher": "overpass"})
 
-        enriched = []
+        # Label each tile's crossings as one job, in parallel when the CPU pool is on
+        by_tile = {}
         for c in raw_crossings:
-            dist_km = haversine_km(st_lon, st_lat, c["lon"], c["lat"])
-            # nearest named road
-            nearest_road, min_r = None, 1e9
-            for r in roads:
-                d = haversine_km(c["lon"], c["lat"], r["lon"], r["lat"]); 
-                if d < min_r: min_r, nearest_road = d, r
-            # nearest place
-            nearest_place, min_p = None, 1e9
-            for p in places:
-                d = haversine_km(c["lon"], c["lat"], p["lon"], p["lat"]); 
-                if d < min_p: min_p, nearest_place = d, p
-
-            label = c["name_tag"]
-            if not label and nearest_road and min_r <= 1.0:
-                label = f"{nearest_road['name']} Crossing"
-            if not label and nearest_place and min_p <= 2.0:
-                label = f"Near {nearest_place['name']} Crossing"
-            if not label:
-                label = "Level Crossing"
+            by_tile.setdefault(tile_of(c["lat"], c["lon"], crossing_tiles.size), []).append(
+                (c["id"], c["name_tag"], c["lat"], c["lon"]))
+        jobs = [cpu_pool.submit(label_crossings, rows, roads, places, st_lat, st_lon) for rows in by_tile.values()]
+        labelled = {row[0]: row for job in jobs for row in job.result()}
 
+        enriched = []
+        for c in raw_crossings:
+            _, label, road, place, dist_km = labelled[c["id"]]
             enriched.append({
                 "id": c["id"],
                 "label": label,
-                "road": nearest_road["name"] if nearest_road else None,
-                "place": nearest_place["name"] if nearest_place else None,
+                "road": road,
+                "place": place,
                 "lat": c["lat"], "lon": c["lon"],
                 "distance_km": dist_km
             })
@@ -114,13 +199,41 @@ class OverpassFetcher:
             seen.add(key)
             final.append(e)
 
+        # 3) Track geometry: along-track distance and ETA offset per crossing
+        track_km = self._track_distances(st_lat, st_lon, final)
+        for e in final:
+            km = track_km.get(e["id"])
+            e["track_km"] = round(km, 3) if km is not None else None
+        set_offsets(final, SpeedProfile.from_config())
+
         final.sort(key=lambda x: x["distance_km"])
         data = {
-            "station": {"name": (station or {}).get("tags", {}).get("name", "Vaniyambadi"),
+            "station": {"name": (station or {}).get("name", self.station_name),
                         "lat": st_lat, "lon": st_lon},
             "crossings": final,
             "total": len(final)
         }
-        _CROSSINGS_CACHE["ts"] = now
-        _CROSSINGS_CACHE["data"] = data
         return data
+
+    def _track_distances(self, st_lat, st_lon, crossings):
+        """crossing id -> km along the railway=rail ways from the station ({} if unavailable)."""
+        q3 = f"""
+    [out:json][timeout:25];
+    way["railway"="rail"]({self.city_bbox});
+    (._;>;);
+    out skel qt;
+    """
+        try:
+            # Like labels, track distances are optional: without them the
+            # straight-line distance_km is used
+            budget.acquire(self.overpass_url)
+            r3 = requests.post(self.overpass_url, data=q3, timeout=25)
+            r3.raise_for_status()
+            graph = TrackGraph.from_overpass(r3.json().get("elements", []))
+        except Exception as e:
+            logger.warning("Overpass q3 failed: %s", e, extra={"fetcher": "overpass"})
+            return {}
+        distances = graph.distances_to(st_lat, st_lon, crossings)
+        logger.info("Track graph: %d nodes, %d of %d crossings reachable", len(graph),
+                    len(distances), len(crossings), extra={"fetcher": "overpass"})
+        return distances
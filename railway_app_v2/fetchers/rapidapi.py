@@ -6,13 +6,8 @@ from typing import List, Dict, Any
 from .base import TrainDataFetcher
 from ..models import TrainETA
 from ..config import Config
+from ..ratelimit import budget
 from ..utils import now, minutes, parse_time_string, km_to_minutes
-# Configure logging
-
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 
@@ -29,26 +24,28 @@ class RapidAPIFetcher(TrainDataFetcher):
         """Fetch trains from RapidAPI."""
         try:
             url = f"https://{Config.RAPIDAPI_HOST}/api/v3/getLiveStation"
+            budget.acquire(url)
             params = {"stationCode": station_code, "hours": hours}
             
             response = requests.get(
                 url, 
                 headers=self.headers, 
                 params=params, 
-                timeout=Config.REQUEST_TIMEOUT
+                timeout=Config.value("REQUEST_TIMEOUT")
             )
             response.raise_for_status()
             
-            return self._parse_rapidapi_response(response.json())
+            return self._parse_rapidapi_response(response.json(), station_code)
             
         except requests.RequestException as e:
-            logger.error(f"Failed to fetch from RapidAPI: {e}")
+            logger.error("Failed to fetch from RapidAPI: %s", e, extra={"station": station_code, "fetcher": "rapidapi"})
             return []
     
-    def _parse_rapidapi_response(self, data: Dict[str, Any]) -> List[TrainETA]:
+    def _parse_rapidapi_response(self, data: Dict[str, Any], station_code: str = None) -> List[TrainETA]:
         """Parse RapidAPI response."""
         trains = []
         base = now()
+        speed_kmph = Config.value("AVG_SPEED_KMPH", station_code)
         
         # Try different possible data structures
         items = data.get("data") or data.get("trains") or []
@@ -70,8 +67,8 @@ class RapidAPIFetcher(TrainDataFetcher):
                 
                 # Calculate crossing ETA
                 offset_min = km_to_minutes(
-                    Config.DIST_KM_FROM_STATION,
-                    Config.AVG_SPEED_KMPH
+                    Config.value("DIST_KM_FROM_STATION", station_code),
+                    speed_kmph
                 )
                 eta_crossing = eta_station - minutes(int(offset_min))
                 
@@ -85,11 +82,11 @@ class RapidAPIFetcher(TrainDataFetcher):
                     eta_at_crossing=eta_crossing,
                     source="rapidapi",
                     delay_min=int(delay) if delay else None,
-                    speed_kmph=Config.AVG_SPEED_KMPH
+                    speed_kmph=speed_kmph
                 ))
                 
             except (ValueError, KeyError) as e:
-                logger.debug(f"Failed to parse train item: {e}")
+                logger.debug("Failed to parse train item: %s", e, extra={"throttle": 60})
                 continue
         
         return trains
\ No newline at end of file
@@ -0,0 +1,113 @@
+import os
+import re
+import bisect
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import pytz
+
+from railway_app_v2.config import Config
+from railway_app_v2.models import TrainETA
+from railway_app_v2.fetchers.base import TrainDataFetcher
+from railway_app_v2.fetchers.erail import ErailFetcher
+
+logger = logging.getLogger(__name__)
+
+# Files written by ErailFetcher when ERAIL_RECORD_DIR is set: VN-20250826T080006.txt
+RECORDING_RE = re.compile(r"^(?P<station>[A-Z0-9]+)-(?P<stamp>\d{8}T\d{6})\.txt$")
+
+
+class VirtualClock:
+    """A clock that starts at `start` and runs `speed` times faster than real time."""
+
+    def __init__(self, start: datetime, speed: float = 1.0):
+        self.start = start
+        self.speed = speed
+        self._real_start = time.time()
+
+    def now(self) -> datetime:
+        return self.start + timedelta(seconds=(time.time() - self._real_start) * self.speed)
+
+    def to_real(self, virtual: datetime) -> datetime:
+        """Wall-clock moment at which the virtual clock will read `virtual`."""
+        real_now = datetime.now(pytz.timezone('Asia/Kolkata'))
+        return real_now + (virtual - self.now()) / self.speed
+
+
+class ReplayFetcher(TrainDataFetcher):
+    """
+    Replay recorded Erail payloads on an accelerated virtual clock.
+
+    Each fetch parses the latest recording for the station taken at or
+    before the virtual "now", using that virtual time as the parse base.
+    With realtime=True the resulting ETAs are mapped back onto the wall
+    clock, so at speed=100 the app's cache, scheduler and gate countdowns
+    see a whole day of traffic pass in under 15 minutes.
+    """
+
+    def __init__(self, recordings_dir: Optional[str] = None, speed: Optional[float] = None,
+                 clock: Optional[VirtualClock] = None, realtime: bool = True):
+        self.recordings_dir = recordings_dir or Config.REPLAY_DIR
+        self.realtime = realtime
+        self.parser = ErailFetcher()
+        self.recordings = self._index(self.recordings_dir)
+        if clock is None:
+            first = min((stamps[0] for stamps, _ in self.recordings.values()), default=None)
+            clock = VirtualClock(first or datetime.now(pytz.timezone('Asia/Kolkata')),
+                                 speed if speed is not None else Config.REPLAY_SPEED)
+        self.clock = clock
+        self._payloads: Dict[str, str] = {}
+
+    @staticmethod
+    def _index(directory: str) -> Dict[str, Tuple[List[datetime], List[str]]]:
+        """station code -> (sorted recording times, matching file paths)"""
+        ist = pytz.timezone('Asia/Kolkata')
+        found: Dict[str, List[Tuple[datetime, str]]] = {}
+        try:
+            names = os.listdir(directory)
+        except OSError as e:
+            logger.warning("Replay directory %s not readable: %s", directory, e)
+            names = []
+        for name in names:
+            m = RECORDING_RE.match(name)
+            if not m:
+                continue
+            stamp = ist.localize(datetime.strptime(m.group("stamp"), "%Y%m%dT%H%M%S"))
+            found.setdefault(m.group("station"), []).append((stamp, os.path.join(directory, name)))
+        index = {}
+        for station, items in found.items():
+            items.sort()
+            index[station] = ([t for t, _ in items], [p for _, p in items])
+        logger.info("Replay: %d recordings for %d stations", sum(len(v[0]) for v in index.values()), len(index))
+        return index
+
+    def recording_for(self, station_code: str, at: datetime) -> Optional[str]:
+        """Path of the latest recording at or before `at` (or the earliest one)."""
+        stamps, paths = self.recordings.get(station_code, ([], []))
+        if not paths:
+            return None
+        i = bisect.bisect_right(stamps, at) - 1
+        return paths[max(i, 0)]
+
+    def _read(self, path: str) -> str:
+        if path not in self._payloads:
+            with open(path, encoding="utf-8") as f:
+                self._payloads[path] = f.read()
+        return self._payloads[path]
+
+    def fetch(self, station_code: str, hours: int) -> List[TrainETA]:
+        """Parse the recording current at the virtual time."""
+        virtual_now = self.clock.now()
+        path = self.recording_for(station_code, virtual_now)
+        if path is None:
+            logger.warning("Replay: no recordings for station %s", station_code, extra={"throttle": 60})
+            return []
+
+        trains = self.parser._parse_erail_response(self._read(path), station_code, hours, base=virtual_now)
+        for t in trains:
+            t.source = "replay"
+            if self.realtime:
+                t.eta_at_station = self.clock.to_real(t.eta_at_station)
+                t.eta_at_crossing = self.clock.to_real(t.eta_at_crossing)
+        return trains
@@ -1,30 +1,209 @@
-from typing import List
+import bisect
+import random
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
 
 from .base import TrainDataFetcher
 from ..config import Config
 from ..models import TrainETA
+from ..route import LINE_CHAINAGE_KM
 from ..utils import km_to_minutes, now, minutes
 
+MINUTES_PER_DAY = 24 * 60
+
+NAME_PREFIXES = ["Bengaluru", "Chennai", "Kaveri", "Lalbagh", "Brindavan", "Mysuru", "Yelagiri",
+                 "Shatabdi", "Howrah", "Island", "Mangaluru", "Kovai", "Nilgiri", "Tirupati"]
+NAME_SUFFIXES = ["Express", "Mail", "Superfast", "Passenger", "MEMU", "Intercity"]
+
+
+@dataclass
+class DelayModel:
+    """
+    Distribution of arrival delays in minutes.
+
+    kind is "none", "normal", "exponential" or "lognormal". A share of
+    trains (on_time_share) runs exactly on time; the rest draw from the
+    distribution, clipped to [min_delay, max_delay].
+    """
+    kind: str = "exponential"
+    mean: float = 6.0
+    stddev: float = 8.0
+    on_time_share: float = 0.35
+    min_delay: int = -5
+    max_delay: int = 180
+
+    def sample(self, rng: random.Random) -> int:
+        if self.kind == "none" or rng.random() < self.on_time_share:
+            return 0
+        if self.kind == "normal":
+            value = rng.gauss(self.mean, self.stddev)
+        elif self.kind == "lognormal":
+            value = rng.lognormvariate(1.0, 1.0) * self.mean / 2.7
+        else:
+            value = rng.expovariate(1.0 / self.mean) if self.mean > 0 else 0.0
+        return int(max(self.min_delay, min(self.max_delay, round(value))))
+
+
+@dataclass
+class TimetableStop:
+    """One scheduled call of a generated train at a station."""
+    train_no: str
+    name: str
+    station_code: str
+    minute_of_day: int
+    src_code: str
+    dst_code: str
+
+
+class TimetableGenerator:
+    """
+    Deterministic synthetic timetable for many trains along one line.
+
+    Stations are laid out along a line at the given chainages (km). Each
+    train runs end to end in one direction at a random speed, departing at
+    a random time of day, and calls at every station. Delays are drawn per
+    (train, service day) from the DelayModel, so repeated fetches for the
+    same day agree with each other.
+    """
+
+    def __init__(self, n_trains: int = 200, stations: Optional[Sequence[Tuple[str, float]]] = None,
+                 n_stations: int = 0, delay_model: Optional[DelayModel] = None, seed: int = 0):
+        self.seed = seed
+        self.delay_model = delay_model or DelayModel()
+        self.stations = list(stations or self.default_stations(n_stations))
+        self.stops: List[TimetableStop] = []
+        # station code -> (sorted minute_of_day list, matching stops)
+        self._by_station: Dict[str, Tuple[List[int], List[TimetableStop]]] = {}
+        self._generate(n_trains)
+
+    @staticmethod
+    def default_stations(n_stations: int = 0) -> List[Tuple[str, float]]:
+        """Configured stations at their line chainage, padded with synthetic ones every 15 km."""
+        stations = sorted(((code, LINE_CHAINAGE_KM.get(code, 0.0)) for code in Config.STATIONS),
+                          key=lambda s: s[1])
+        km = stations[-1][1] if stations else 0.0
+        while len(stations) < n_stations:
+            km += 15.0
+            stations.append((f"S{len(stations):03d}", km))
+        return stations
+
+    def _generate(self, n_trains: int):
+        rng = random.Random(self.seed)
+        first, last = self.stations[0][0], self.stations[-1][0]
+        for i in range(n_trains):
+            train_no = str(10000 + i)
+            name = f"{rng.choice(NAME_PREFIXES)} {rng.choice(NAME_SUFFIXES)}"
+            up = rng.random() < 0.5
+            route = self.stations if up else list(reversed(self.stations))
+            src, dst = (first, last) if up else (last, first)
+            speed = rng.uniform(Config.MIN_SPEED_KMPH, Config.MAX_SPEED_KMPH)
+            t = rng.uniform(0, MINUTES_PER_DAY)
+            prev_km = route[0][1]
+            for code, km in route:
+                t += km_to_minutes(abs(km - prev_km), speed)
+                prev_km = km
+                self.stops.append(TimetableStop(train_no, name, code, int(t) % MINUTES_PER_DAY, src, dst))
+                t += rng.choice((1, 2, 2, 5))  # dwell
+
+        grouped: Dict[str, List[TimetableStop]] = {}
+        for stop in self.stops:
+            grouped.setdefault(stop.station_code, []).append(stop)
+        for code, stops in grouped.items():
+            stops.sort(key=lambda s: s.minute_of_day)
+            self._by_station[code] = ([s.minute_of_day for s in stops], stops)
+
+    def delay_for(self, train_no: str, service_day: int) -> int:
+        digest = hashlib.blake2b(f"{self.seed}:{train_no}:{service_day}".encode(), digest_size=8).digest()
+        return self.delay_model.sample(random.Random(digest))
+
+    def stops_at(self, station_code: str) -> List[TimetableStop]:
+        return self._by_station.get(station_code, ([], []))[1]
+
+    def upcoming(self, station_code: str, base, hours: float) -> List[TrainETA]:
+        """Trains reaching the station's crossing within `hours` of base."""
+        offsets, stops = self._by_station.get(station_code, ([], []))
+        if not stops:
+            return []
+        day_start = base.replace(hour=0, minute=0, second=0, microsecond=0)
+        now_min = (base - day_start).total_seconds() / 60
+        horizon = now_min + hours * 60
+        # Delays can pull a train into the window from just before it
+        lo = now_min + self.delay_model.min_delay - self.delay_model.max_delay
+        offset_min = int(round(km_to_minutes(Config.value("DIST_KM_FROM_STATION", station_code),
+                                             Config.value("AVG_SPEED_KMPH", station_code))))
+        trains = []
+        hi = horizon + offset_min - self.delay_model.min_delay
+        day = int(lo // MINUTES_PER_DAY)
+        while day * MINUTES_PER_DAY <= hi:
+            start = bisect.bisect_left(offsets, lo - day * MINUTES_PER_DAY)
+            for stop in stops[start:]:
+                scheduled = day * MINUTES_PER_DAY + stop.minute_of_day
+                if scheduled > hi:
+                    break
+                service_day = day_start.toordinal() + day
+                delay = self.delay_for(stop.train_no, service_day)
+                eta_station = day_start + minutes(scheduled + delay)
+                eta_crossing = eta_station - minutes(offset_min)
+                if base <= eta_crossing <= base + minutes(int(hours * 60)):
+                    trains.append(TrainETA(
+                        train_no=stop.train_no,
+                        name=stop.name,
+                        eta_at_station=eta_station,
+                        eta_at_crossing=eta_crossing,
+                        source="simulated",
+                        delay_min=delay or None,
+                        speed_kmph=Config.AVG_SPEED_KMPH,
+                        src_code=stop.src_code,
+                        dst_code=stop.dst_code
+                    ))
+            day += 1
+        trains.sort(key=lambda t: t.eta_at_crossing)
+        return trains
+
+    def to_erail_payload(self, station_code: str, generated_at=None) -> str:
+        """Render a station's timetable in Erail getTrains.aspx format."""
+        generated_at = generated_at or now()
+        g = generated_at
+        records = [f"~{station_code}~{station_code}~~~~{g.year}-{g.month}-{g.day}-{g.hour}-{g.minute}-{g.second}~~~"]
+        for stop in self.stops_at(station_code):
+            arrives = datetime.min + timedelta(minutes=stop.minute_of_day)
+            departs = arrives + timedelta(minutes=2)  # Rolls the hour (and midnight) over
+            fields = [stop.train_no, stop.name, stop.src_code, stop.src_code, stop.dst_code, stop.dst_code,
+                      "", "", stop.dst_code, stop.dst_code, arrives.strftime("%H.%M"),
+                      departs.strftime("%H.%M"), "01.00", "1111111"]
+            records.append("~".join(fields + [""] * 16))
+        return "^".join(records)
+
+
 class SimulationFetcher(TrainDataFetcher):
     """Simulated train data for testing."""
-    
+
+    def __init__(self, generator: Optional[TimetableGenerator] = None):
+        self.generator = generator
+
     def fetch(self, station_code: str, hours: int) -> List[TrainETA]:
         """Return simulated trains."""
         base = now()
+        if self.generator is not None:
+            return self.generator.upcoming(station_code, base, hours)
+
         samples = [
             ("12658", "Bengaluru Mail", 8, 0),
             ("22691", "Rajdhani Express", 15, 5),
             ("12864", "Howrah Express", 25, -2),
             ("16525", "Island Express", 35, 0),
         ]
-        
+
         trains = []
         for train_no, name, minutes_to_station, delay in samples:
             if minutes_to_station <= hours * 60:
                 eta_station = base + minutes(minutes_to_station)
-                offset_min = km_to_minutes(Config.DIST_KM_FROM_STATION, Config.AVG_SPEED_KMPH)
+                offset_min = km_to_minutes(Config.value("DIST_KM_FROM_STATION", station_code),
+                                           Config.value("AVG_SPEED_KMPH", station_code))
                 eta_crossing = eta_station - minutes(int(offset_min))
-                
+
                 trains.append(TrainETA(
                     train_no=train_no,
                     name=name,
@@ -34,5 +213,5 @@ class SimulationFetcher(TrainDataFetcher):
                     delay_min=delay if delay != 0 else None,
                     speed_kmph=Config.AVG_SPEED_KMPH
                 ))
-        
+
         return trains
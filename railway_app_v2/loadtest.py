@@ -0,0 +1,350 @@
+"""
+Offline load-test harness.
+
+Starts local stand-ins for Erail (ErailFetcher.ERAIL_URL) and Overpass
+(OVERPASS_URL) that serve recorded or synthetic payloads with configurable
+latency and error injection, boots the app under gunicorn pointed at them,
+and drives /trains, /api/trains and /crossings with many concurrent clients.
+
+    python -m railway_app_v2.loadtest --clients 500 --duration 60
+    python -m railway_app_v2.loadtest --erail-latency 20 --erail-error-rate 0.1
+    python -m railway_app_v2.loadtest --app-url http://127.0.0.1:5000 --no-standins
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import logging
+import argparse
+import threading
+import subprocess
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+from railway_app_v2.fetchers.simulation import TimetableGenerator
+from railway_app_v2.logsetup import configure_logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATHS = {"/trains": 4, "/api/trains": 5, "/crossings": 1}
+
+
+def synthetic_erail_payload(station_code: str = "VN", n_trains: int = 120) -> str:
+    """Erail getTrains.aspx-shaped text for a synthetic daily timetable."""
+    generator = TimetableGenerator(n_trains=n_trains, stations=[(station_code, 0.0)],
+                                   seed=sum(map(ord, station_code)))
+    return generator.to_erail_payload(station_code)
+
+
+def synthetic_overpass_payload(query: str, n_crossings: int = 40) -> dict:
+    """
+    Overpass-shaped JSON: crossings + station for q1, railway=rail ways for
+    the track query and roads + places for q2.
+
+    The crossings sit on one straight line of track through the station, so
+    the track query finds every one of them.
+    """
+    rng = random.Random(n_crossings)
+    lat0, lon0 = 12.68, 78.62
+    station = {"type": "node", "id": 1, "lat": lat0, "lon": lon0,
+               "tags": {"railway": "station", "name": "Vaniyambadi"}}
+    offsets = [rng.uniform(-0.07, 0.07) for _ in range(n_crossings)]
+    crossings = [{"type": "node", "id": 1000 + i, "lat": lat0 + t, "lon": lon0 + t,
+                  "tags": {"railway": "level_crossing"}} for i, t in enumerate(offsets)]
+    elements = []
+    if '"railway"="rail"' in query:
+        track = sorted([(0.0, station)] + list(zip(offsets, crossings)), key=lambda p: p[0])
+        elements.append({"type": "way", "id": 20000, "nodes": [node["id"] for _, node in track]})
+        elements.extend({"type": "node", "id": node["id"], "lat": node["lat"], "lon": node["lon"]}
+                        for _, node in track)
+    elif "level_crossing" in query:
+        elements = [station] + crossings
+    else:
+        for i in range(n_crossings):
+            lat, lon = lat0 + rng.uniform(-0.07, 0.07), lon0 + rng.uniform(-0.07, 0.07)
+            elements.append({"type": "way", "id": 5000 + i, "center": {"lat": lat, "lon": lon},
+                             "tags": {"highway": "residential", "name": f"Road {i}"}})
+            elements.append({"type": "node", "id": 9000 + i, "lat": lat, "lon": lon,
+                             "tags": {"place": "village", "name": f"Village {i}"}})
+    return {"elements": elements}
+
+
+class StandInServer:
+    """
+    Local HTTP stand-in for an upstream service.
+
+    respond(method, path, body) returns (status, content_type, bytes). Each
+    request sleeps latency +/- jitter seconds and fails with a 503 with
+    probability error_rate.
+    """
+
+    def __init__(self, name, respond, latency=0.0, jitter=0.0, error_rate=0.0, port=0):
+        self.name = name
+        self.respond = respond
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.hits = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StandInServer":
+        self._thread.start()
+        logger.info("%s stand-in listening on %s", self.name, self.url)
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler_class(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _handle(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length).decode("utf-8", "replace") if length else ""
+                delay = max(0.0, stand_in.latency + random.uniform(-stand_in.jitter, stand_in.jitter))
+                time.sleep(delay)
+                with stand_in._lock:
+                    stand_in.hits += 1
+                    failed = random.random() < stand_in.error_rate
+                    stand_in.errors += failed
+                if failed:
+                    status, ctype, payload = 503, "text/plain", b"injected failure"
+                else:
+                    status, ctype, payload = stand_in.respond(self.command, self.path, body)
+                self.send_response(status)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                try:
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # client gave up (e.g. its timeout fired)
+
+            do_GET = _handle
+            do_POST = _handle
+
+            def log_message(self, fmt, *args):
+                pass
+
+        return Handler
+
+
+def erail_stand_in(recorded: Optional[str] = None, n_trains: int = 120, **kwargs) -> StandInServer:
+    payloads: Dict[str, bytes] = {}
+
+    def respond(method, path, body):
+        from urllib.parse import urlparse, parse_qs
+        station = (parse_qs(urlparse(path).query).get("Station_From") or ["VN"])[0]
+        if station not in payloads:
+            text = recorded if recorded is not None else synthetic_erail_payload(station, n_trains)
+            payloads[station] = text.encode("utf-8")
+        return 200, "text/plain; charset=utf-8", payloads[station]
+
+    return StandInServer("erail", respond, **kwargs)
+
+
+def overpass_stand_in(recorded: Optional[dict] = None, n_crossings: int = 40, **kwargs) -> StandInServer:
+    def respond(method, path, body):
+        from urllib.parse import unquote_plus
+        query = unquote_plus(body)
+        data = recorded if recorded is not None else synthetic_overpass_payload(query, n_crossings)
+        return 200, "application/json", json.dumps(data).encode("utf-8")
+
+    return StandInServer("overpass", respond, **kwargs)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_gunicorn(env: Dict[str, str], workers: int, threads: int,
+                   worker_class: str, timeout: int) -> Tuple[subprocess.Popen, str]:
+    """Boot app:app under gunicorn and wait until it accepts connections."""
+    port = _free_port()
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    cmd = [sys.executable, "-m", "gunicorn", "app:app", "--bind", f"127.0.0.1:{port}",
+           "--workers", str(workers), "--threads", str(threads),
+           "--worker-class", worker_class, "--timeout", str(timeout)]
+    proc = subprocess.Popen(cmd, cwd=root, env={**os.environ, **env})
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with status {proc.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return proc, f"http://127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("gunicorn did not start within 30s")
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100.0
+    lo, hi = int(k), min(int(k) + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+class LoadResult:
+    """Latency samples and status counts per path."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.elapsed = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, path: str, seconds: float, status: str):
+        with self._lock:
+            self.latencies[path].append(seconds)
+            self.statuses[path][status] += 1
+
+    def report(self) -> str:
+        lines = [f"{'path':<14}{'reqs':>8}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}  statuses"]
+        all_samples = []
+        for path in sorted(self.latencies):
+            samples = sorted(self.latencies[path])
+            all_samples.extend(samples)
+            lines.append(self._row(path, samples, dict(self.statuses[path])))
+        lines.append(self._row("TOTAL", sorted(all_samples), None))
+        return "\n".join(lines)
+
+    def _row(self, label, samples, statuses):
+        rps = len(samples) / self.elapsed if self.elapsed else 0.0
+        ms = [percentile(samples, p) * 1000 for p in (50, 95, 99, 100)]
+        tail = "  " + ", ".join(f"{k}={v}" for k, v in sorted(statuses.items())) if statuses else ""
+        return f"{label:<14}{len(samples):>8}{rps:>9.1f}{ms[0]:>10.1f}{ms[1]:>10.1f}{ms[2]:>10.1f}{ms[3]:>10.1f}{tail}"
+
+
+def drive(app_url: str, clients: int, duration: float, paths: Dict[str, int],
+          timeout: float, think_time: float = 0.0) -> LoadResult:
+    """Run `clients` concurrent viewers against app_url for `duration` seconds."""
+    result = LoadResult()
+    weighted = [p for p, w in paths.items() for _ in range(w)]
+    stop_at = time.time() + duration
+
+    def client(idx: int):
+        rng = random.Random(idx)
+        session = requests.Session()
+        while time.time() < stop_at:
+            path = rng.choice(weighted)
+            started = time.perf_counter()
+            try:
+                status = str(session.get(app_url + path, timeout=timeout).status_code)
+            except requests.Timeout:
+                status = "timeout"
+            except requests.RequestException as e:
+                status = type(e).__name__
+            result.record(path, time.perf_counter() - started, status)
+            if think_time:
+                time.sleep(rng.uniform(0, 2 * think_time))
+
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(client, range(clients)))
+    result.elapsed = time.time() - started
+    return result
+
+
+def _load_recorded(path: Optional[str], as_json: bool):
+    if not path:
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f) if as_json else f.read()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Offline load test for the RailGate app")
+    parser.add_argument("--clients", type=int, default=100, help="concurrent simulated viewers")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to drive load")
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean pause between a client's requests")
+    parser.add_argument("--timeout", type=float, default=30, help="client request timeout")
+    parser.add_argument("--paths", default=None,
+                        help="comma list of path[=weight], default /trains=4,/api/trains=5,/crossings=1")
+    parser.add_argument("--app-url", default=None, help="drive an already running app instead of gunicorn")
+    parser.add_argument("--no-standins", action="store_true", help="do not start upstream stand-ins")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--worker-class", default="gthread")
+    parser.add_argument("--gunicorn-timeout", type=int, default=60)
+    parser.add_argument("--erail-payload", help="recorded Erail response text to serve")
+    parser.add_argument("--erail-trains", type=int, default=120, help="synthetic trains per station")
+    parser.add_argument("--erail-latency", type=float, default=0.3)
+    parser.add_argument("--erail-jitter", type=float, default=0.1)
+    parser.add_argument("--erail-error-rate", type=float, default=0.0)
+    parser.add_argument("--overpass-payload", help="recorded Overpass JSON to serve")
+    parser.add_argument("--overpass-crossings", type=int, default=40)
+    parser.add_argument("--overpass-latency", type=float, default=1.0)
+    parser.add_argument("--overpass-jitter", type=float, default=0.3)
+    parser.add_argument("--overpass-error-rate", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    configure_logging()
+
+    paths = DEFAULT_PATHS
+    if args.paths:
+        paths = {}
+        for item in args.paths.split(","):
+            path, _, weight = item.partition("=")
+            paths[path.strip()] = int(weight or 1)
+
+    stand_ins, proc = [], None
+    try:
+        env = {}
+        if not args.no_standins:
+            erail = erail_stand_in(_load_recorded(args.erail_payload, False), args.erail_trains,
+                                   latency=args.erail_latency, jitter=args.erail_jitter,
+                                   error_rate=args.erail_error_rate).start()
+            overpass = overpass_stand_in(_load_recorded(args.overpass_payload, True), args.overpass_crossings,
+                                         latency=args.overpass_latency, jitter=args.overpass_jitter,
+                                         error_rate=args.overpass_error_rate).start()
+            stand_ins = [erail, overpass]
+            env = {"ERAIL_URL": erail.url + "/rail/getTrains.aspx",
+                   "OVERPASS_URL": overpass.url + "/api/interpreter"}
+
+        app_url = args.app_url
+        if not app_url:
+            proc, app_url = start_gunicorn(env, args.workers, args.threads,
+                                           args.worker_class, args.gunicorn_timeout)
+
+        logger.info("Driving %s with %d clients for %ss", app_url, args.clients, args.duration)
+        result = drive(app_url, args.clients, args.duration, paths, args.timeout, args.think_time)
+        print()
+        print(result.report())
+        for s in stand_ins:
+            print(f"{s.name} stand-in: {s.hits} upstream requests, {s.errors} injected errors")
+        return 0
+    finally:
+        if proc is not None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        for s in stand_ins:
+            s.stop()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""
+Process-wide logging, configured once at startup by the entry point.
+
+Request and refresh threads only put records on a queue; a background
+QueueListener formats and writes them, so handler I/O never lands on a
+request thread. Call sites pass structured fields and hot-path controls
+through `extra`:
+
+    logger.info("Fetched %d trains", n, extra={"station": "VN", "fetcher": "erail",
+                                              "duration_ms": 84})
+    logger.debug("Skipping record %s", no, extra={"throttle": 60})  # At most once a minute
+    logger.info("Cache hit for %s", code, extra={"sample": 0.01})   # 1% of calls
+"""
+
+import os
+import sys
+import copy
+import json
+import time
+import queue
+import atexit
+import random
+import logging
+import threading
+import logging.handlers
+from typing import Dict, Optional, Tuple
+
+
+# Attributes every LogRecord has; anything else came from `extra`
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+_CONTROL_ATTRS = {"throttle", "sample"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_lock = threading.Lock()
+
+
+def structured_fields(record: logging.LogRecord) -> Dict:
+    return {k: v for k, v in vars(record).items()
+            if k not in _STANDARD_ATTRS and k not in _CONTROL_ATTRS}
+
+
+class StructuredFormatter(logging.Formatter):
+    """The usual text line followed by key=value for each structured field."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = structured_fields(record)
+        if fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        return line
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line, for log shippers."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        doc = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            **structured_fields(record),
+        }
+        if record.exc_info:
+            doc["exc"] = self.formatException(record.exc_info)
+        return json.dumps(doc, default=str)
+
+
+class HotPathFilter(logging.Filter):
+    """
+    Apply the `throttle` and `sample` extras before a record is queued.
+
+    Throttling is keyed by logger and message template (not the formatted
+    message), so "Skipping train %s" is one key however many trains are
+    skipped; the next record let through carries the suppressed count.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._last: Dict[Tuple[str, str], Tuple[float, int]] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        sample = getattr(record, "sample", None)
+        if sample is not None and random.random() >= sample:
+            return False
+        interval = getattr(record, "throttle", None)
+        if interval is None:
+            return True
+        key = (record.name, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            last, suppressed = self._last.get(key, (None, 0))
+            if last is not None and now - last < interval:
+                self._last[key] = (last, suppressed + 1)
+                return False
+            self._last[key] = (now, 0)
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+# Arguments that cannot change between the log call and the listener formatting the record
+_IMMUTABLE_ARGS = (str, bytes, int, float, bool, type(None))
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue records for the listener to format where that is safe.
+
+    When every argument is an immutable primitive, the record goes through
+    as it is and msg % args is only evaluated on the listener thread. Any
+    other argument (a dict, a list, an object whose __str__ takes locks)
+    could change or fail by the time the listener reads it, so those
+    messages are merged here, as the stock prepare() does, on a copy.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        args = record.args
+        if not args or (isinstance(args, tuple) and all(isinstance(a, _IMMUTABLE_ARGS) for a in args)):
+            return record
+        record = copy.copy(record)  # Other handlers may still need the original
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def configure_logging(level: Optional[str] = None, fmt: Optional[str] = None,
+                      stream=None, force: bool = False) -> Optional[logging.handlers.QueueListener]:
+    """
+    Route all logging through a queue to one background writer.
+
+    Safe to call more than once; only the first call configures anything.
+    Like basicConfig, it leaves a root logger that a host (gunicorn
+    --log-config, pytest) already configured alone unless force is set.
+    level defaults to $LOG_LEVEL (INFO) and fmt to $LOG_FORMAT (text or json).
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return _listener
+        root = logging.getLogger()
+        if root.handlers and not force:
+            return None
+
+        level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+        fmt = fmt or os.getenv("LOG_FORMAT", "text")
+        handler = logging.StreamHandler(stream or sys.stderr)
+        if fmt == "json":
+            handler.setFormatter(JSONFormatter())
+        else:
+            handler.setFormatter(StructuredFormatter("%(asctime)s - %(levelname)s - %(name)s - %(message)s"))
+
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        queue_handler = DeferredQueueHandler(log_queue)
+        queue_handler.addFilter(HotPathFilter())
+
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(queue_handler)
+        root.setLevel(level)
+
+        _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+        return _listener
@@ -5,14 +5,46 @@ from datetime import datetime
 
 from .models import TrainETA
 from .config import Config, DataSource
+from .ratelimit import Priority, upstream_priority
+from .logsetup import configure_logging
 
 from .fetchers.base import TrainDataFetcher
-from .fetchers.simulation import SimulationFetcher
+from .fetchers.simulation import SimulationFetcher, TimetableGenerator, DelayModel
 from .fetchers.rapidapi import RapidAPIFetcher
 from .fetchers.erail import ErailFetcher
+from .fetchers.replay import ReplayFetcher
 
 logger = logging.getLogger(__name__)
 
+
+def create_fetcher(source: DataSource = None) -> TrainDataFetcher:
+    """Build the fetcher for a data source (defaults to Config.DATA_SOURCE)."""
+    source = source or Config.DATA_SOURCE
+    if source == DataSource.SIMULATE:
+        logger.info("Using simulated data")
+        generator = None
+        if Config.SIM_TRAINS:
+            generator = TimetableGenerator(
+                n_trains=Config.SIM_TRAINS,
+                n_stations=Config.SIM_STATIONS,
+                delay_model=DelayModel(kind=Config.SIM_DELAY, mean=Config.SIM_DELAY_MEAN_MIN),
+                seed=Config.SIM_SEED
+            )
+        return SimulationFetcher(generator)
+    elif source == DataSource.RAPIDAPI:
+        logger.info("Using RapidAPI data source")
+        return RapidAPIFetcher()
+    elif source == DataSource.ERAIL:
+        logger.info("Using Erail data source")
+        return ErailFetcher()
+    elif source == DataSource.REPLAY:
+        logger.info("Replaying recorded Erail data from %s at %sx", Config.REPLAY_DIR, Config.REPLAY_SPEED)
+        return ReplayFetcher()
+    else:
+        logger.warning("Unknown data source, falling back to simulation")
+        return SimulationFetcher()
+
+
 class RailwayCrossingApp:
     """Main application class."""
     
@@ -20,30 +52,20 @@ class RailwayCrossingApp:
         self.fetcher = self._get_fetcher()
     
     def _get_fetcher(self) -> TrainDataFetcher:
-        if Config.DATA_SOURCE == DataSource.SIMULATE:
-            logger.info("Using simulated data")
-            return SimulationFetcher()
-        elif Config.DATA_SOURCE == DataSource.RAPIDAPI:
-            logger.info("Using RapidAPI data source")
-            return RapidAPIFetcher()
-        elif Config.DATA_SOURCE == DataSource.ERAIL:
-            logger.info("Using Erail data source")
-            return ErailFetcher()
-        else:
-            logger.warning("Unknown data source, falling back to simulation")
-            return SimulationFetcher()
+        return create_fetcher()
     
     def fetch_trains(self) -> List[TrainETA]:
-        for attempt in range(Config.MAX_RETRIES):
+        retries = Config.value("MAX_RETRIES")
+        for attempt in range(retries):
             try:
                 trains = self.fetcher.fetch(Config.STATION_CODE, Config.WINDOW_HOURS)
                 current_time = datetime.now()
                 valid_trains = [t for t in trains if t.eta_at_crossing >= current_time]
-                logger.info(f"Fetched {len(valid_trains)} upcoming trains")
+                logger.info("Fetched %d upcoming trains", len(valid_trains), extra={"station": Config.STATION_CODE})
                 return valid_trains   # ✅ FIX
             except Exception as e:
-                logger.error(f"Fetch attempt {attempt + 1} failed: {e}")
-                if attempt < Config.MAX_RETRIES - 1:
+                logger.error("Fetch attempt %d failed: %s", attempt + 1, e)
+                if attempt < retries - 1:
                     time.sleep(2 ** attempt)
         logger.error("All fetch attempts failed, returning empty list")
         return []
@@ -54,7 +76,7 @@ class RailwayCrossingApp:
             for t in trains:
                 print(f"{t.train_no} {t.name} ETA at crossing: {t.eta_at_crossing}")
         except Exception as e:
-            logger.error(f"Error in run cycle: {e}")
+            logger.error("Error in run cycle: %s", e)
             print(f"\nError updating status: {e}")
     
     def run_loop(self):
@@ -63,17 +85,16 @@ class RailwayCrossingApp:
         print("Press Ctrl+C to stop\n")
         try:
             while True:
-                self.run_once()
+                # Polling is never user-blocking: yield the upstream budget to the web app
+                with upstream_priority(Priority.BACKGROUND):
+                    self.run_once()
                 time.sleep(Config.POLL_INTERVAL_SECS)
         except KeyboardInterrupt:
             print("\n\n👋 Monitoring stopped by user")
             logger.info("Application stopped by user")
 
 def main():
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s"
-    )
+    configure_logging()
     if not Config.validate():
         print("Configuration validation failed. Please check settings.")
         return 1
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from dataclasses import dataclass, field
 from enum import Enum
 
@@ -13,6 +13,13 @@ class TrainETA:
     source: str
     delay_min: Optional[int] = None
     speed_kmph: Optional[float] = None
+    # Route as reported by the source (station codes), when available
+    src_code: Optional[str] = None
+    dst_code: Optional[str] = None
+    via_code: Optional[str] = None
+    # Set when eta_* were shifted by the delay predictor (timetable-only sources)
+    predicted_delay_min: Optional[int] = None
+    eta_range: Optional[Tuple[datetime, datetime]] = None  # 10th-90th percentile crossing ETA
     
     def minutes_to_crossing(self) -> int:
         """Calculate minutes until train reaches crossing."""
@@ -40,3 +47,4 @@ class DataSource(Enum):
     SIMULATE = "simulate"
     RAPIDAPI = "rapidapi"
     ERAIL = "erail"
+    REPLAY = "replay"
@@ -0,0 +1,98 @@
+"""
+Composable generator stages for train records.
+
+Fetchers yield TrainETA records lazily (TrainDataFetcher.iter_fetch) and
+views are built by chaining stages, e.g. for the next 10 trains across
+several stations:
+
+    ingest([fetcher.iter_fetch(code, 2) for code in codes], start=now, limit=10)
+
+Each source is sorted at most once; sorted sources are k-way merged with a
+heap, so a "next N" query stops pulling records once N have been produced.
+"""
+
+import heapq
+import itertools
+from datetime import datetime
+from typing import Callable, Iterable, Iterator, Optional, Sequence
+
+from .models import TrainETA
+
+
+def by_crossing_eta(train: TrainETA) -> datetime:
+    return train.eta_at_crossing
+
+
+def window(records: Iterable[TrainETA], start: Optional[datetime] = None,
+           end: Optional[datetime] = None) -> Iterator[TrainETA]:
+    """Records whose crossing ETA lies in [start, end] (either bound optional)."""
+    for t in records:
+        if start is not None and t.eta_at_crossing < start:
+            continue
+        if end is not None and t.eta_at_crossing > end:
+            continue
+        yield t
+
+
+def until(records: Iterable[TrainETA], end: Optional[datetime]) -> Iterator[TrainETA]:
+    """Stop at the first record past end; only valid on ETA-sorted input."""
+    if end is None:
+        yield from records
+        return
+    for t in records:
+        if t.eta_at_crossing > end:
+            return
+        yield t
+
+
+def ordered(records: Iterable[TrainETA]) -> Iterator[TrainETA]:
+    """Sort one unsorted source by crossing ETA (the only full sort it gets)."""
+    return iter(sorted(records, key=by_crossing_eta))
+
+
+def merge(streams: Sequence[Iterable], key: Callable = by_crossing_eta) -> Iterator:
+    """Heap-based k-way merge of streams sorted by key; consumes them lazily."""
+    if len(streams) == 1:
+        return iter(streams[0])
+    return heapq.merge(*streams, key=key)
+
+
+def dedupe(records: Iterable[TrainETA]) -> Iterator[TrainETA]:
+    """
+    Drop repeats of (train_no, crossing minute) from an ETA-sorted stream.
+
+    Duplicates share a minute, so only the keys of the current minute are
+    remembered and memory stays bounded however long the stream is. The
+    first (earliest) record of each key wins.
+    """
+    minute, seen = None, set()
+    for t in records:
+        m = t.eta_at_crossing.replace(second=0, microsecond=0)
+        if m != minute:
+            minute, seen = m, set()
+        if t.train_no in seen:
+            continue
+        seen.add(t.train_no)
+        yield t
+
+
+def take(records: Iterable, limit: Optional[int]) -> Iterator:
+    """The first limit records (all when limit is None), then stop pulling."""
+    return iter(records) if limit is None else itertools.islice(records, limit)
+
+
+def ingest(sources: Sequence[Iterable[TrainETA]], start: Optional[datetime] = None,
+           end: Optional[datetime] = None, limit: Optional[int] = None,
+           presorted: bool = False) -> Iterator[TrainETA]:
+    """
+    One ETA-ordered, de-duplicated view over several sources.
+
+    Unsorted sources are window-filtered before their single sort so
+    out-of-window records are never sorted; presorted sources (cached
+    snapshots) are only cut at the window bounds, lazily.
+    """
+    if presorted:
+        streams = [until(window(s, start=start), end) for s in sources]
+    else:
+        streams = [ordered(window(s, start, end)) for s in sources]
+    return take(dedupe(merge(streams)), limit)
@@ -0,0 +1,288 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import replace
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import pytz
+
+from .config import Config
+from .models import TrainETA
+
+logger = logging.getLogger(__name__)
+
+IST = pytz.timezone('Asia/Kolkata')
+
+# Observations needed before a train's (or bucket's) statistics are trusted
+MIN_OBSERVATIONS = 3
+# Pseudo-count weighting the weekday/hour bucket against a train's own history
+BUCKET_PRIOR_WEIGHT = 5.0
+
+
+class P2Quantile:
+    """
+    Streaming quantile estimate with the P-squared algorithm (Jain & Chlamtac).
+
+    Keeps five markers regardless of how many values are added, so memory
+    and update cost are constant.
+    """
+    __slots__ = ("p", "count", "q", "n", "np", "dn")
+
+    def __init__(self, p: float):
+        self.p = p
+        self.count = 0
+        self.q: List[float] = []
+        self.n = [1, 2, 3, 4, 5]
+        self.np = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self.dn = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def add(self, x: float):
+        self.count += 1
+        q, n = self.q, self.n
+        if len(q) < 5:
+            q.append(x)
+            q.sort()
+            return
+
+        if x < q[0]:
+            q[0], k = x, 0
+        elif x >= q[4]:
+            q[4], k = x, 3
+        else:
+            k = 0
+            while k < 3 and x >= q[k + 1]:
+                k += 1
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.np[i] += self.dn[i]
+
+        for i in (1, 2, 3):
+            d = self.np[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                qp = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+                if not q[i - 1] < qp < q[i + 1]:
+                    qp = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = qp
+                n[i] += d
+
+    def value(self) -> Optional[float]:
+        if not self.q:
+            return None
+        if len(self.q) < 5:
+            return self.q[int(round(self.p * (len(self.q) - 1)))]
+        return self.q[2]
+
+    def to_list(self) -> list:
+        return [self.count, [round(v, 3) for v in self.q], self.n, [round(v, 4) for v in self.np]]
+
+    @classmethod
+    def from_list(cls, p: float, data: list) -> "P2Quantile":
+        est = cls(p)
+        est.count, est.q, est.n, est.np = data[0], list(data[1]), list(data[2]), list(data[3])
+        return est
+
+
+class DelayStats:
+    """EWMA mean/variance plus 10th and 90th percentile sketches of delays (minutes)."""
+    __slots__ = ("count", "mean", "var", "low", "high")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.var = 0.0
+        self.low = P2Quantile(0.1)
+        self.high = P2Quantile(0.9)
+
+    def add(self, delay: float, alpha: float):
+        self.count += 1
+        if self.count == 1:
+            self.mean = delay
+        else:
+            diff = delay - self.mean
+            self.mean += alpha * diff
+            self.var = (1 - alpha) * (self.var + alpha * diff * diff)
+        self.low.add(delay)
+        self.high.add(delay)
+
+    def band(self) -> Tuple[float, float]:
+        low, high = self.low.value(), self.high.value()
+        spread = self.var ** 0.5
+        return (low if low is not None else self.mean - spread,
+                high if high is not None else self.mean + spread)
+
+    def to_list(self) -> list:
+        return [self.count, round(self.mean, 3), round(self.var, 3), self.low.to_list(), self.high.to_list()]
+
+    @classmethod
+    def from_list(cls, data: list) -> "DelayStats":
+        stats = cls()
+        stats.count, stats.mean, stats.var = data[0], data[1], data[2]
+        stats.low = P2Quantile.from_list(0.1, data[3])
+        stats.high = P2Quantile.from_list(0.9, data[4])
+        return stats
+
+
+class DelayPredictor:
+    """
+    Learn per-train and per weekday/hour delay statistics online.
+
+    observe_trains() learns from reported delays (RapidAPI delay_min) or,
+    for timetable-only sources, from how far a run's ETA at a station has
+    drifted since it was first seen. Each observation is O(1). Per-train
+    statistics and per-run drift tracking are LRUs bounded by max_trains;
+    the 7x24 buckets are fixed.
+
+    apply() shifts timetable-only ETAs by the predicted delay and attaches a
+    10th-90th percentile band.
+    """
+
+    def __init__(self, max_trains: int = Config.PREDICTOR_MAX_TRAINS, alpha: float = 0.2,
+                 path: Optional[str] = Config.PREDICTOR_STATE_PATH,
+                 save_interval_secs: float = 300):
+        self.max_trains = max_trains
+        self.alpha = alpha
+        self.path = path
+        self.save_interval_secs = save_interval_secs
+        self.trains: "OrderedDict[str, DelayStats]" = OrderedDict()
+        # (station, train_no) -> [service date, first ETA seen (epoch), last shift (min)]
+        self.runs: "OrderedDict[Tuple[str, str], list]" = OrderedDict()
+        self.buckets: Dict[Tuple[int, int], DelayStats] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_save = time.time()
+        if path:
+            self.load()
+
+    @staticmethod
+    def bucket_key(when: datetime) -> Tuple[int, int]:
+        local = when.astimezone(IST)
+        return local.weekday(), local.hour
+
+    def _lru(self, table: OrderedDict, key, make):
+        # Caller holds self._lock
+        value = table.get(key)
+        if value is None:
+            value = table[key] = make()
+            if len(table) > self.max_trains:
+                table.popitem(last=False)
+        else:
+            table.move_to_end(key)
+        return value
+
+    def observe(self, train_no: str, scheduled: datetime, delay_min: float):
+        """Record one observed delay for a train run scheduled at `scheduled`."""
+        with self._lock:
+            self._lru(self.trains, train_no, DelayStats).add(delay_min, self.alpha)
+            self.buckets.setdefault(self.bucket_key(scheduled), DelayStats()).add(delay_min, self.alpha)
+            self._dirty = True
+
+    def observe_trains(self, station_code: str, trains: List[TrainETA]):
+        """Learn from one station refresh's raw (unadjusted) trains."""
+        for t in trains:
+            if t.delay_min is not None:
+                self.observe(t.train_no, t.eta_at_station - timedelta(minutes=t.delay_min), t.delay_min)
+                continue
+            eta = t.eta_at_station.timestamp()
+            run_day = t.eta_at_station.astimezone(IST).date()
+            with self._lock:
+                run = self._lru(self.runs, (station_code, t.train_no), lambda: [None, None, None])
+                if run[0] != run_day:
+                    run[:] = [run_day, eta, None]
+                    continue
+                shift = round((eta - run[1]) / 60.0)
+                if shift == 0 or shift == run[2]:
+                    continue
+                run[2] = shift
+            self.observe(t.train_no, t.eta_at_station - timedelta(minutes=shift), shift)
+        self.maybe_save()
+
+    def predict(self, train_no: str, scheduled: datetime) -> Optional[Tuple[float, float, float]]:
+        """(expected, low, high) delay in minutes, or None without enough history."""
+        own = self.trains.get(train_no)
+        own = own if own and own.count >= MIN_OBSERVATIONS else None
+        bucket = self.buckets.get(self.bucket_key(scheduled))
+        prior = bucket if bucket and bucket.count >= MIN_OBSERVATIONS else None
+        if own is None and prior is None:
+            return None
+        if own is None:
+            return (prior.mean, *prior.band())
+        if prior is None:
+            return (own.mean, *own.band())
+        w = own.count / (own.count + BUCKET_PRIOR_WEIGHT)
+        low, high = own.band() if w >= 0.5 else prior.band()
+        return w * own.mean + (1 - w) * prior.mean, low, high
+
+    def apply(self, trains: List[TrainETA]) -> List[TrainETA]:
+        """Copies of trains with predicted delays applied to timetable-only ETAs."""
+        adjusted = []
+        for t in trains:
+            prediction = None if t.delay_min is not None else self.predict(t.train_no, t.eta_at_station)
+            if prediction is None:
+                adjusted.append(t)
+                continue
+            expected, low, high = prediction
+            shift = timedelta(minutes=round(expected))
+            adjusted.append(replace(
+                t,
+                eta_at_station=t.eta_at_station + shift,
+                eta_at_crossing=t.eta_at_crossing + shift,
+                predicted_delay_min=round(expected),
+                eta_range=(t.eta_at_crossing + timedelta(minutes=round(min(low, expected))),
+                           t.eta_at_crossing + timedelta(minutes=round(max(high, expected))))
+            ))
+        adjusted.sort(key=lambda t: t.eta_at_crossing)
+        return adjusted
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "v": 1,
+                "trains": {no: s.to_list() for no, s in self.trains.items()},
+                "buckets": {f"{d}:{h}": s.to_list() for (d, h), s in self.buckets.items()},
+            }
+
+    def load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning("Delay predictor state not loaded from %s: %s", self.path, e)
+            return
+        with self._lock:
+            for no, stats in list(data.get("trains", {}).items())[-self.max_trains:]:
+                self.trains[no] = DelayStats.from_list(stats)
+            for key, stats in data.get("buckets", {}).items():
+                d, h = key.split(":")
+                self.buckets[(int(d), int(h))] = DelayStats.from_list(stats)
+        logger.info("Loaded delay statistics for %d trains from %s", len(self.trains), self.path)
+
+    def save(self):
+        """Atomically write the compact state file."""
+        if not self.path:
+            return
+        data = self.to_dict()
+        tmp = f"{self.path}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(tmp, self.path)
+            self._dirty = False
+        except OSError as e:
+            logger.warning("Could not save delay predictor state: %s", e)
+
+    def maybe_save(self):
+        """Persist in a background thread if state changed and the save interval passed."""
+        if not self.path or not self._dirty or time.time() - self._last_save < self.save_interval_secs:
+            return
+        self._last_save = time.time()
+        threading.Thread(target=self.save, name="predictor-save", daemon=True).start()
@@ -0,0 +1,117 @@
+"""
+Publish pre-rendered pages and API snapshots for static / edge hosting.
+
+Each publish writes a complete build into a fresh directory under the
+output root and then repoints the `current` symlink at it with a single
+rename, so a host serving `current/` never sees a half-written site. The
+previous build is kept for readers still holding files open from it.
+
+Cache headers and rewrites are written both as `_headers` / `_redirects`
+(Netlify, Cloudflare Pages) and as `vercel.json`, so `current/` can be
+deployed to any of them as is.
+"""
+
+import os
+import json
+import time
+import shutil
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+BUILD_PREFIX = "build-"
+
+# (URL path, destination file path[, {query param: value or ":name" placeholder}])
+Rewrite = Sequence
+
+
+def netlify_redirect(rewrite: Rewrite) -> str:
+    src, dst, *rest = rewrite
+    query = rest[0] if rest else {}
+    conditions = "".join(f" {name}={value}" for name, value in query.items())
+    return f"{src}{conditions} {dst} 200\n"
+
+
+def vercel_rewrite(rewrite: Rewrite) -> Dict:
+    src, dst, *rest = rewrite
+    rule = {"source": src, "destination": dst}
+    query = rest[0] if rest else {}
+    if query:
+        # A ":name" placeholder becomes a named capture, usable as :name in the destination
+        rule["has"] = [{"type": "query", "key": name,
+                        "value": f"(?<{value[1:]}>[^&]+)" if value.startswith(":") else value}
+                       for name, value in query.items()]
+    return rule
+
+
+def vercel_source(pattern: str) -> str:
+    """A `_headers` path pattern ("/trains/*") as a Vercel source ("/trains/(.*)")."""
+    return pattern.replace("*", "(.*)")
+
+
+class StaticSite:
+    """An output root holding timestamped builds and a `current` symlink."""
+
+    def __init__(self, root: str, keep: int = 2):
+        self.root = root
+        self.keep = keep
+
+    @property
+    def current(self) -> str:
+        return os.path.join(self.root, "current")
+
+    def builds(self) -> List[str]:
+        """Build directory names, oldest first."""
+        try:
+            names = os.listdir(self.root)
+        except FileNotFoundError:
+            return []
+        return sorted(n for n in names if n.startswith(BUILD_PREFIX))
+
+    def publish(self, files: Dict[str, bytes], headers: Optional[Dict[str, Dict[str, str]]] = None,
+                rewrites: Optional[List[Tuple[str, str]]] = None) -> str:
+        """
+        Write files (relative path -> body) as a new build and swap it in.
+
+        headers maps a URL path or pattern to the headers to send for it;
+        rewrites are (URL path, file path[, query conditions]) served with
+        status 200; earlier rules win. Returns the new build's directory.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        build = os.path.join(self.root, f"{BUILD_PREFIX}{time.time_ns()}")
+        for rel, body in files.items():
+            path = os.path.join(build, rel)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(body)
+        if headers:
+            lines = []
+            for pattern, values in headers.items():
+                lines.append(pattern)
+                lines.extend(f"  {name}: {value}" for name, value in values.items())
+            with open(os.path.join(build, "_headers"), "w", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+        if rewrites:
+            with open(os.path.join(build, "_redirects"), "w", encoding="utf-8") as f:
+                f.writelines(netlify_redirect(rewrite) for rewrite in rewrites)
+        vercel = {}
+        if headers:
+            vercel["headers"] = [{"source": vercel_source(pattern),
+                                  "headers": [{"key": name, "value": value} for name, value in values.items()]}
+                                 for pattern, values in headers.items()]
+        if rewrites:
+            vercel["rewrites"] = [vercel_rewrite(rewrite) for rewrite in rewrites]
+        if vercel:
+            with open(os.path.join(build, "vercel.json"), "w", encoding="utf-8") as f:
+                json.dump(vercel, f, indent=2)
+
+        # rename() over an existing symlink is atomic on POSIX
+        link = os.path.join(self.root, f".current-{os.getpid()}")
+        os.symlink(os.path.basename(build), link)
+        os.replace(link, self.current)
+
+        for name in self.builds()[:-self.keep]:
+            shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+        logger.info("Published %d pre-rendered files to %s", len(files), build)
+        return build
@@ -0,0 +1,143 @@
+import os
+import time
+import sqlite3
+import logging
+import tempfile
+import threading
+import contextvars
+from contextlib import contextmanager
+from enum import IntEnum
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+from .config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Who is waiting on an upstream request; lower values are served first."""
+    USER = 0        # A request is blocked on this cache miss
+    BACKGROUND = 1  # Scheduled refresh of a station someone is watching
+    PREFETCH = 2    # Speculative (neighbour stations, warm-up)
+
+
+class UpstreamBudgetExceeded(Exception):
+    """Raised instead of calling an upstream host that is out of budget."""
+
+    def __init__(self, host: str, retry_after: float):
+        super().__init__(f"Request budget for {host} exhausted, retry in {retry_after:.0f}s")
+        self.host = host
+        self.retry_after = retry_after
+
+
+_priority: contextvars.ContextVar = contextvars.ContextVar("upstream_priority", default=Priority.USER)
+
+
+@contextmanager
+def upstream_priority(priority: Priority):
+    """Run upstream requests made inside the block at the given priority."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class UpstreamBudget:
+    """
+    Token bucket per upstream host, shared by every thread and worker process.
+
+    Bucket state lives in a small SQLite file and is refilled and debited
+    inside one IMMEDIATE transaction, so gunicorn workers on the same host
+    draw from one budget. Priorities are enforced by headroom: background
+    requests leave `reserve` tokens for users, and prefetches leave twice
+    that, so under pressure prefetches stop first and user misses last.
+
+    Hosts without a configured rate are not limited. If the state file
+    cannot be used the budget fails open (logged once) rather than taking
+    the site down.
+    """
+
+    def __init__(self, path: str, rates: Dict[str, Tuple[float, float]], reserve: float = 1.0,
+                 user_max_wait_secs: float = 2.0):
+        self.path = path
+        self.rates = rates  # host -> (tokens per minute, burst)
+        self.reserve = reserve
+        self.user_max_wait_secs = user_max_wait_secs
+        self._local = threading.local()
+        self._failed = False
+
+    def use_path(self, path: str):
+        """Move the state to another file (tests point it at a temporary directory)."""
+        self.path = path
+        self._local = threading.local()
+        self._failed = False
+
+    @classmethod
+    def from_config(cls) -> "UpstreamBudget":
+        path = Config.UPSTREAM_BUDGET_PATH or os.path.join(tempfile.gettempdir(), "rail_crossing_budget.sqlite")
+        return cls(path, Config.UPSTREAM_RATES if Config.UPSTREAM_BUDGET else {},
+                   reserve=Config.UPSTREAM_RESERVE_TOKENS,
+                   user_max_wait_secs=Config.UPSTREAM_USER_MAX_WAIT_SECS)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("CREATE TABLE IF NOT EXISTS buckets "
+                         "(host TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)")
+            self._local.conn = conn
+        return conn
+
+    def _take(self, host: str, rate: float, burst: float, needed: float) -> float:
+        """Debit one token if at least `needed` are available; 0 on success, else seconds to wait."""
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE host = ?", (host,)).fetchone()
+            tokens = burst if row is None else min(burst, row[0] + (now - row[1]) * rate)
+            wait = 0.0
+            if tokens >= needed:
+                tokens -= 1
+            else:
+                wait = (needed - tokens) / rate
+            conn.execute("INSERT OR REPLACE INTO buckets (host, tokens, updated) VALUES (?, ?, ?)",
+                         (host, tokens, now))
+            conn.execute("COMMIT")
+            return wait
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def acquire(self, url: str, priority: Optional[Priority] = None):
+        """
+        Spend one request from url's host budget or raise UpstreamBudgetExceeded.
+
+        priority defaults to the one set by upstream_priority(); user misses
+        may wait briefly for a token instead of failing.
+        """
+        host = urlsplit(url).hostname or url
+        limits = self.rates.get(host)
+        if limits is None or self._failed:
+            return
+        per_min, burst = limits
+        rate = per_min / 60.0
+        priority = _priority.get() if priority is None else priority
+        needed = 1 + self.reserve * int(priority)
+        try:
+            wait = self._take(host, rate, burst, needed)
+            if wait and priority == Priority.USER and wait <= self.user_max_wait_secs:
+                time.sleep(wait)
+                wait = self._take(host, rate, burst, needed)
+        except sqlite3.Error as e:
+            self._failed = True
+            logger.warning("Upstream budget disabled, state file %s unusable: %s", self.path, e)
+            return
+        if wait:
+            logger.info("Upstream budget for %s exhausted (%s), retry in %.1fs", host, priority.name, wait)
+            raise UpstreamBudgetExceeded(host, wait)
+
+
+budget = UpstreamBudget.from_config()
@@ -0,0 +1,216 @@
+import math
+import bisect
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .config import Config
+from .models import TrainETA
+
+logger = logging.getLogger(__name__)
+
+# Approximate chainage (km from Chennai Central) along the Chennai - Bengaluru line
+LINE_CHAINAGE_KM = {
+    "MAS": 0.0,
+    "AJJ": 68.0,
+    "KPD": 129.4,
+    "GYM": 158.6,
+    "AB": 183.5,
+    "VN": 200.5,
+    "JTJ": 213.9,
+    "KPN": 245.0,
+    "BWT": 285.0,
+    "KJM": 345.0,
+    "SBC": 359.0,
+}
+
+# Termini off the line: which end of it a train to/from them passes through
+# (-1 = the Chennai end, +1 = the Jolarpettai/Bengaluru end)
+TERMINUS_SIDE = {
+    "MS": -1, "TBM": -1, "CGL": -1, "HWH": -1, "NDLS": -1, "NZM": -1, "BBS": -1, "PURI": -1,
+    "BZA": -1, "VSKP": -1, "SC": -1, "HYB": -1, "TATA": -1, "PNBE": -1, "GHY": -1, "DBRG": -1,
+    "YPR": 1, "MYS": 1, "SMVB": 1, "MAQ": 1, "CBE": 1, "ERS": 1, "TVC": 1, "CAPE": 1,
+    "KCVL": 1, "NCJ": 1, "SA": 1, "ED": 1, "MDU": 1, "UBL": 1, "SBC": 1,
+}
+
+# Crossings further than this from the line between stations are not on it
+MAX_CROSSING_OFFSET_KM = 3.0
+
+# A train seen at both ends of a section is only matched if its times are this close
+MAX_SECTION_GAP = timedelta(hours=3)
+
+
+def _position(code: Optional[str]) -> Optional[float]:
+    """Chainage of a station, or +/-inf for a known terminus beyond either end."""
+    if not code:
+        return None
+    code = code.upper()
+    if code in LINE_CHAINAGE_KM:
+        return LINE_CHAINAGE_KM[code]
+    side = TERMINUS_SIDE.get(code)
+    return side * math.inf if side else None
+
+
+def direction(train: TrainETA) -> Optional[int]:
+    """+1 if the train runs towards increasing chainage, -1 if decreasing, None if unknown."""
+    src = _position(train.src_code)
+    dst = _position(train.dst_code)
+    if src is None:
+        src = _position(train.via_code)
+    if src is None or dst is None or src == dst:
+        return None
+    return 1 if dst > src else -1
+
+
+class SectionGeometry:
+    """
+    Stations placed along the line by chainage and coordinates.
+
+    Crossings are positioned by projecting them onto the polyline through
+    the station coordinates and interpolating chainage along the segment.
+    """
+
+    def __init__(self, stations: Sequence[Tuple[str, float, float, float]]):
+        # (code, chainage_km, lat, lon), ordered by chainage
+        self.stations = sorted(stations, key=lambda s: s[1])
+        self.codes = [s[0] for s in self.stations]
+
+    @classmethod
+    def from_config(cls) -> "SectionGeometry":
+        stations = ((code, Config.station(code)) for code in Config.station_codes())
+        return cls([(code, LINE_CHAINAGE_KM[code], st["lat"], st["lon"])
+                    for code, st in stations if code in LINE_CHAINAGE_KM])
+
+    def chainage(self, code: str) -> Optional[float]:
+        for c, km, _, _ in self.stations:
+            if c == code:
+                return km
+        return None
+
+    def neighbours(self, code: str) -> List[str]:
+        """Adjacent configured stations on either side of code."""
+        if code not in self.codes:
+            return []
+        i = self.codes.index(code)
+        return [self.codes[j] for j in (i - 1, i + 1) if 0 <= j < len(self.codes)]
+
+    def locate(self, lat: float, lon: float) -> Optional[Tuple[float, float]]:
+        """(chainage_km, offset_km) of the nearest point on the line, or None."""
+        best = None
+        for (_, km_a, lat_a, lon_a), (_, km_b, lat_b, lon_b) in zip(self.stations, self.stations[1:]):
+            # Local equirectangular projection around the segment start
+            kx = 111.32 * math.cos(math.radians(lat_a))
+            ax, ay = 0.0, 0.0
+            bx, by = (lon_b - lon_a) * kx, (lat_b - lat_a) * 111.32
+            px, py = (lon - lon_a) * kx, (lat - lat_a) * 111.32
+            seg2 = bx * bx + by * by
+            frac = 0.0 if seg2 == 0 else max(0.0, min(1.0, (px * bx + py * by) / seg2))
+            offset = math.hypot(px - (ax + frac * bx), py - (ay + frac * by))
+            if best is None or offset < best[1]:
+                best = (km_a + frac * (km_b - km_a), offset)
+        return best
+
+
+class RouteETAEngine:
+    """
+    Propagate station ETAs to every crossing along the line in one pass.
+
+    For each section between consecutive stations, a train that appears in
+    both stations' snapshots is interpolated linearly between its two
+    station times. A train seen at only one end is extrapolated from that
+    station in its direction of travel (from the route fields); if its
+    direction is unknown it is assumed to be approaching, as the
+    single-station estimate always did.
+
+    Extrapolation runs at speed_kmph if given, else at that station's
+    AVG_SPEED_KMPH, read on every call so config file overrides apply.
+    """
+
+    def __init__(self, geometry: SectionGeometry, speed_kmph: Optional[float] = None):
+        self.geometry = geometry
+        self.speed_kmph = speed_kmph
+
+    def _travel(self, km: float, speed_kmph: float) -> timedelta:
+        return timedelta(minutes=abs(km) / speed_kmph * 60)
+
+    def place_crossings(self, crossings: Sequence[dict]) -> List[Tuple[float, dict]]:
+        """(chainage, crossing) for crossings on the line, sorted by chainage."""
+        placed = []
+        for c in crossings:
+            loc = self.geometry.locate(c["lat"], c["lon"])
+            if loc and loc[1] <= MAX_CROSSING_OFFSET_KM:
+                placed.append((loc[0], c))
+        placed.sort(key=lambda p: p[0])
+        return placed
+
+    def propagate(self, snapshots: Dict[str, Sequence[TrainETA]],
+                  crossings: Sequence[dict]) -> Dict[int, List[Tuple[datetime, TrainETA]]]:
+        """
+        crossing id -> [(eta_at_crossing, train)] sorted by ETA, for every
+        crossing on the line between stations that have snapshots.
+        """
+        placed = self.place_crossings(crossings)
+        chainages = [p[0] for p in placed]
+        result: Dict[int, List[Tuple[datetime, TrainETA]]] = {c["id"]: [] for _, c in placed}
+        stations = [(code, km) for code, km, _, _ in self.geometry.stations if code in snapshots]
+
+        sections = list(zip(stations, stations[1:]))
+        for n, ((code_a, km_a), (code_b, km_b)) in enumerate(sections):
+            # Half-open [km_a, km_b) so a crossing at a station is in one section only;
+            # the last section also takes its far end
+            lo = bisect.bisect_left(chainages, km_a)
+            last = n == len(sections) - 1
+            hi = bisect.bisect_right(chainages, km_b) if last else bisect.bisect_left(chainages, km_b)
+            section = placed[lo:hi]
+            if not section:
+                continue
+
+            at_b: Dict[str, List[TrainETA]] = {}
+            for t in snapshots[code_b]:
+                at_b.setdefault(t.train_no, []).append(t)
+            matched_b = set()
+
+            for ta in snapshots[code_a]:
+                tb = next((t for t in at_b.get(ta.train_no, ())
+                           if id(t) not in matched_b
+                           and abs(t.eta_at_station - ta.eta_at_station) <= MAX_SECTION_GAP), None)
+                if tb is not None:
+                    matched_b.add(id(tb))
+                    span = tb.eta_at_station - ta.eta_at_station
+                    for km, c in section:
+                        frac = (km - km_a) / (km_b - km_a)
+                        result[c["id"]].append((ta.eta_at_station + span * frac, ta))
+                else:
+                    self._extrapolate(ta, code_a, km_a, +1, section, result)
+
+            for tb in snapshots[code_b]:
+                if id(tb) not in matched_b:
+                    self._extrapolate(tb, code_b, km_b, -1, section, result)
+
+        # Crossings beyond the outermost stations with data
+        if stations:
+            for edge_code, edge_km, outward in ((stations[0][0], stations[0][1], -1),
+                                                (stations[-1][0], stations[-1][1], +1)):
+                outside = [(km, c) for km, c in placed if (km - edge_km) * outward > 0]
+                for t in snapshots[edge_code]:
+                    self._extrapolate(t, edge_code, edge_km, outward, outside, result)
+
+        for etas in result.values():
+            etas.sort(key=lambda e: e[0])
+        return result
+
+    def _extrapolate(self, train: TrainETA, station: str, station_km: float, towards: int,
+                     section: Sequence[Tuple[float, dict]], result: Dict):
+        """
+        Time a one-ended train at the crossings on the `towards` side of its station.
+
+        A train moving towards the crossings (after the station) reaches them
+        after its station time; one coming from them reaches them before.
+        """
+        d = direction(train)
+        speed = self.speed_kmph or Config.value("AVG_SPEED_KMPH", station)
+        for km, c in section:
+            travel = self._travel(km - station_km, speed)
+            after_station = d is not None and d == towards
+            eta = train.eta_at_station + travel if after_station else train.eta_at_station - travel
+            result[c["id"]].append((eta, train))
@@ -0,0 +1,89 @@
+import time
+import heapq
+import logging
+import itertools
+import threading
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class RefreshScheduler:
+    """
+    Run keyed refresh callbacks at per-key deadlines.
+
+    Deadlines live in a min-heap, so the worker thread sleeps exactly until
+    the earliest one is due instead of polling on a fixed interval. Each key
+    has at most one live deadline; rescheduling a key leaves its old heap
+    entry behind, which is skipped when it surfaces (lazy deletion).
+
+    The callback receives the key and is responsible for scheduling the
+    key's next deadline (typically from the snapshot it just loaded).
+    """
+
+    def __init__(self, refresh: Callable[[Hashable], None], name: str = "refresh-scheduler"):
+        self.refresh = refresh
+        self.name = name
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        self._deadlines: Dict[Hashable, float] = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start the worker thread if it is not already running."""
+        with self._cond:
+            if self.running:
+                return
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+        logger.info("Started %s", self.name)
+
+    def schedule(self, key: Hashable, when: float):
+        """Set key's deadline (epoch seconds), replacing any pending one."""
+        with self._cond:
+            self._deadlines[key] = when
+            heapq.heappush(self._heap, (when, next(self._seq), key))
+            self._cond.notify()
+
+    def cancel(self, key: Hashable):
+        with self._cond:
+            self._deadlines.pop(key, None)
+
+    def deadline(self, key: Hashable) -> Optional[float]:
+        """Pending deadline for key, or None if nothing is scheduled."""
+        return self._deadlines.get(key)
+
+    def pending(self) -> Dict[Hashable, float]:
+        with self._cond:
+            return dict(self._deadlines)
+
+    def _next_due(self) -> Hashable:
+        """Block until a live deadline is due and claim its key."""
+        with self._cond:
+            while True:
+                while self._heap and self._deadlines.get(self._heap[0][2]) != self._heap[0][0]:
+                    heapq.heappop(self._heap)  # superseded or cancelled
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                when, _, key = self._heap[0]
+                delay = when - time.time()
+                if delay > 0:
+                    self._cond.wait(timeout=delay)
+                    continue
+                heapq.heappop(self._heap)
+                del self._deadlines[key]
+                return key
+
+    def _run(self):
+        while True:
+            key = self._next_due()
+            try:
+                self.refresh(key)
+            except Exception as e:
+                logger.error("%s: refresh of %s failed: %s", self.name, key, e)
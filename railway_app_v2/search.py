@@ -0,0 +1,99 @@
+import re
+import bisect
+import heapq
+import unicodedata
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from .models import TrainETA
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase ASCII with punctuation collapsed to single spaces."""
+    text = unicodedata.normalize("NFKD", text or "").encode("ascii", "ignore").decode("ascii")
+    return _NON_WORD.sub(" ", text.lower()).strip()
+
+
+def name_tokens(name: str) -> List[str]:
+    return sorted(set(normalize(name).split()))
+
+
+class TrainIndex:
+    """
+    Lookup structures over one snapshot's trains.
+
+    by_number maps train_no to its runs in ETA order. Names are searched
+    through a sorted array of (token, train_no) pairs, so a prefix query
+    is two binary searches plus the matching slice; train numbers get the
+    same treatment for number-prefix queries.
+
+    build() reuses the previous snapshot's index: entries of trains whose
+    name did not change are carried over (already sorted) and only new or
+    renamed trains are tokenized, sorted and merged in.
+    """
+
+    def __init__(self, by_number: Dict[str, List[TrainETA]], names: Dict[str, str],
+                 tokens: List[Tuple[str, str]]):
+        self.by_number = by_number
+        self.names = names  # train_no -> name the tokens were built from
+        self.tokens = tokens
+        self.numbers = sorted(by_number)
+
+    @classmethod
+    def build(cls, trains: Sequence[TrainETA], previous: Optional["TrainIndex"] = None) -> "TrainIndex":
+        by_number: Dict[str, List[TrainETA]] = {}
+        names: Dict[str, str] = {}
+        for t in trains:
+            by_number.setdefault(t.train_no, []).append(t)
+            names.setdefault(t.train_no, t.name)
+
+        old_names = previous.names if previous else {}
+        kept = [] if previous is None else [
+            entry for entry in previous.tokens if names.get(entry[1]) == old_names.get(entry[1])]
+        added = sorted((token, no) for no, name in names.items()
+                       if old_names.get(no) != name for token in name_tokens(name))
+        tokens = list(heapq.merge(kept, added)) if kept else added
+        return cls(by_number, names, tokens)
+
+    def lookup(self, train_no: str) -> List[TrainETA]:
+        return self.by_number.get(train_no.strip().upper(), [])
+
+    @staticmethod
+    def _prefix_range(keys: Sequence, prefix: str) -> Tuple[int, int]:
+        return bisect.bisect_left(keys, prefix), bisect.bisect_left(keys, prefix + "\uffff")
+
+    def _token_matches(self, prefix: str) -> Set[str]:
+        lo = bisect.bisect_left(self.tokens, (prefix,))
+        hi = bisect.bisect_left(self.tokens, (prefix + "\uffff",))
+        return {no for _, no in self.tokens[lo:hi]}
+
+    def next_run(self, train_no: str, now: Optional[datetime] = None) -> Optional[TrainETA]:
+        """The train's first run at or after now (its first run if now is None)."""
+        runs = self.by_number.get(train_no, ())
+        return next((t for t in runs if now is None or t.eta_at_crossing >= now), None)
+
+    def search(self, query: str, limit: int = 20, now: Optional[datetime] = None) -> List[str]:
+        """
+        Train numbers matching query, soonest first.
+
+        A query of digits matches train-number prefixes; otherwise every
+        word of the query must prefix a word of the train's name. With now,
+        trains are ranked by their next run from then and trains with no
+        run left are dropped before the limit is applied.
+        """
+        words = normalize(query).split()
+        if not words:
+            return []
+        if len(words) == 1 and words[0].isdigit():
+            lo, hi = self._prefix_range(self.numbers, words[0])
+            matches = set(self.numbers[lo:hi])
+        else:
+            matches = self._token_matches(words[0])
+            for word in words[1:]:
+                if not matches:
+                    break
+                matches &= self._token_matches(word)
+        upcoming = [(run.eta_at_crossing, no) for no in matches for run in (self.next_run(no, now),) if run]
+        return [no for _, no in heapq.nsmallest(limit, upcoming)]
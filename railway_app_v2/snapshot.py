@@ -0,0 +1,210 @@
+import json
+import math
+import bisect
+import hashlib
+import itertools
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import pytz
+
+from .models import TrainETA
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional; JSON is always available
+    msgpack = None
+
+IST = pytz.timezone('Asia/Kolkata')
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+
+
+def train_to_dict(train: TrainETA, eta_at_crossing: Optional[datetime] = None) -> Dict:
+    """JSON-serializable view of a TrainETA (ISO timestamps)."""
+    eta = eta_at_crossing or train.eta_at_crossing
+    row = {
+        'train_no': train.train_no,
+        'name': train.name,
+        'eta_at_crossing': eta.isoformat(),
+        'eta_at_crossing_formatted': eta.strftime("%I:%M %p"),
+        'source': train.source
+    }
+    if train.eta_range:
+        row['predicted_delay_min'] = train.predicted_delay_min
+        row['eta_range'] = [t.isoformat() for t in train.eta_range]
+    return row
+
+
+def train_to_epoch_dict(train: TrainETA) -> Dict:
+    """Compact view for constrained clients: epoch-second ETA, no display strings."""
+    row = {
+        'train_no': train.train_no,
+        'name': train.name,
+        'eta': int(train.eta_at_crossing.timestamp()),
+        'source': train.source
+    }
+    if train.eta_range:
+        row['predicted_delay_min'] = train.predicted_delay_min
+        row['eta_range'] = [int(t.timestamp()) for t in train.eta_range]
+    return row
+
+
+SCHEMAS = {"iso": train_to_dict, "epoch": train_to_epoch_dict}
+
+Cursor = Tuple[int, str]  # (crossing ETA epoch seconds, train_no) of the last train returned
+
+
+def format_cursor(cursor: Cursor) -> str:
+    return f"{cursor[0]}_{cursor[1]}"
+
+
+def parse_cursor(value: Optional[str]) -> Optional[Cursor]:
+    """Parse a ?cursor= value; raises ValueError if malformed."""
+    if not value:
+        return None
+    eta, sep, train_no = value.partition("_")
+    if not sep or not train_no:
+        raise ValueError(f"bad cursor '{value}'")
+    return int(eta), train_no
+
+
+def encode_rows(mimetype: str, rows: List[Dict]) -> bytes:
+    if mimetype == MSGPACK:
+        return msgpack.packb(rows, use_bin_type=True)
+    return json.dumps(rows, separators=(",", ":")).encode("utf-8")
+
+
+_versions = itertools.count(1)
+
+
+class TrainSnapshot:
+    """
+    One station's ETA-sorted trains as loaded by a single refresh.
+
+    Snapshots are never mutated after construction, so anything derived
+    from them (encoded bodies, indexes) can be computed once and memoized
+    on the snapshot itself via derived(); a refresh creates a new snapshot
+    and the old derivations are dropped with it.
+    """
+
+    def __init__(self, station_code: str, trains: List[TrainETA]):
+        self.station_code = station_code
+        self.trains = trains
+        self.version = next(_versions)  # Unique per refresh, for keying derived data
+        self._derived: Dict[Hashable, Any] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.trains)
+
+    def derived(self, key: Hashable, build: Callable[[], Any]) -> Any:
+        """Return the memoized value for key, building it on first use."""
+        try:
+            return self._derived[key]
+        except KeyError:
+            pass
+        value = build()
+        with self._lock:
+            return self._derived.setdefault(key, value)
+
+    def cached(self, key: Hashable) -> Any:
+        """The memoized value for key if it has been built, else None."""
+        return self._derived.get(key)
+
+    def upcoming_start(self, now: Optional[datetime] = None) -> int:
+        """Index of the first train that has not yet passed the crossing."""
+        now = now or datetime.now(IST)
+        etas = self.derived("crossing_etas", lambda: [t.eta_at_crossing for t in self.trains])
+        return bisect.bisect_left(etas, now)
+
+    def encoded_trains(self, mimetype: str, schema: str, start: int = 0) -> bytes:
+        """
+        The trains array from `start` on, encoded once per snapshot and start.
+
+        start only moves forward as trains pass, so encodings (and etags)
+        for earlier starts are dropped when a later one is built.
+        """
+        def build():
+            self._drop_starts_before(start)
+            return encode_rows(mimetype, [SCHEMAS[schema](t) for t in self.trains[start:]])
+        return self.derived(("trains", mimetype, schema, start), build)
+
+    def _drop_starts_before(self, start: int):
+        with self._lock:
+            for key in [k for k in self._derived
+                        if isinstance(k, tuple) and k[0] in ("trains", "etag") and k[3] < start]:
+                del self._derived[key]
+
+    def etag(self, mimetype: str, schema: str, start: int = 0) -> str:
+        """
+        Validator for the trains array from `start` on, hashed from its encoding.
+
+        A content hash rather than the version, so an identical refresh or
+        another worker process yields the same tag.
+        """
+        def build():
+            body = self.encoded_trains(mimetype, schema, start)
+            return hashlib.blake2b(body, digest_size=12).hexdigest()
+        return self.derived(("etag", mimetype, schema, start), build)
+
+    def eta_keys(self) -> List[Tuple[int, str, int]]:
+        """
+        (ETA epoch seconds, train_no, index) per train, sorted, for range queries.
+
+        Trains are already in ETA order, so the sort only settles ties
+        within a second by train number and is linear in practice.
+        """
+        return self.derived("eta_keys", lambda: sorted(
+            (math.floor(t.eta_at_crossing.timestamp()), t.train_no, i) for i, t in enumerate(self.trains)))
+
+    def time_range(self, start: Optional[int] = None, end: Optional[int] = None,
+                   after: Optional[Cursor] = None,
+                   limit: Optional[int] = None) -> Tuple[List[TrainETA], Optional[Cursor]]:
+        """
+        Trains with crossing ETA in [start, end] (epoch seconds), resuming
+        after a cursor, by binary search over eta_keys(): O(log n + limit).
+
+        Returns the trains and the cursor to continue from, or None when
+        nothing is left in the range. Cursors name a train rather than a
+        position, so they stay valid in a later refresh's snapshot.
+        """
+        keys = self.eta_keys()
+        lo = 0 if start is None else bisect.bisect_left(keys, (start,))
+        if after is not None:
+            lo = max(lo, bisect.bisect_right(keys, (after[0], after[1], math.inf)))
+        hi = len(keys) if end is None else bisect.bisect_left(keys, (end + 1,))
+        stop = hi if limit is None else min(hi, lo + limit)
+        trains = [self.trains[i] for _, _, i in keys[lo:stop]]
+        return trains, (keys[stop - 1][:2] if lo < stop < hi else None)
+
+
+def encode_envelope(mimetype: str, envelope: Dict, trains_body: bytes) -> bytes:
+    """
+    Encode a small per-request envelope around a pre-encoded trains array.
+
+    The envelope (cache age, timestamps) changes every request while the
+    trains array only changes per snapshot, so only the envelope is
+    serialized here and the cached array bytes are spliced in.
+    """
+    if mimetype == MSGPACK:
+        packer = msgpack.Packer(use_bin_type=True)
+        parts = [packer.pack_map_header(len(envelope) + 1)]
+        for key, value in envelope.items():
+            parts.append(packer.pack(key))
+            parts.append(packer.pack(value))
+        parts.append(packer.pack("trains"))
+        parts.append(trains_body)
+        return b"".join(parts)
+    head = json.dumps(envelope, separators=(",", ":")).encode("utf-8")
+    return head[:-1] + b',"trains":' + trains_body + b"}"
+
+
+def negotiate(accept_mimetypes) -> str:
+    """Pick MessagePack when the Accept header prefers it (and it is installed), else JSON."""
+    if msgpack is None:
+        return JSON
+    best = accept_mimetypes.best_match([JSON, MSGPACK, "application/x-msgpack"])
+    return MSGPACK if best and "msgpack" in best else JSON
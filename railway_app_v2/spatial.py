@@ -0,0 +1,135 @@
+import math
+from typing import Any, Callable, Iterable, List, Optional, Sequence, Tuple
+
+from .utils import haversine_km
+
+KM_PER_DEG_LAT = 111.32
+
+
+class _Node:
+    __slots__ = ("south", "west", "north", "east", "children", "leaf")
+
+    def __init__(self, children: list, leaf: bool):
+        self.children = children
+        self.leaf = leaf
+        if leaf:
+            lats = [c[0] for c in children]
+            lons = [c[1] for c in children]
+        else:
+            lats = [v for c in children for v in (c.south, c.north)]
+            lons = [v for c in children for v in (c.west, c.east)]
+        self.south, self.north = min(lats), max(lats)
+        self.west, self.east = min(lons), max(lons)
+
+    def intersects(self, south, west, north, east) -> bool:
+        return not (self.north < south or self.south > north or self.east < west or self.west > east)
+
+
+class PointRTree:
+    """
+    Static R-tree over points, bulk-loaded with Sort-Tile-Recursive packing.
+
+    Built once per data refresh and then only queried, so it needs no
+    insert/delete support. Leaves hold (lat, lon, item) tuples.
+    """
+
+    def __init__(self, items: Iterable[Any], point: Callable[[Any], Tuple[float, float]],
+                 capacity: int = 16):
+        self.capacity = capacity
+        entries = [(*point(item), item) for item in items]
+        self.size = len(entries)
+        self.root: Optional[_Node] = self._build(entries) if entries else None
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _pack(self, entries: list, center: Callable, make: Callable) -> List[_Node]:
+        """One STR level: slice by longitude, then tile each slice by latitude."""
+        n_nodes = math.ceil(len(entries) / self.capacity)
+        n_slices = math.ceil(math.sqrt(n_nodes))
+        per_slice = n_slices * self.capacity
+        entries = sorted(entries, key=lambda e: center(e)[1])
+        nodes = []
+        for i in range(0, len(entries), per_slice):
+            vertical = sorted(entries[i:i + per_slice], key=lambda e: center(e)[0])
+            for j in range(0, len(vertical), self.capacity):
+                nodes.append(make(vertical[j:j + self.capacity]))
+        return nodes
+
+    def _build(self, entries: list) -> _Node:
+        level = self._pack(entries, lambda e: (e[0], e[1]), lambda chunk: _Node(chunk, leaf=True))
+        while len(level) > 1:
+            level = self._pack(level,
+                               lambda n: ((n.south + n.north) / 2, (n.west + n.east) / 2),
+                               lambda chunk: _Node(chunk, leaf=False))
+        return level[0]
+
+    def search(self, south: float, west: float, north: float, east: float) -> List[Any]:
+        """Items whose point lies inside the bbox (inclusive)."""
+        if self.root is None:
+            return []
+        found, stack = [], [self.root]
+        while stack:
+            node = stack.pop()
+            if not node.intersects(south, west, north, east):
+                continue
+            if node.leaf:
+                found.extend(item for lat, lon, item in node.children
+                             if south <= lat <= north and west <= lon <= east)
+            else:
+                stack.extend(node.children)
+        return found
+
+    def nearby(self, lat: float, lon: float, radius_km: float,
+               point: Callable[[Any], Tuple[float, float]]) -> List[Tuple[float, Any]]:
+        """(distance_km, item) pairs within radius_km, nearest first."""
+        hits = []
+        for item in self.search(*radius_bbox(lat, lon, radius_km)):
+            item_lat, item_lon = point(item)
+            d = haversine_km(lon, lat, item_lon, item_lat)
+            if d <= radius_km:
+                hits.append((d, item))
+        hits.sort(key=lambda h: h[0])
+        return hits
+
+
+def radius_bbox(lat: float, lon: float, radius_km: float) -> Tuple[float, float, float, float]:
+    """(south, west, north, east) of the smallest box around a radius_km circle."""
+    dlat = radius_km / KM_PER_DEG_LAT
+    dlon = radius_km / (KM_PER_DEG_LAT * max(math.cos(math.radians(lat)), 1e-6))
+    return lat - dlat, lon - dlon, lat + dlat, lon + dlon
+
+
+def parse_floats(value: str, n: int, what: str) -> List[float]:
+    """Parse n comma-separated finite numbers; raises ValueError (float() alone accepts nan and inf)."""
+    parts = [float(p) for p in value.split(",")]
+    if len(parts) != n:
+        raise ValueError(f"{what} needs {n} comma-separated numbers")
+    if not all(math.isfinite(p) for p in parts):
+        raise ValueError(f"{what} values must be finite")
+    return parts
+
+
+def parse_bbox(value: str) -> Tuple[float, float, float, float]:
+    """Parse 'south,west,north,east' (the Overpass order); raises ValueError."""
+    parts = parse_floats(value, 4, "bbox (south,west,north,east)")
+    south, west, north, east = parts
+    if south > north or west > east:
+        raise ValueError("bbox south/west must not exceed north/east")
+    return south, west, north, east
+
+
+def to_geojson(crossings: Sequence[dict]) -> dict:
+    """FeatureCollection of crossing points for map clients."""
+    return {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "id": c["id"],
+                "geometry": {"type": "Point", "coordinates": [c["lon"], c["lat"]]},
+                "properties": {k: v for k, v in c.items() if k not in ("lat", "lon")},
+            }
+            for c in crossings
+        ],
+    }
@@ -0,0 +1,228 @@
+"""
+Crossings and stations cached per fixed geographic tile.
+
+Tiles are Config.CROSSING_TILE_DEG squares aligned to whole multiples of
+the size, so any bbox maps to the same tile keys however it is drawn.
+Each tile is fetched from Overpass once, kept in memory and on disk with
+its own fetch time, and reused by every area that overlaps it: growing
+coverage from one town to a state only fetches the new tiles.
+"""
+
+import os
+import json
+import math
+import time
+import logging
+import tempfile
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import requests
+
+from .config import Config
+from .cache import CacheEntry, KeyedTTLCache
+from .ratelimit import budget
+
+logger = logging.getLogger(__name__)
+
+TileKey = Tuple[int, int]  # (row, col) = floor(lat / size), floor(lon / size)
+
+MAX_TILES_IN_MEMORY = 4096
+
+
+class TilesUnavailable(Exception):
+    """Raised when tiles a query needs are neither cached nor fetchable."""
+
+
+def tile_of(lat: float, lon: float, size: float) -> TileKey:
+    return math.floor(lat / size), math.floor(lon / size)
+
+
+def tile_keys(bbox: Tuple[float, float, float, float], size: float) -> List[TileKey]:
+    """Keys of the tiles covering a (south, west, north, east) bbox."""
+    south, west, north, east = bbox
+    (row_lo, col_lo), (row_hi, col_hi) = tile_of(south, west, size), tile_of(north, east, size)
+    return [(row, col) for row in range(row_lo, row_hi + 1) for col in range(col_lo, col_hi + 1)]
+
+
+def tile_bbox(key: TileKey, size: float) -> Tuple[float, float, float, float]:
+    row, col = key
+    return (round(row * size, 6), round(col * size, 6),
+            round((row + 1) * size, 6), round((col + 1) * size, 6))
+
+
+class CrossingTiles:
+    """
+    Tile cache in front of Overpass.
+
+    A tile holds raw railway crossing nodes ({id, name_tag, lat, lon}) and
+    named station nodes ({id, name, lat, lon}) whose position falls inside
+    it. Missing tiles are fetched in batches, several bboxes to one
+    Overpass request, and each tile is stored as soon as its batch lands,
+    so a large region that runs out of budget still makes progress.
+    """
+
+    def __init__(self, overpass_url: str, size_deg: float = 0.1, ttl_secs: float = 7 * 24 * 3600,
+                 directory: Optional[str] = None, batch: int = 16, max_query_tiles: int = 400):
+        self.overpass_url = overpass_url
+        self.size = size_deg
+        self.directory = directory
+        self.batch = batch
+        self.max_query_tiles = max_query_tiles
+        self.cache = KeyedTTLCache(max_entries=MAX_TILES_IN_MEMORY, ttl_secs=ttl_secs, name="crossing-tiles")
+        self._fetch_lock = threading.Lock()  # Guards _fetching only; never held across a request
+        self._fetching: Dict[TileKey, threading.Event] = {}  # Tiles being fetched -> set when stored or failed
+
+    @classmethod
+    def from_config(cls, overpass_url: str) -> "CrossingTiles":
+        directory = Config.CROSSING_TILE_DIR or os.path.join(tempfile.gettempdir(), "rail_crossing_tiles")
+        return cls(overpass_url, size_deg=Config.CROSSING_TILE_DEG, ttl_secs=Config.CROSSING_TILE_TTL_SECS,
+                   directory=directory, batch=Config.CROSSING_TILE_BATCH,
+                   max_query_tiles=Config.CROSSING_TILE_MAX_QUERY)
+
+    def query(self, bbox: Tuple[float, float, float, float]) -> Dict[str, List[dict]]:
+        """
+        {"crossings": [...], "stations": [...]} inside bbox, assembled from tiles.
+
+        Raises ValueError if bbox spans more than max_query_tiles, and
+        TilesUnavailable if a tile is missing and could not be fetched
+        (expired tiles are served when a refetch fails).
+        """
+        return self.assemble(self.covering(bbox), bbox)
+
+    def covering(self, bbox: Tuple[float, float, float, float]) -> Dict[TileKey, CacheEntry]:
+        """
+        The entries of the tiles covering bbox, in key order, fetching any
+        that are missing or expired. Each entry's timestamp is its tile's
+        fetch time, so callers can key what they derive from the tiles on it.
+        Raises like query().
+        """
+        keys = tile_keys(bbox, self.size)
+        if len(keys) > self.max_query_tiles:
+            raise ValueError(f"bbox spans {len(keys)} tiles (at most {self.max_query_tiles})")
+        return self._tiles(keys)
+
+    @staticmethod
+    def assemble(tiles: Dict[TileKey, CacheEntry],
+                 bbox: Optional[Tuple[float, float, float, float]] = None) -> Dict[str, List[dict]]:
+        """Merge tiles into {"crossings": [...], "stations": [...]}, clipped to bbox if given."""
+        south, west, north, east = bbox or (-math.inf, -math.inf, math.inf, math.inf)
+        seen = set()
+        result: Dict[str, List[dict]] = {"crossings": [], "stations": []}
+        for entry in tiles.values():
+            for kind, items in entry.value.items():
+                for item in items:
+                    # Overpass bboxes are inclusive, so a node on an edge may come from two tiles
+                    if item["id"] in seen or not (south <= item["lat"] <= north and west <= item["lon"] <= east):
+                        continue
+                    seen.add(item["id"])
+                    result[kind].append(item)
+        return result
+
+    def _tiles(self, keys: Sequence[TileKey]) -> Dict[TileKey, CacheEntry]:
+        missing = [key for key in keys if not self.cache.is_fresh(self._entry(key))]
+        error = None
+        if missing:
+            # Claim the tiles nobody is fetching; wait only for the ones others are,
+            # so a large region query never holds up an unrelated station's tiles
+            with self._fetch_lock:
+                mine = [key for key in missing
+                        if key not in self._fetching and not self.cache.is_fresh(self.cache.peek(key))]
+                for key in mine:
+                    self._fetching[key] = threading.Event()
+                theirs = {self._fetching[key] for key in missing if key not in mine and key in self._fetching}
+            for i in range(0, len(mine), self.batch):
+                batch = mine[i:i + self.batch]
+                try:
+                    if error is None:
+                        self._fetch(batch)
+                except Exception as e:
+                    error = e
+                finally:
+                    # Release each batch as it lands, or on failure
+                    with self._fetch_lock:
+                        for key in batch:
+                            self._fetching.pop(key).set()
+            for done in theirs:
+                done.wait()
+
+        unavailable = [key for key in keys if self.cache.peek(key) is None]
+        if error is not None:
+            logger.warning("Overpass tile fetch failed (%d tiles unavailable): %s", len(unavailable), error,
+                           extra={"fetcher": "overpass", "throttle": 30})
+        if unavailable:
+            raise TilesUnavailable(str(error or "tiles could not be fetched")) from error
+        return {key: self.cache.get(key) for key in keys}
+
+    def _entry(self, key: TileKey) -> Optional[CacheEntry]:
+        """The in-memory entry for a tile, loading the on-disk copy if fresher."""
+        entry = self.cache.get(key)
+        if self.cache.is_fresh(entry):
+            return entry
+        stored = self._read(key)
+        if stored is not None and (entry is None or stored[0] > entry.timestamp):
+            entry = self.cache.put(key, stored[1], timestamp=stored[0])
+        return entry
+
+    def _fetch(self, keys: Sequence[TileKey]):
+        """Fetch a batch of tiles in one Overpass request and store each of them."""
+        bboxes = [",".join(str(v) for v in tile_bbox(key, self.size)) for key in keys]
+        selectors = "".join(f'node["railway"~"^(level_crossing|crossing|station)$"]({b});\n' for b in bboxes)
+        query = f"[out:json][timeout:60];\n(\n{selectors});\nout body;\n"
+
+        budget.acquire(self.overpass_url)
+        r = requests.post(self.overpass_url, data=query, timeout=60)
+        r.raise_for_status()
+
+        tiles = {key: {"crossings": [], "stations": []} for key in keys}
+        for n in r.json().get("elements", []):
+            if "lat" not in n:
+                continue
+            tile = tiles.get(tile_of(n["lat"], n["lon"], self.size))
+            if tile is None:
+                continue  # On the far edge of a bbox: it belongs to a neighbouring tile
+            tags = n.get("tags", {})
+            if tags.get("railway") == "station":
+                if tags.get("name"):
+                    tile["stations"].append({"id": n["id"], "name": tags["name"], "lat": n["lat"], "lon": n["lon"]})
+            else:
+                tile["crossings"].append({"id": n["id"], "name_tag": tags.get("name") or tags.get("name:en") or None,
+                                          "lat": n["lat"], "lon": n["lon"]})
+
+        fetched_at = time.time()
+        for key, tile in tiles.items():
+            self.cache.put(key, tile, timestamp=fetched_at)
+            self._write(key, tile, fetched_at)
+        logger.info("Fetched %d crossing tiles", len(keys), extra={"fetcher": "overpass"})
+
+    def _path(self, key: TileKey) -> Optional[str]:
+        if not self.directory:
+            return None
+        row, col = key
+        return os.path.join(self.directory, f"{self.size:g}_{row}_{col}.json")
+
+    def _read(self, key: TileKey) -> Optional[Tuple[float, dict]]:
+        path = self._path(key)
+        if path is None or not os.path.exists(path):
+            return None
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            return data["fetched_at"], data["tile"]
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Ignoring unreadable tile %s: %s", path, e)
+            return None
+
+    def _write(self, key: TileKey, tile: dict, fetched_at: float):
+        """Atomically write one tile file."""
+        path = self._path(key)
+        if path is None:
+            return
+        tmp = f"{path}.{os.getpid()}.tmp"  # Workers may write the same tile
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"fetched_at": fetched_at, "tile": tile}, f, separators=(",", ":"))
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning("Could not save tile %s: %s", path, e)
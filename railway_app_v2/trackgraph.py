@@ -0,0 +1,145 @@
+"""
+Along-track distances from a station to its crossings.
+
+The track is rebuilt from Overpass railway=rail ways whenever an area's
+crossings are refreshed; shortest paths from the station are computed
+once then and stored on the crossings themselves, so requests only read
+`track_km` / `offset_min` off the cached crossing.
+"""
+
+import math
+import heapq
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .config import Config
+from .spatial import PointRTree
+from .utils import haversine_km
+
+# Stations / crossings further than this from any track node are left unmeasured
+MAX_SNAP_KM = 0.3
+
+
+class SpeedProfile:
+    """
+    Train speed by along-track distance from the station.
+
+    bands are (up_to_km, kmph) in increasing order; the last band is
+    open-ended. Trains slow through the station throat and run faster
+    further out, so offsets are not a single distance/speed division.
+    """
+
+    def __init__(self, bands: Sequence[Tuple[Optional[float], float]]):
+        self.bands = [(math.inf if upto is None else upto, kmph) for upto, kmph in bands]
+        if self.bands:
+            self.bands[-1] = (math.inf, self.bands[-1][1])
+
+    @classmethod
+    def from_config(cls) -> "SpeedProfile":
+        return cls(Config.value("TRACK_SPEED_PROFILE"))
+
+    def minutes(self, distance_km: float) -> float:
+        """Travel time over distance_km starting from the station."""
+        total, start = 0.0, 0.0
+        for upto, kmph in self.bands:
+            if distance_km <= start:
+                break
+            total += (min(distance_km, upto) - start) / kmph * 60
+            start = upto
+        return total
+
+
+class TrackGraph:
+    """
+    Undirected graph of track nodes.
+
+    Stored compactly: OSM node ids and (lat, lon) in parallel lists, and
+    per-node lists of (neighbour index, km) edges.
+    """
+
+    def __init__(self, ids: List[int], coords: List[Tuple[float, float]],
+                 adjacency: List[List[Tuple[int, float]]]):
+        self.ids = ids
+        self.coords = coords
+        self.adjacency = adjacency
+        self.index = {node_id: i for i, node_id in enumerate(ids)}
+        self._tree: Optional[PointRTree] = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def from_overpass(cls, elements: Iterable[dict]) -> "TrackGraph":
+        """Build from the elements of a `way[railway=rail]; (._;>;); out skel;` query."""
+        elements = list(elements)
+        nodes = {el["id"]: (el["lat"], el["lon"]) for el in elements if el.get("type") == "node"}
+        index: Dict[int, int] = {}
+        ids, coords, adjacency = [], [], []
+
+        def node(node_id):
+            i = index.get(node_id)
+            if i is None:
+                i = index[node_id] = len(ids)
+                ids.append(node_id)
+                coords.append(nodes[node_id])
+                adjacency.append([])
+            return i
+
+        for el in elements:
+            if el.get("type") != "way":
+                continue
+            refs = [ref for ref in el.get("nodes", ()) if ref in nodes]
+            for a, b in zip(refs, refs[1:]):
+                ia, ib = node(a), node(b)
+                (lat_a, lon_a), (lat_b, lon_b) = coords[ia], coords[ib]
+                km = haversine_km(lon_a, lat_a, lon_b, lat_b)
+                adjacency[ia].append((ib, km))
+                adjacency[ib].append((ia, km))
+        return cls(ids, coords, adjacency)
+
+    def snap(self, lat: float, lon: float, max_km: float = MAX_SNAP_KM) -> Optional[int]:
+        """Index of the nearest track node within max_km, or None."""
+        if self._tree is None:
+            self._tree = PointRTree(range(len(self.ids)), self.coords.__getitem__)
+        hits = self._tree.nearby(lat, lon, max_km, self.coords.__getitem__)
+        return hits[0][1] if hits else None
+
+    def shortest_km(self, source: int, targets: Iterable[int]) -> Dict[int, float]:
+        """Dijkstra from source, stopping once every reachable target is settled."""
+        remaining = set(targets)
+        dist = {source: 0.0}
+        found: Dict[int, float] = {}
+        heap = [(0.0, source)]
+        while heap and remaining:
+            d, i = heapq.heappop(heap)
+            if d > dist.get(i, math.inf):
+                continue
+            if i in remaining:
+                remaining.discard(i)
+                found[i] = d
+            for j, km in self.adjacency[i]:
+                nd = d + km
+                if nd < dist.get(j, math.inf):
+                    dist[j] = nd
+                    heapq.heappush(heap, (nd, j))
+        return found
+
+    def distances_to(self, lat: float, lon: float, crossings: Sequence[dict]) -> Dict[int, float]:
+        """
+        crossing id -> along-track km from the station at (lat, lon).
+
+        Level crossings are nodes of the railway ways, so they are matched
+        by id and only snapped by position when missing from the graph.
+        Crossings off the station's connected track are left out.
+        """
+        source = self.snap(lat, lon)
+        if source is None:
+            return {}
+        wanted: Dict[int, List[int]] = {}
+        for c in crossings:
+            i = self.index.get(c["id"])
+            if i is None:
+                i = self.snap(c["lat"], c["lon"])
+            if i is not None:
+                wanted.setdefault(i, []).append(c["id"])
+        found = self.shortest_km(source, wanted)
+        return {cid: km for i, km in found.items() for cid in wanted[i]}
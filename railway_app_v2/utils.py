@@ -6,11 +6,6 @@ import pytz
 
 from railway_app_v2.config import Config 
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 def now() -> datetime:
@@ -59,7 +54,7 @@ def parse_time_string(time_str: str, base: datetime) -> Optional[datetime]:
 
         return eta
     except Exception as e:
-        logger.debug(f"Failed to parse time string {time_str}: {e}")
+        logger.debug("Failed to parse time string %s: %s", time_str, e, extra={"throttle": 60})
         return None
 
 def haversine_km(lon1, lat1, lon2, lat2):
@@ -70,17 +65,32 @@ def haversine_km(lon1, lat1, lon2, lat2):
     return 2 * R * math.asin(math.sqrt(a))
 
 def dedupe_by_proximity(nodes, threshold_m=35):
+    """
+    Collapse nodes within threshold_m of an earlier kept node into it.
+
+    Kept nodes are bucketed in a lat/lon grid of roughly threshold-sized
+    cells, so each node is only compared with those within two cells of
+    it (a kept node moves by up to the threshold when a named one
+    replaces it) rather than every node kept so far.
+    """
     reps = []
     threshold_km = threshold_m / 1000.0
+    cell = threshold_km / 111.0 * 1.01  # Degrees; a hair over the threshold at any latitude
+    grid = {}
     for n in nodes:
-        found_cluster = False
-        for r in reps:
-            d = haversine_km(n["lon"], n["lat"], r["lon"], r["lat"])
-            if d <= threshold_km:
+        row = math.floor(n["lat"] / cell)
+        # Longitude degrees shrink with latitude, so widen the column search to match
+        span = math.ceil(1 / max(math.cos(math.radians(n["lat"])), 1e-6))
+        col = math.floor(n["lon"] / cell)
+        candidates = sorted(i for r in range(row - 2, row + 3) for c in range(col - 2 * span, col + 2 * span + 1)
+                            for i in grid.get((r, c), ()))
+        for i in candidates:
+            r = reps[i]
+            if haversine_km(n["lon"], n["lat"], r["lon"], r["lat"]) <= threshold_km:
                 if (not r.get("name_tag")) and n.get("name_tag"):
                     r.update(n)
-                found_cluster = True
                 break
-        if not found_cluster:
+        else:
+            grid.setdefault((row, col), []).append(len(reps))
             reps.append(dict(n))
     return reps
@@ -137,10 +137,15 @@
   function getScale() { return Math.min(24, Math.max(16, Number(localStorage.getItem("rg_font_scale") || 18))); }
   function setScale(n) { const v = Math.min(24, Math.max(16, n)); localStorage.setItem("rg_font_scale", v); applyScale(v); }
 
-  // Auto-refresh functionality
-  let autoRefreshInterval = null;
+  // Auto-refresh functionality: the chosen interval is the most often we poll;
+  // the server's max-age / X-Next-Refresh hints push the next poll out to when
+  // its data can actually change, and polling pauses while the tab is hidden.
+  let refreshTimer = null;
+  let nextFetchAt = null;
   let currentRefreshRate = 30; // seconds
   let isAutoRefreshEnabled = false;
+  let lastEtag = null;
+  let hintedDelay = null; // seconds, from the last response
 
   function getRefreshSettings() {
     // Default to enabled if not set
@@ -158,6 +163,13 @@
     currentRefreshRate = interval;
   }
 
+  function currentPageNumber() {
+    // Pre-rendered pages live at /trains/page/N/ rather than ?page=N
+    const nav = document.querySelector('.pagination[data-page]');
+    if (nav) return parseInt(nav.dataset.page);
+    return parseInt(new URLSearchParams(window.location.search).get('page') || '1');
+  }
+
   function updateTrainData(data) {
     if (!data.success) {
       console.error('Failed to fetch train data:', data.error);
@@ -189,7 +201,7 @@
     // Update cards
     const cardsContainer = document.querySelector('.cards');
     if (cardsContainer && data.trains) {
-      const currentPage = parseInt(new URLSearchParams(window.location.search).get('page') || '1');
+      const currentPage = currentPageNumber();
       const pageSize = 10; // Same as PAGE_SIZE in Python
       const startIdx = (currentPage - 1) * pageSize;
       const endIdx = startIdx + pageSize;
@@ -222,7 +234,7 @@
     // Update table
     const tbody = document.querySelector('table tbody');
     if (tbody && data.trains) {
-      const currentPage = parseInt(new URLSearchParams(window.location.search).get('page') || '1');
+      const currentPage = currentPageNumber();
       const pageSize = 10;
       const startIdx = (currentPage - 1) * pageSize;
       const endIdx = startIdx + pageSize;
@@ -270,6 +282,37 @@
     }
   }
 
+  function clearLoadingState() {
+    const manualBtn = document.getElementById('manual-refresh-btn');
+    const sectionHeader = document.querySelector('.section-header');
+    const heroStatus = document.querySelector('.hero-status');
+    const countdown = document.getElementById('countdown');
+    if (manualBtn) {
+      manualBtn.classList.remove('loading');
+      manualBtn.disabled = false;
+    }
+    if (sectionHeader) {
+      sectionHeader.classList.remove('updating');
+    }
+    if (heroStatus) {
+      heroStatus.classList.remove('updating');
+    }
+    if (countdown) {
+      countdown.classList.remove('loading');
+    }
+    // Remove loading effects from all elements
+    document.querySelectorAll('.rel').forEach(el => el.classList.remove('loading'));
+    document.querySelectorAll('.card').forEach(card => card.classList.remove('updating'));
+  }
+
+  function hintedDelaySecs(response) {
+    // Seconds until the server expects its data to change, or null without hints
+    const maxAge = (response.headers.get('Cache-Control') || '').match(/max-age=(\d+)/);
+    if (maxAge) return parseInt(maxAge[1]);
+    const nextRefresh = parseInt(response.headers.get('X-Next-Refresh'));
+    return nextRefresh ? Math.max(0, nextRefresh - Date.now() / 1000) : null;
+  }
+
   function fetchTrainData() {
     const manualBtn = document.getElementById('manual-refresh-btn');
     const sectionHeader = document.querySelector('.section-header');
@@ -297,72 +340,81 @@
     // Add subtle loading state to train cards
     trainCards.forEach(card => card.classList.add('updating'));
     
-    fetch('/api/trains')
-      .then(response => response.json())
+    // Conditional request: a 304 means the trains we are showing are current
+    const headers = lastEtag ? { 'If-None-Match': lastEtag } : {};
+    fetch('/api/trains', { headers })
+      .then(response => {
+        hintedDelay = hintedDelaySecs(response);
+        if (response.status === 304) return null;
+        lastEtag = response.headers.get('ETag');
+        return response.json();
+      })
       .then(data => {
-        updateTrainData(data);
+        if (data) {
+          updateTrainData(data);
+        } else {
+          updateLastRefreshTime(null);
+        }
         // Add a small delay to show the loading animation
-        setTimeout(() => {
-          if (manualBtn) {
-            manualBtn.classList.remove('loading');
-            manualBtn.disabled = false;
-          }
-          if (sectionHeader) {
-            sectionHeader.classList.remove('updating');
-          }
-          if (heroStatus) {
-            heroStatus.classList.remove('updating');
-          }
-          if (countdown) {
-            countdown.classList.remove('loading');
-          }
-          // Remove loading effects from all elements
-          document.querySelectorAll('.rel').forEach(el => el.classList.remove('loading'));
-          document.querySelectorAll('.card').forEach(card => card.classList.remove('updating'));
-        }, 1200); // Longer delay to appreciate the stylish animations
+        setTimeout(clearLoadingState, 1200); // Longer delay to appreciate the stylish animations
       })
       .catch(error => {
         console.error('Error fetching train data:', error);
+        hintedDelay = null;
         updateLastRefreshTime(null);
         // Remove loading state on error
-        if (manualBtn) {
-          manualBtn.classList.remove('loading');
-          manualBtn.disabled = false;
-        }
-        if (sectionHeader) {
-          sectionHeader.classList.remove('updating');
-        }
-        if (heroStatus) {
-          heroStatus.classList.remove('updating');
-        }
-        if (countdown) {
-          countdown.classList.remove('loading');
-        }
-        // Remove loading effects from all elements
-        document.querySelectorAll('.rel').forEach(el => el.classList.remove('loading'));
-        document.querySelectorAll('.card').forEach(card => card.classList.remove('updating'));
-      });
+        clearLoadingState();
+      })
+      .finally(scheduleNextFetch);
   }
 
-  function startAutoRefresh() {
-    if (autoRefreshInterval) {
-      clearInterval(autoRefreshInterval);
+  function scheduleNextFetch(delaySecs) {
+    if (refreshTimer) {
+      clearTimeout(refreshTimer);
+      refreshTimer = null;
     }
-    
+    if (!isAutoRefreshEnabled) return;
+
+    if (typeof delaySecs !== 'number') {
+      delaySecs = Math.max(currentRefreshRate, hintedDelay || 0);
+      nextFetchAt = Date.now() + delaySecs * 1000;
+    }
+    // Hidden tabs keep nextFetchAt but hold no timer; see visibilitychange
+    if (!document.hidden) {
+      refreshTimer = setTimeout(fetchTrainData, delaySecs * 1000);
+    }
+  }
+
+  function startAutoRefresh() {
     if (isAutoRefreshEnabled) {
-      autoRefreshInterval = setInterval(fetchTrainData, currentRefreshRate * 1000);
+      scheduleNextFetch();
       updateRefreshUI();
     }
   }
 
   function stopAutoRefresh() {
-    if (autoRefreshInterval) {
-      clearInterval(autoRefreshInterval);
-      autoRefreshInterval = null;
+    if (refreshTimer) {
+      clearTimeout(refreshTimer);
+      refreshTimer = null;
     }
+    nextFetchAt = null;
     updateRefreshUI();
   }
 
+  document.addEventListener('visibilitychange', () => {
+    if (!isAutoRefreshEnabled) return;
+    if (document.hidden) {
+      if (refreshTimer) {
+        clearTimeout(refreshTimer);
+        refreshTimer = null;
+      }
+    } else if (nextFetchAt === null || Date.now() >= nextFetchAt) {
+      fetchTrainData(); // Overdue while hidden: catch up straight away
+    } else {
+      scheduleNextFetch((nextFetchAt - Date.now()) / 1000);
+    }
+  });
+
   function updateRefreshUI() {
     const toggleBtn = document.getElementById('auto-refresh-toggle');
     const intervalSelect = document.getElementById('refresh-interval');
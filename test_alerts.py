@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Tests for gate-closing alert subscriptions.
+"""
+
+import time
+import queue
+from datetime import datetime, timedelta
+
+import pytest
+import pytz
+
+from railway_app_v2.alerts import AlertManager
+from railway_app_v2.models import TrainETA
+
+IST = pytz.timezone('Asia/Kolkata')
+PRE_CLOSE = 300
+LEAD = 120
+
+
+def train(no, eta):
+    return TrainETA(train_no=no, name=f"Train {no}", eta_at_station=eta, eta_at_crossing=eta, source="test")
+
+
+def test_groups_are_timed_once_and_retimed_on_refresh():
+    now = datetime.now(IST)
+    due = now + timedelta(seconds=PRE_CLOSE + LEAD - 1)  # Already inside the lead
+    later = now + timedelta(hours=1)
+    etas = {"VN": [(due, train("12658", due)), (later, train("12640", later))]}
+    manager = AlertManager(lambda code, crossing_id: etas[code], pre_close_secs=PRE_CLOSE)
+
+    first, second = queue.Queue(), queue.Queue()
+    manager.subscribe("VN", 42, LEAD, events=first)
+    manager.subscribe("VN", 42, LEAD, events=second)
+    assert first.get(timeout=2)["train_no"] == "12658"
+    assert second.get(timeout=2)["train_no"] == "12658"
+
+    # Both subscriptions share one deadline: the next train's alert time
+    deadline = later.timestamp() - PRE_CLOSE - LEAD
+    assert manager.scheduler.pending() == pytest.approx({("VN", 42, LEAD): deadline})
+
+    # A refresh brings 12640 forward; 12658 is not alerted twice
+    moved = now + timedelta(seconds=PRE_CLOSE + LEAD - 5)
+    etas["VN"] = [(due, train("12658", due)), (moved, train("12640", moved))]
+    manager.stations_changed(["VN"])
+    event = first.get(timeout=2)
+    assert event["train_no"] == "12640"
+    assert event["gate_closes_at"] == (moved - timedelta(seconds=PRE_CLOSE)).isoformat()
+    assert second.get(timeout=2)["train_no"] == "12640"
+    time.sleep(0.1)
+    assert first.empty()
+
+
+def test_unsubscribing_the_last_member_drops_the_group():
+    manager = AlertManager(lambda code, crossing_id: [], pre_close_secs=PRE_CLOSE)
+    subs = [manager.subscribe("VN", 7, LEAD, events=queue.Queue()) for _ in range(3)]
+    assert len(manager) == 3
+    for sub in subs[:-1]:
+        assert manager.unsubscribe(sub.id)
+    assert ("VN", 7, LEAD) in manager._groups
+    assert manager.unsubscribe(subs[-1].id)
+    assert not manager._groups and not manager._by_station
+    assert manager.scheduler.pending() == {}
+
+
+def test_webhooks_must_be_local():
+    manager = AlertManager(lambda code, crossing_id: [], pre_close_secs=PRE_CLOSE)
+    with pytest.raises(ValueError):
+        manager.subscribe("VN", 7, LEAD, webhook="https://example.com/hook")
+    assert manager.subscribe("VN", 7, LEAD, webhook="http://127.0.0.1:9000/hook").webhook
+
+
+def test_only_webhook_subscriptions_lapse_and_they_can_be_renewed():
+    manager = AlertManager(lambda code, crossing_id: [], pre_close_secs=PRE_CLOSE, ttl_secs=60)
+    stream = manager.subscribe("VN", 7, LEAD, events=queue.Queue())
+    hook = manager.subscribe("VN", 7, LEAD, webhook="http://127.0.0.1:9000/hook")
+    assert stream.to_dict()["expires_at"] is None
+    assert manager.stations() == ["VN"]
+
+    hook.expires_at = time.time() - 1
+    assert manager.renew(hook.id).expires_at > time.time() + 30
+    manager._fire(("VN", 7, LEAD))
+    assert manager.get(stream.id) is stream and manager.get(hook.id) is hook
+
+    manager.ttl_secs = 0
+    manager.renew(hook.id)
+    manager._fire(("VN", 7, LEAD))
+    assert manager.get(hook.id) is None and manager.get(stream.id) is stream
+
+
+def test_lapsed_webhooks_are_reaped_with_no_train_ahead():
+    manager = AlertManager(lambda code, crossing_id: [], pre_close_secs=PRE_CLOSE, ttl_secs=0.2)
+    stream = manager.subscribe("VN", 7, LEAD, events=queue.Queue())
+    first = manager.subscribe("VN", 7, LEAD, webhook="http://127.0.0.1:9000/hook")
+    second = manager.subscribe("VN", 8, LEAD, webhook="http://127.0.0.1:9000/hook")
+    time.sleep(0.5)
+    assert manager.get(first.id) is None and manager.get(second.id) is None
+    assert len(manager) == 1 and manager.get(stream.id) is stream
+    assert ("VN", 8, LEAD) not in manager._groups
+
+
+def test_subscribe_rejects_non_object_bodies():
+    import app as railway_app
+    with railway_app.app.test_client() as client:
+        assert client.post('/api/alerts', json=[1]).status_code == 400
+        assert client.post('/api/alerts/999999/renew').status_code == 404
+
+
+def test_stations_with_subscribers_stay_active(monkeypatch):
+    import app as railway_app
+    monkeypatch.setitem(railway_app.TRAIN_DATA_CACHE, 'last_user_activity', {})
+    assert not railway_app.is_user_active("JTJ")
+    sub = railway_app.alert_manager.subscribe("JTJ", 7, LEAD, events=queue.Queue())
+    try:
+        assert railway_app.is_user_active("JTJ")
+    finally:
+        railway_app.alert_manager.unsubscribe(sub.id)
+    assert not railway_app.is_user_active("JTJ")
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Tests for the /api/batch endpoint.
+"""
+
+import threading
+import time
+
+import app as railway_app
+from railway_app_v2.config import Config
+from railway_app_v2.fetchers.simulation import SimulationFetcher, TimetableGenerator
+from railway_app_v2.ratelimit import Priority, _priority, upstream_priority
+
+
+class CountingFetcher(SimulationFetcher):
+    """Simulated trains, slowly, counting how many fetches reach the source."""
+
+    def __init__(self):
+        super().__init__(TimetableGenerator(n_trains=300, seed=5))
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def iter_fetch(self, station_code, hours):
+        with self._lock:
+            self.calls += 1
+        time.sleep(0.2)
+        return super().iter_fetch(station_code, hours)
+
+
+def test_batch_streams_every_result_and_coalesces_misses(monkeypatch):
+    fetcher = CountingFetcher()
+    monkeypatch.setattr(railway_app, "train_fetcher", fetcher)
+    railway_app.TRAIN_CACHE.invalidate(Config.STATION_CODE)
+    queries = [{"station": Config.STATION_CODE, "limit": n} for n in range(1, 6)]
+    queries += [{"station": "NOPE"}, {"station": Config.STATION_CODE, "crossing_id": "x"}, "VN"]
+    with railway_app.app.test_client() as client:
+        response = client.post('/api/batch', json={"queries": queries})
+        assert response.status_code == 200
+        data = response.get_json()
+    assert data["success"] and data["count"] == len(queries)
+    results = {r["index"]: r for r in data["results"]}
+    assert sorted(results) == list(range(len(queries)))
+    for n in range(5):
+        assert results[n]["status"] == 200
+        assert len(results[n]["trains"]) == n + 1
+    assert results[5]["status"] == 404
+    assert results[6]["status"] == 400 and results[7]["status"] == 400
+    assert fetcher.calls == 1
+    railway_app.TRAIN_CACHE.invalidate(Config.STATION_CODE)
+
+
+def test_batch_rejects_bad_bodies():
+    with railway_app.app.test_client() as client:
+        assert client.post('/api/batch', json={}).status_code == 400
+        too_many = [{"station": Config.STATION_CODE}] * (railway_app.BATCH_MAX_QUERIES + 1)
+        assert client.post('/api/batch', json={"queries": too_many}).status_code == 400
+
+
+def test_batch_records_activity_once_per_station(monkeypatch):
+    monkeypatch.setattr(railway_app, "train_fetcher", SimulationFetcher(TimetableGenerator(n_trains=50, seed=5)))
+    recorded = []
+    real = railway_app.record_user_activity
+    monkeypatch.setattr(railway_app, "record_user_activity", lambda code: (recorded.append(code), real(code)))
+    queries = [{"station": "VN"}, {"station": "vn", "limit": 2}, {"station": "JTJ"}, {"station": "NOPE"}]
+    with railway_app.app.test_client() as client:
+        data = client.post('/api/batch', json={"queries": queries}).get_json()
+        assert [r["status"] for r in sorted(data["results"], key=lambda r: r["index"])] == [200, 200, 200, 404]
+        assert client.post('/api/batch', json=[1]).status_code == 400
+    assert sorted(recorded) == ["JTJ", "VN"]
+    for code in ("VN", "JTJ"):
+        railway_app.TRAIN_CACHE.invalidate(code)
+
+
+def test_batch_queries_keep_the_callers_upstream_priority(monkeypatch):
+    monkeypatch.setattr(railway_app, "train_fetcher", SimulationFetcher(TimetableGenerator(n_trains=50, seed=5)))
+    seen = []
+    real = railway_app.resolve_batch_query
+    monkeypatch.setattr(railway_app, "resolve_batch_query", lambda query: (seen.append(_priority.get()), real(query))[1])
+    with railway_app.app.test_client() as client, upstream_priority(Priority.BACKGROUND):
+        data = client.post('/api/batch', json={"queries": [{"station": "VN"}, {"station": "JTJ"}]}).get_json()
+    assert data["count"] == 2  # Reading the body waits for every query
+    assert seen == [Priority.BACKGROUND] * 2
+    for code in ("VN", "JTJ"):
+        railway_app.TRAIN_CACHE.invalidate(code)
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Tests for the per-key LRU cache with single-flight loading.
+"""
+
+import threading
+import time
+
+import pytest
+
+from railway_app_v2.cache import KeyedTTLCache
+
+
+def test_least_recently_used_key_is_evicted():
+    cache = KeyedTTLCache(max_entries=2, ttl_secs=60)
+    cache.put("VN", 1)
+    cache.put("JTJ", 2)
+    cache.get("VN")  # VN is now the most recently used
+    cache.put("KPD", 3)
+
+    assert cache.keys() == ["VN", "KPD"]
+    assert cache.peek("JTJ") is None
+
+
+def test_expired_entry_is_reloaded():
+    cache = KeyedTTLCache(max_entries=4, ttl_secs=0)
+    cache.put("VN", "old")
+    entry = cache.get_or_load("VN", lambda: "new")
+    assert entry.value == "new"
+
+
+def test_concurrent_misses_share_one_load():
+    cache = KeyedTTLCache(max_entries=4, ttl_secs=60)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        time.sleep(0.1)
+        return "trains"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load("VN", loader).value))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert results == ["trains"] * 8
+
+
+def test_failed_load_is_not_cached():
+    cache = KeyedTTLCache(max_entries=4, ttl_secs=60)
+
+    def failing():
+        raise RuntimeError("upstream down")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_load("VN", failing)
+    assert "VN" not in cache
+    assert cache.get_or_load("VN", lambda: "ok").value == "ok"
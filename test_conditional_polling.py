@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Tests for /api/trains validators and polling hints.
+"""
+
+import time
+
+import app as railway_app
+from railway_app_v2.config import Config
+from railway_app_v2.fetchers.simulation import SimulationFetcher, TimetableGenerator
+
+
+def test_unchanged_trains_answer_304_with_hints(monkeypatch):
+    monkeypatch.setattr(railway_app, "train_fetcher", SimulationFetcher(TimetableGenerator(n_trains=300, seed=5)))
+    railway_app.TRAIN_CACHE.invalidate(Config.STATION_CODE)
+    with railway_app.app.test_client() as client:
+        first = client.get('/api/trains')
+        assert first.status_code == 200
+        etag = first.headers["ETag"]
+        assert etag.startswith('W/"')
+
+        max_age = int(first.headers["Cache-Control"].split("max-age=")[1])
+        assert railway_app.CLIENT_MIN_POLL_SECS <= max_age <= railway_app.TRAIN_CACHE.ttl_secs
+        assert abs(int(first.headers["X-Next-Refresh"]) - (time.time() + max_age)) <= 2
+
+        again = client.get('/api/trains', headers={"If-None-Match": etag})
+        assert again.status_code == 304
+        assert again.data == b""
+        assert again.headers["ETag"] == etag
+
+        # The validator covers the encoding too
+        epoch = client.get('/api/trains?schema=epoch', headers={"If-None-Match": etag})
+        assert epoch.status_code == 200
+        assert epoch.headers["ETag"] != etag
+    railway_app.TRAIN_CACHE.invalidate(Config.STATION_CODE)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Tests for hot-reloadable config file overrides.
+"""
+
+import json
+import os
+from datetime import timedelta
+
+import pytest
+
+from railway_app_v2.config import Config, ConfigWatcher, Overrides, data_source_from_env
+from railway_app_v2.models import DataSource
+
+
+@pytest.fixture
+def config_file(tmp_path):
+    path = tmp_path / "config.json"
+    yield path
+    Config._overrides = Overrides()
+
+
+def write(path, data, mtime):
+    path.write_text(json.dumps(data))
+    os.utime(path, (mtime, mtime))
+
+
+def test_station_override_wins_over_global_and_default(config_file):
+    write(config_file, {"globals": {"AVG_SPEED_KMPH": 60},
+                        "stations": {"jtj": {"AVG_SPEED_KMPH": 40}}}, 1000)
+    assert ConfigWatcher(str(config_file)).check(force=True)
+    assert Config.value("AVG_SPEED_KMPH", "JTJ") == 40
+    assert Config.value("AVG_SPEED_KMPH", "VN") == 60
+    assert Config.value("DIST_KM_FROM_STATION", "VN") == Config.DIST_KM_FROM_STATION
+
+
+def test_reload_reports_only_affected_stations(config_file):
+    changes = []
+    watcher = ConfigWatcher(str(config_file))
+    watcher.add_listener(changes.append)
+    write(config_file, {"stations": {"VN": {"DIST_KM_FROM_STATION": 1.2}}}, 1000)
+    watcher.check(force=True)
+    write(config_file, {"stations": {"VN": {"DIST_KM_FROM_STATION": 1.2},
+                                     "JTJ": {"DIST_KM_FROM_STATION": 2.0}},
+                        "crossings": {"42": {"distance_km": 0.5}}}, 2000)
+    watcher.check(force=True)
+    assert changes[-1].train_stations == {"JTJ"}
+    assert changes[-1].crossings == {"42"}
+    assert Config.crossing(42) == {"distance_km": 0.5}
+    # Unchanged mtime: nothing is re-read
+    assert not watcher.check(force=True)
+
+
+def test_invalid_file_keeps_previous_overrides(config_file):
+    watcher = ConfigWatcher(str(config_file))
+    write(config_file, {"globals": {"MAX_RETRIES": 2}}, 1000)
+    watcher.check(force=True)
+    write(config_file, {"globals": {"NO_SUCH_SETTING": 1}}, 2000)
+    assert not watcher.check(force=True)
+    assert Config.value("MAX_RETRIES") == 2
+
+
+def test_config_file_can_add_a_station(config_file):
+    write(config_file, {"stations": {"KPN": {"name": "Kuppam", "bbox": "12.70,78.30,12.80,78.40",
+                                             "lat": 12.75, "lon": 78.35}}}, 1000)
+    ConfigWatcher(str(config_file)).check(force=True)
+    assert Config.station("KPN")["name"] == "Kuppam"
+    assert "KPN" in Config.station_codes()
+
+
+def test_settings_that_need_a_restart_are_rejected(config_file):
+    watcher = ConfigWatcher(str(config_file))
+    write(config_file, {"globals": {"TRAIN_CACHE_TTL_SECS": 10}}, 1000)
+    assert not watcher.check(force=True)
+    write(config_file, {"crossings": {"42": {"label": "Gate 42"}}}, 2000)
+    assert not watcher.check(force=True)
+    write(config_file, {"globals": {"TRACK_SPEED_PROFILE": [[None, 60]]}}, 3000)
+    assert watcher.check(force=True)
+
+
+def test_crossing_override_applies_on_the_modelled_line(config_file, monkeypatch):
+    import app as railway_app
+    from railway_app_v2.fetchers.simulation import SimulationFetcher, TimetableGenerator
+
+    monkeypatch.setattr(railway_app, "train_fetcher", SimulationFetcher(TimetableGenerator(n_trains=50, seed=5)))
+    monkeypatch.setattr(railway_app, "crossing_etas", lambda code: {42: []})  # Placed on the line
+    crossing = {"id": 42, "distance_km": 3.0, "track_km": None, "offset_min": None}
+    assert railway_app.crossing_train_etas(Config.STATION_CODE, crossing) == []
+
+    railway_app._CROSSING_ETAS["VN"] = ("stale",)
+    watcher = ConfigWatcher(str(config_file))
+    watcher.add_listener(railway_app.apply_config_change)
+    write(config_file, {"crossings": {"42": {"distance_km": 1.0, "speed_kmph": 60}}}, 1000)
+    assert watcher.check(force=True)
+    assert "VN" not in railway_app._CROSSING_ETAS
+    etas = railway_app.crossing_train_etas(Config.STATION_CODE, crossing)
+    assert etas and all(t.eta_at_station - eta == timedelta(minutes=1) for eta, t in etas)
+    railway_app.TRAIN_CACHE.invalidate(Config.STATION_CODE)
+
+
+def test_unknown_data_source_falls_back_to_erail(monkeypatch):
+    monkeypatch.setenv("DATA_SOURCE", "Simulate")
+    assert data_source_from_env() == DataSource.SIMULATE
+    monkeypatch.setenv("DATA_SOURCE", "simulation")
+    assert data_source_from_env() == DataSource.ERAIL
+
+
+def test_speed_profile_change_retimes_cached_crossings(config_file):
+    import app as railway_app
+    from railway_app_v2.fetchers.overpass import _CROSSINGS_CACHE
+
+    key = ("profile-test", "Nowhere")
+    _CROSSINGS_CACHE.put(key, {"station": None, "total": 1,
+                               "crossings": [{"id": 7, "track_km": 2.0, "offset_min": 1.0}]}, timestamp=1234.0)
+    railway_app._CROSSING_ETAS["VN"] = ("stale",)
+    watcher = ConfigWatcher(str(config_file))
+    watcher.add_listener(railway_app.apply_config_change)
+    write(config_file, {"globals": {"TRACK_SPEED_PROFILE": [[None, 60]]}}, 1000)
+    try:
+        assert watcher.check(force=True)
+        entry = _CROSSINGS_CACHE.peek(key)
+        assert entry.value["crossings"][0]["offset_min"] == 2.0
+        assert entry.timestamp == 1234.0  # Re-timed, not refreshed
+        assert "VN" not in railway_app._CROSSING_ETAS
+    finally:
+        _CROSSINGS_CACHE.invalidate(key)
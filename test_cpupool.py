@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Tests for running parsing and enrichment on the CPU process pool.
+"""
+
+from datetime import datetime
+
+import pytest
+import pytz
+
+from railway_app_v2.cpupool import CPUPool
+from railway_app_v2.fetchers import erail
+from railway_app_v2.fetchers.erail import ErailFetcher
+from railway_app_v2.fetchers.overpass import label_crossings
+from railway_app_v2.fetchers.simulation import TimetableGenerator
+
+IST = pytz.timezone('Asia/Kolkata')
+BASE = IST.localize(datetime(2025, 8, 26, 6, 0))
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = CPUPool(2)
+    yield pool
+    pool.shutdown()
+
+
+def test_inline_pool_runs_jobs_as_completed_futures():
+    assert CPUPool(0).submit(sum, [1, 2, 3]).result() == 6
+    with pytest.raises(ZeroDivisionError):
+        CPUPool(0).submit(divmod, 1, 0).result()
+
+
+def test_worker_parsing_matches_inline(monkeypatch, pool):
+    payload = TimetableGenerator(n_trains=600, seed=3).to_erail_payload("VN", BASE)
+    inline = list(ErailFetcher()._iter_erail_records(payload, "VN", BASE))
+
+    monkeypatch.setattr(erail, "cpu_pool", pool)
+    monkeypatch.setattr(erail, "PARSE_BATCH_RECORDS", 50)
+    fetcher = ErailFetcher()
+    chunks = (payload[i:i + 997] for i in range(0, len(payload), 997))
+    assert list(fetcher._iter_erail_records(chunks, "VN", BASE)) == inline
+    # Unchanged records are still reused rather than shipped to a worker again
+    extra = "^99999~Test Express~Chennai~MAS~Bengaluru~SBC~~~~~07.30~08.00~00.30~1111111~~"
+    again = list(fetcher._iter_erail_records(payload + extra, "VN", BASE))
+    assert again[:-1] == inline and again[-1].train_no == "99999"
+
+
+def test_worker_labelling_matches_inline(pool):
+    crossings = [(i, None if i % 3 else f"LC {i}", 12.6 + i * 0.001, 78.5 + i * 0.002) for i in range(40)]
+    roads = [("Bypass Road", 12.61, 78.52), ("Station Road", 12.63, 78.55)]
+    places = [("Vaniyambadi", 12.68, 78.62)]
+    args = (crossings, roads, places, 12.68, 78.62)
+    assert pool.submit(label_crossings, *args).result() == label_crossings(*args)
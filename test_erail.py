@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Tests for incremental parsing of Erail responses.
+"""
+
+from datetime import datetime, timedelta
+
+import pytz
+
+from railway_app_v2.fetchers.erail import ErailFetcher
+from railway_app_v2.fetchers.simulation import TimetableGenerator
+
+IST = pytz.timezone('Asia/Kolkata')
+BASE = IST.localize(datetime(2025, 8, 26, 6, 0))
+
+
+class CountingErailFetcher(ErailFetcher):
+    def __init__(self):
+        super().__init__()
+        self.parsed_records = 0
+
+    def _parse_record(self, rec):
+        self.parsed_records += 1
+        return super()._parse_record(rec)
+
+
+def test_unchanged_body_is_not_reparsed_but_window_is_reapplied():
+    payload = TimetableGenerator(n_trains=60, seed=3).to_erail_payload("VN", BASE)
+    fetcher = CountingErailFetcher()
+    first = fetcher._parse_erail_response(payload, "VN", 4, base=BASE)
+    parsed = fetcher.parsed_records
+
+    again = fetcher._parse_erail_response(payload, "VN", 4, base=BASE)
+    assert fetcher.parsed_records == parsed
+    assert again == first
+
+    later = fetcher._parse_erail_response(payload, "VN", 4, base=BASE.replace(hour=7))
+    assert fetcher.parsed_records == parsed
+    assert all(t.eta_at_crossing >= BASE.replace(hour=7) for t in later)
+
+
+def test_changed_body_only_parses_new_records():
+    payload = TimetableGenerator(n_trains=60, seed=3).to_erail_payload("VN", BASE)
+    fetcher = CountingErailFetcher()
+    fetcher._parse_erail_response(payload, "VN", 24, base=BASE)
+    before = fetcher.parsed_records
+
+    extra = "^99999~Test Express~Chennai~MAS~Bengaluru~SBC~~~~~07.30~08.00~00.30~1111111~~"
+    result = fetcher._parse_erail_response(payload + extra, "VN", 24, base=BASE)
+    assert fetcher.parsed_records == before + 1
+    assert "99999" in [t.train_no for t in result]
+    assert result == ErailFetcher()._parse_erail_response(payload + extra, "VN", 24, base=BASE)
+
+
+def chunked(text, size):
+    return (text[i:i + size] for i in range(0, len(text), size))
+
+
+def test_streamed_chunks_parse_like_the_whole_body():
+    payload = TimetableGenerator(n_trains=60, seed=3).to_erail_payload("VN", BASE)
+    whole = list(ErailFetcher()._iter_erail_records(payload, "VN", BASE))
+    # Chunk boundaries land inside records and on '^' alike
+    for size in (1, 7, 64, 4096):
+        assert list(ErailFetcher()._iter_erail_records(chunked(payload, size), "VN", BASE)) == whole
+
+    # A fully streamed body is remembered like a whole one
+    fetcher = CountingErailFetcher()
+    list(fetcher._iter_erail_records(chunked(payload, 50), "VN", BASE))
+    parsed = fetcher.parsed_records
+    assert fetcher._parse_erail_response(payload, "VN", 24, base=BASE)
+    assert fetcher.parsed_records == parsed
+
+
+class FakeStreamedResponse:
+    status_code = 200
+    encoding = "utf-8"
+
+    def __init__(self, body, headers=None):
+        self.body = body.encode("utf-8")
+        self.headers = headers or {}
+        self.elapsed = timedelta(0)
+        self.read = 0
+        self.closed = False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.body), chunk_size):
+            self.read = i + chunk_size
+            yield self.body[i:i + chunk_size]
+
+    def close(self):
+        self.closed = True
+
+
+def test_stopping_early_closes_the_stream_unread(monkeypatch):
+    payload = TimetableGenerator(n_trains=2000, seed=3).to_erail_payload("VN", BASE)
+    response = FakeStreamedResponse(payload)
+    monkeypatch.setattr("railway_app_v2.fetchers.erail.requests.get", lambda *a, **kw: response)
+    monkeypatch.setattr("railway_app_v2.fetchers.erail.budget.acquire", lambda *a, **kw: None)
+
+    fetcher = ErailFetcher()
+    records = fetcher.iter_fetch("VN", 4)
+    first = next(records)
+    records.close()
+
+    assert first.train_no
+    assert response.closed
+    assert response.read < len(response.body)
+    assert "VN" not in fetcher._parsed
+
+
+def test_unchanged_streamed_body_is_not_read_again(monkeypatch):
+    payload = TimetableGenerator(n_trains=60, seed=3).to_erail_payload("VN", BASE)
+    requests_seen = []
+
+    def get(url, params, headers, timeout, stream):
+        requests_seen.append(headers)
+        return responses.pop(0)
+
+    monkeypatch.setattr("railway_app_v2.fetchers.erail.requests.get", get)
+    monkeypatch.setattr("railway_app_v2.fetchers.erail.budget.acquire", lambda *a, **kw: None)
+    fetcher = CountingErailFetcher()
+    responses = [FakeStreamedResponse(payload, {"ETag": '"v1"'}), FakeStreamedResponse(payload, {"ETag": '"v1"'})]
+    first = list(fetcher.iter_fetch("VN", 24))
+    parsed = fetcher.parsed_records
+
+    second_response = responses[0]
+    assert list(fetcher.iter_fetch("VN", 24)) == first
+    assert requests_seen[1]["If-None-Match"] == '"v1"'
+    assert second_response.read == 0 and second_response.closed
+    assert fetcher.parsed_records == parsed
+
+    not_modified = FakeStreamedResponse("")
+    not_modified.status_code = 304
+    responses = [not_modified]
+    assert list(fetcher.iter_fetch("VN", 24)) == first
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Tests for the streaming train exports.
+"""
+
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as railway_app
+from railway_app_v2.export import IST, iter_window, parse_time_param
+from railway_app_v2.fetchers.simulation import SimulationFetcher, TimetableGenerator
+from railway_app_v2.models import TrainETA
+from railway_app_v2.snapshot import TrainSnapshot
+
+STATIONS = ("VN", "JTJ")
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(railway_app, "train_fetcher", SimulationFetcher(TimetableGenerator(n_trains=100, seed=5)))
+    for code in STATIONS:
+        railway_app.TRAIN_CACHE.invalidate(code)
+    with railway_app.app.test_client() as client:
+        yield client
+    for code in STATIONS:
+        railway_app.TRAIN_CACHE.invalidate(code)
+
+
+def ndjson(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_ndjson_merges_stations_in_eta_order(client):
+    rows = ndjson(client.get('/api/trains.ndjson?station=VN,JTJ'))
+    assert {r["station"] for r in rows} == set(STATIONS)
+    etas = [r["eta_at_crossing"] for r in rows]
+    assert etas == sorted(etas)
+    assert ndjson(client.get('/api/trains.ndjson?station=VN,JTJ&limit=5')) == rows[:5]
+
+
+def test_window_is_applied_to_ndjson_and_csv(client):
+    rows = ndjson(client.get('/api/trains.ndjson?station=VN'))
+    start, end = rows[3]["eta_at_crossing"], rows[10]["eta_at_crossing"]
+    query = f'station=VN&from={start.replace("+", "%2B")}&to={end.replace("+", "%2B")}'
+    window = ndjson(client.get(f'/api/trains.ndjson?{query}'))
+    assert window and all(start <= r["eta_at_crossing"] <= end for r in window)
+
+    response = client.get(f'/api/trains.csv?{query}')
+    assert response.mimetype == "text/csv"
+    table = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert [r["train_no"] for r in table] == [r["train_no"] for r in window]
+
+
+def test_bad_parameters_are_rejected(client):
+    assert client.get('/api/trains.ndjson?station=NOPE').status_code == 404
+    assert client.get('/api/trains.ndjson?from=tomorrow').status_code == 400
+    assert client.get('/api/trains.csv?to=25:99').status_code == 400
+    assert client.get('/api/trains.ndjson?from=99999999999999999').status_code == 400
+
+
+def test_out_of_range_epochs_are_value_errors():
+    with pytest.raises(ValueError):
+        parse_time_param("99999999999999999")
+
+
+def test_iter_window_skips_passed_trains_and_stops_at_end():
+    base = IST.localize(datetime(2025, 9, 17, 17, 0))
+    trains = [TrainETA(str(i), f"Train {i}", base + timedelta(minutes=i), base + timedelta(minutes=i), "test")
+              for i in range(6)]
+    snapshot = TrainSnapshot("VN", trains)
+    now = base + timedelta(minutes=1, seconds=30)
+    assert [t.train_no for t in iter_window(snapshot, now=now)] == ["2", "3", "4", "5"]
+    assert [t.train_no for t in iter_window(snapshot, base, base + timedelta(minutes=3), now=now)] == ["2", "3"]
+    assert [t.train_no for t in iter_window(snapshot, base + timedelta(minutes=4), now=now)] == ["4", "5"]
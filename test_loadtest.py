@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Tests for the load-test harness's synthetic upstream payloads.
+"""
+
+import pytest
+
+from railway_app_v2.fetchers.erail import ErailFetcher
+from railway_app_v2.loadtest import percentile, synthetic_erail_payload, synthetic_overpass_payload
+from railway_app_v2.tiles import CrossingTiles
+from railway_app_v2.trackgraph import TrackGraph
+
+
+class FakeResponse:
+    def __init__(self, body):
+        self.body = body
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.body
+
+
+def test_synthetic_erail_payload_parses():
+    trains = ErailFetcher()._parse_erail_response(synthetic_erail_payload("VN", n_trains=30), "VN", 24)
+    assert trains
+    assert all(t.train_no and t.eta_at_station for t in trains)
+
+
+def test_synthetic_overpass_payload_parses_through_tiles_and_track(monkeypatch, tmp_path):
+    monkeypatch.setattr("railway_app_v2.tiles.requests.post",
+                        lambda url, data, timeout: FakeResponse(synthetic_overpass_payload(data, 20)))
+    monkeypatch.setattr("railway_app_v2.tiles.budget.acquire", lambda *a, **kw: None)
+    tiles = CrossingTiles("http://overpass", size_deg=0.1, directory=str(tmp_path))
+    area = tiles.query((12.60, 78.54, 12.76, 78.70))
+    assert len(area["crossings"]) == 20
+    assert [s["name"] for s in area["stations"]] == ["Vaniyambadi"]
+
+    track = synthetic_overpass_payload('way["railway"="rail"](12.6,78.5,12.8,78.7);', 20)["elements"]
+    assert any(el["type"] == "way" for el in track)
+    distances = TrackGraph.from_overpass(track).distances_to(12.68, 78.62, area["crossings"])
+    assert sorted(distances) == sorted(c["id"] for c in area["crossings"])
+
+
+def test_percentile_interpolates_between_samples():
+    assert percentile([], 50) == 0.0
+    assert percentile([5.0], 99) == 5.0
+    assert percentile([1.0, 2.0, 3.0, 4.0], 50) == pytest.approx(2.5)
+    assert percentile([1.0, 2.0, 3.0, 4.0], 100) == 4.0
+    assert percentile([1.0, 2.0, 3.0, 4.0], 0) == 1.0
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Tests for the queue-based logging setup and hot-path controls.
+"""
+
+import time
+import queue
+import logging
+
+from railway_app_v2.logsetup import DeferredQueueHandler, HotPathFilter, StructuredFormatter
+
+
+def record(msg, *args, **extra):
+    rec = logging.LogRecord("app", logging.INFO, __file__, 1, msg, args, None)
+    rec.__dict__.update(extra)
+    return rec
+
+
+def test_throttle_is_keyed_by_template_and_reports_suppressed():
+    hot = HotPathFilter()
+    assert hot.filter(record("Skipping train %s", "1", throttle=0.05))
+    assert not hot.filter(record("Skipping train %s", "2", throttle=0.05))
+    assert not hot.filter(record("Skipping train %s", "3", throttle=0.05))
+    assert hot.filter(record("Other message %s", "1", throttle=0.05))
+
+    time.sleep(0.06)
+    let_through = record("Skipping train %s", "4", throttle=0.05)
+    assert hot.filter(let_through)
+    assert let_through.suppressed == 2
+
+
+def test_sampling_drops_most_records():
+    hot = HotPathFilter()
+    kept = sum(hot.filter(record("Cache hit", sample=0.1)) for _ in range(2000))
+    assert 100 < kept < 300
+    assert hot.filter(record("Unsampled"))
+
+
+def test_structured_fields_are_appended_without_control_extras():
+    line = StructuredFormatter("%(message)s").format(
+        record("Fetched %d trains", 4, station="VN", duration_ms=12, throttle=60))
+    assert line == "Fetched 4 trains station=VN duration_ms=12"
+
+
+def test_records_are_queued_unformatted():
+    log_queue = queue.SimpleQueue()
+    rec = record("Fetched %d trains", 4, station="VN")
+    DeferredQueueHandler(log_queue).handle(rec)
+    queued = log_queue.get_nowait()
+    assert queued is rec
+    assert queued.msg == "Fetched %d trains" and queued.args == (4,)
+    assert StructuredFormatter("%(message)s").format(queued) == "Fetched 4 trains station=VN"
+
+
+def test_mutable_arguments_are_formatted_before_queueing():
+    log_queue = queue.SimpleQueue()
+    trains = ["12658"]
+    rec = record("Trains %s", trains)
+    DeferredQueueHandler(log_queue).handle(rec)
+    trains.append("12640")
+    queued = log_queue.get_nowait()
+    assert queued is not rec and rec.args == (trains,)
+    assert queued.msg == "Trains ['12658']" and queued.args is None
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Tests for the generator-based ingestion pipeline.
+"""
+
+from datetime import datetime, timedelta
+
+import pytz
+
+from railway_app_v2.models import TrainETA
+from railway_app_v2.pipeline import dedupe, ingest
+
+IST = pytz.timezone('Asia/Kolkata')
+T0 = IST.localize(datetime(2025, 8, 26, 8, 0))
+
+
+def train(no, minutes, seconds=0):
+    eta = T0 + timedelta(minutes=minutes, seconds=seconds)
+    return TrainETA(train_no=no, name=no, eta_at_station=eta, eta_at_crossing=eta, source="test")
+
+
+def test_ingest_windows_sorts_and_merges_sources():
+    erail = [train("3", 30), train("1", 10), train("9", 500)]
+    rapid = [train("2", 20), train("0", -5)]
+    merged = ingest([erail, rapid], start=T0, end=T0 + timedelta(hours=2))
+    assert [t.train_no for t in merged] == ["1", "2", "3"]
+
+
+def test_dedupe_keeps_first_of_each_train_minute():
+    records = [train("1", 10), train("1", 10, 30), train("2", 10, 40), train("1", 11)]
+    assert [(t.train_no, t.eta_at_crossing.second) for t in dedupe(records)] == [("1", 0), ("2", 40), ("1", 0)]
+
+
+def test_next_n_stops_pulling_presorted_sources():
+    pulled = []
+
+    def station(no_prefix):
+        for m in range(100):
+            pulled.append(no_prefix)
+            yield train(f"{no_prefix}{m}", m)
+
+    first = list(ingest([station("A"), station("B")], start=T0, limit=3, presorted=True))
+    assert [t.train_no for t in first] == ["A0", "B0", "A1"]
+    assert len(pulled) < 10
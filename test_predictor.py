@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Tests for the online delay predictor.
+"""
+
+import random
+from datetime import datetime, timedelta
+
+import pytz
+
+from railway_app_v2.models import TrainETA
+from railway_app_v2.predictor import DelayPredictor, P2Quantile
+
+IST = pytz.timezone('Asia/Kolkata')
+T0 = IST.localize(datetime(2025, 8, 26, 8, 0))
+
+
+def train(no, eta, delay=None):
+    return TrainETA(train_no=no, name=no, eta_at_station=eta, eta_at_crossing=eta,
+                    source="test", delay_min=delay)
+
+
+def test_p2_quantile_tracks_sorted_sample():
+    rng = random.Random(1)
+    values = [rng.gauss(10, 3) for _ in range(5000)]
+    est = P2Quantile(0.9)
+    for v in values:
+        est.add(v)
+    exact = sorted(values)[int(0.9 * len(values))]
+    assert abs(est.value() - exact) < 0.3
+
+
+def test_reported_delays_shift_timetable_only_trains():
+    predictor = DelayPredictor(path="")
+    for day in range(5):
+        predictor.observe("12345", T0 + timedelta(days=day), 10)
+    adjusted = predictor.apply([train("12345", T0), train("99999", T0 + timedelta(minutes=5))])
+    by_no = {t.train_no: t for t in adjusted}
+    assert by_no["12345"].eta_at_crossing == T0 + timedelta(minutes=10)
+    assert by_no["12345"].predicted_delay_min == 10
+    assert by_no["12345"].eta_range[0] <= by_no["12345"].eta_at_crossing <= by_no["12345"].eta_range[1]
+    # Unknown train and unknown bucket: left as scheduled; output stays ETA-sorted
+    assert by_no["99999"].eta_range is None
+    assert [t.train_no for t in adjusted] == ["99999", "12345"]
+
+
+def test_eta_drift_between_refreshes_is_learned_once_per_change():
+    predictor = DelayPredictor(path="")
+    predictor.observe_trains("VN", [train("1", T0)])
+    predictor.observe_trains("JTJ", [train("1", T0 + timedelta(minutes=16))])  # Other station: no drift
+    predictor.observe_trains("VN", [train("1", T0 + timedelta(minutes=4))])
+    predictor.observe_trains("VN", [train("1", T0 + timedelta(minutes=4))])
+    assert predictor.trains["1"].count == 1
+    assert predictor.trains["1"].mean == 4
+
+
+def test_state_is_bounded_and_persisted(tmp_path):
+    path = str(tmp_path / "delays.json")
+    predictor = DelayPredictor(max_trains=2, path=path)
+    for no in ("1", "2", "3"):
+        for _ in range(3):
+            predictor.observe(no, T0, 7)
+    assert list(predictor.trains) == ["2", "3"]
+    predictor.save()
+
+    restored = DelayPredictor(max_trains=2, path=path)
+    assert restored.predict("3", T0) == predictor.predict("3", T0)
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Tests for publishing the pre-rendered static site.
+"""
+
+import json
+import os
+
+import app as railway_app
+from railway_app_v2.config import Config
+from railway_app_v2.fetchers.simulation import SimulationFetcher, TimetableGenerator
+from railway_app_v2.prerender import StaticSite
+
+
+def test_publish_swaps_builds_atomically_and_prunes(tmp_path):
+    site = StaticSite(str(tmp_path), keep=2)
+    for n in range(3):
+        site.publish({"index.html": f"v{n}".encode()}, headers={"/*": {"Cache-Control": "no-cache"}},
+                     rewrites=[("/api/trains", "/api/trains.json")])
+        with open(os.path.join(site.current, "index.html")) as f:
+            assert f.read() == f"v{n}"
+    assert len(site.builds()) == 2
+    assert os.path.islink(site.current)
+    with open(os.path.join(site.current, "_headers")) as f:
+        assert f.read() == "/*\n  Cache-Control: no-cache\n"
+    with open(os.path.join(site.current, "_redirects")) as f:
+        assert f.read() == "/api/trains /api/trains.json 200\n"
+
+
+def test_prerendered_site_has_every_page_with_static_links(monkeypatch, tmp_path):
+    monkeypatch.setattr(railway_app, "train_fetcher", SimulationFetcher(TimetableGenerator(n_trains=300, seed=5)))
+    monkeypatch.setattr(railway_app, "static_site", StaticSite(str(tmp_path)))
+    railway_app.TRAIN_CACHE.invalidate(Config.STATION_CODE)
+
+    snapshot, next_change = railway_app.prerender_site()
+    current = railway_app.static_site.current
+    with open(os.path.join(current, "api", "trains.json")) as f:
+        api = json.load(f)
+    pages = -(-api["total_trains"] // railway_app.PAGE_SIZE)
+    assert pages > 1
+    assert os.path.exists(os.path.join(current, "trains", "page", str(pages), "index.html"))
+    assert not os.path.exists(os.path.join(current, "trains", "page", str(pages + 1)))
+    with open(os.path.join(current, "trains", "index.html")) as f:
+        html = f.read()
+    assert 'href="/trains/page/2/"' in html and "?page=" not in html
+    assert os.path.exists(os.path.join(current, "crossings", "all", "index.html"))
+    with open(os.path.join(current, "_headers")) as f:
+        assert "s-maxage=" in f.read()
+
+    # Every rewrite lands on a file that was written, page 1 included
+    with open(os.path.join(current, "_redirects")) as f:
+        rules = f.read().splitlines()
+    assert rules.index("/trains page=1 /trains/index.html 200") < rules.index(
+        "/trains page=:page /trains/page/:page/index.html 200")
+    for rule in rules:
+        target = rule.split()[-2].lstrip("/")
+        if ":page" not in target:
+            assert os.path.exists(os.path.join(current, target))
+
+    # The same rules for Vercel
+    with open(os.path.join(current, "vercel.json")) as f:
+        vercel = json.load(f)
+    paged = next(r for r in vercel["rewrites"] if r["destination"] == "/trains/page/:page/index.html")
+    assert paged["has"] == [{"type": "query", "key": "page", "value": "(?<page>[^&]+)"}]
+    assert {"source": "/static/(.*)", "headers": [{"key": "Cache-Control", "value": railway_app.IMMUTABLE_CACHE_CONTROL}]} \
+        in vercel["headers"]
+    railway_app.TRAIN_CACHE.invalidate(Config.STATION_CODE)
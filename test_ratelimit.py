@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared per-host upstream request budget.
+"""
+
+import pytest
+
+from railway_app_v2.ratelimit import Priority, UpstreamBudget, UpstreamBudgetExceeded, upstream_priority
+
+URL = "https://erail.in/rail/getTrains.aspx"
+
+
+def make_budget(tmp_path, per_min=1, burst=3):
+    return UpstreamBudget(str(tmp_path / "budget.sqlite"), {"erail.in": (per_min, burst)},
+                          reserve=1.0, user_max_wait_secs=0)
+
+
+def test_lower_priorities_leave_headroom_for_users(tmp_path):
+    budget = make_budget(tmp_path)
+    budget.acquire(URL, Priority.PREFETCH)  # 3 -> 2 tokens
+    with pytest.raises(UpstreamBudgetExceeded):
+        budget.acquire(URL, Priority.PREFETCH)  # Needs 3
+    budget.acquire(URL, Priority.BACKGROUND)  # 2 -> 1
+    with pytest.raises(UpstreamBudgetExceeded):
+        budget.acquire(URL, Priority.BACKGROUND)
+    budget.acquire(URL, Priority.USER)  # 1 -> 0
+    with pytest.raises(UpstreamBudgetExceeded) as exc:
+        budget.acquire(URL, Priority.USER)
+    assert exc.value.retry_after > 0
+
+
+def test_budget_is_shared_through_the_state_file(tmp_path):
+    worker_a, worker_b = make_budget(tmp_path, burst=2), make_budget(tmp_path, burst=2)
+    worker_a.acquire(URL)
+    worker_b.acquire(URL)
+    with pytest.raises(UpstreamBudgetExceeded):
+        worker_a.acquire(URL)
+
+
+def test_priority_comes_from_context_and_unknown_hosts_are_unlimited(tmp_path):
+    budget = make_budget(tmp_path, burst=1)
+    with upstream_priority(Priority.BACKGROUND):
+        with pytest.raises(UpstreamBudgetExceeded):
+            budget.acquire(URL)
+    budget.acquire(URL)  # Back to USER outside the block
+    for _ in range(10):
+        budget.acquire("http://127.0.0.1:8001/rail/getTrains.aspx")
+
+
+def test_the_module_budget_is_isolated_per_test(isolated_upstream_budget, tmp_path):
+    assert isolated_upstream_budget.path == str(tmp_path / "budget.sqlite")
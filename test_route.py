@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Tests for route-aware ETA propagation to crossings.
+"""
+
+from datetime import datetime, timedelta
+
+import pytz
+
+from railway_app_v2.config import Config, Overrides
+from railway_app_v2.models import TrainETA
+from railway_app_v2.route import RouteETAEngine, SectionGeometry, direction
+
+IST = pytz.timezone('Asia/Kolkata')
+T0 = IST.localize(datetime(2025, 8, 26, 8, 0))
+
+# Two stations 20 km apart due north of each other
+GEOMETRY = SectionGeometry([("AB", 100.0, 12.0, 78.0), ("VN", 120.0, 12.0 + 20 / 111.32, 78.0)])
+MIDPOINT = {"id": 1, "lat": 12.0 + 10 / 111.32, "lon": 78.0}
+
+
+def train(no, eta, src="MAS", dst="SBC"):
+    return TrainETA(train_no=no, name=no, eta_at_station=eta, eta_at_crossing=eta,
+                    source="test", src_code=src, dst_code=dst)
+
+
+def test_direction_from_route_fields():
+    assert direction(train("1", T0, "MAS", "SBC")) == 1
+    assert direction(train("2", T0, "YPR", "HWH")) == -1
+    assert direction(train("3", T0, "XXX", "YYY")) is None
+
+
+def test_train_seen_at_both_stations_is_interpolated():
+    snapshots = {"AB": [train("1", T0)], "VN": [train("1", T0 + timedelta(minutes=30))]}
+    etas = RouteETAEngine(GEOMETRY).propagate(snapshots, [MIDPOINT])
+    assert [e for e, _ in etas[1]] == [T0 + timedelta(minutes=15)]
+
+
+def test_one_ended_train_uses_direction_of_travel():
+    engine = RouteETAEngine(GEOMETRY, speed_kmph=60)
+    # Seen only at AB, heading towards VN: reaches the midpoint 10 minutes after AB
+    leaving = engine.propagate({"AB": [train("1", T0)], "VN": []}, [MIDPOINT])
+    assert leaving[1][0][0] == T0 + timedelta(minutes=10)
+    # Heading away from VN: it passed the midpoint 10 minutes before reaching AB
+    arriving = engine.propagate({"AB": [train("2", T0, "SBC", "MAS")], "VN": []}, [MIDPOINT])
+    assert arriving[1][0][0] == T0 - timedelta(minutes=10)
+
+
+def test_one_ended_trains_use_their_stations_speed(monkeypatch):
+    monkeypatch.setattr(Config, "_overrides", Overrides({"stations": {"AB": {"AVG_SPEED_KMPH": 30},
+                                                                      "VN": {"AVG_SPEED_KMPH": 60}}}))
+    engine = RouteETAEngine(GEOMETRY)
+    assert engine.propagate({"AB": [train("1", T0)], "VN": []}, [MIDPOINT])[1][0][0] == T0 + timedelta(minutes=20)
+    assert engine.propagate({"AB": [], "VN": [train("1", T0)]}, [MIDPOINT])[1][0][0] == T0 - timedelta(minutes=10)
+
+
+def test_crossings_off_the_line_are_ignored():
+    far = {"id": 2, "lat": 12.1, "lon": 78.5}
+    assert 2 not in RouteETAEngine(GEOMETRY).propagate({"AB": [], "VN": []}, [far])
+
+
+def test_crossing_at_a_station_is_timed_once():
+    three = SectionGeometry([("AB", 100.0, 12.0, 78.0), ("VN", 120.0, 12.0 + 20 / 111.32, 78.0),
+                             ("JTJ", 140.0, 12.0 + 40 / 111.32, 78.0)])
+    at_vn = {"id": 3, "lat": 12.0 + 20 / 111.32, "lon": 78.0}
+    at_jtj = {"id": 4, "lat": 12.0 + 40 / 111.32, "lon": 78.0}
+    snapshots = {"AB": [train("1", T0)], "VN": [train("1", T0 + timedelta(minutes=30))],
+                 "JTJ": [train("1", T0 + timedelta(minutes=60))]}
+    etas = RouteETAEngine(three).propagate(snapshots, [at_vn, at_jtj])
+    assert [e for e, _ in etas[3]] == [T0 + timedelta(minutes=30)]
+    assert [e for e, _ in etas[4]] == [T0 + timedelta(minutes=60)]
+
+
+def test_loading_neighbours_does_not_mark_them_active(monkeypatch):
+    import app as railway_app
+    from railway_app_v2.fetchers.simulation import SimulationFetcher, TimetableGenerator
+
+    monkeypatch.setattr(railway_app, "train_fetcher", SimulationFetcher(TimetableGenerator(n_trains=50, seed=5)))
+    monkeypatch.setattr(railway_app.OverpassFetcher, "fetch_crossings", lambda self: {"crossings": []})
+    recorded = []
+    monkeypatch.setattr(railway_app, "record_user_activity", recorded.append)
+    neighbours = railway_app.route_geometry.neighbours("VN")
+    assert neighbours
+    railway_app.crossing_etas("VN")
+    assert recorded == ["VN"]
+    assert railway_app.recording_activity.get()
+    for code in ["VN", *neighbours]:
+        railway_app.TRAIN_CACHE.invalidate(code)
+    railway_app._CROSSING_ETAS.pop("VN", None)
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Tests for the deadline-driven refresh scheduler.
+"""
+
+import threading
+import time
+
+from railway_app_v2.scheduler import RefreshScheduler
+
+
+def test_keys_fire_in_deadline_order_and_reschedule_replaces():
+    fired = []
+    done = threading.Event()
+
+    def refresh(key):
+        fired.append(key)
+        if len(fired) == 2:
+            done.set()
+
+    scheduler = RefreshScheduler(refresh)
+    now = time.time()
+    scheduler.schedule("JTJ", now + 0.15)
+    scheduler.schedule("VN", now + 5)
+    scheduler.schedule("VN", now + 0.05)  # replaces the later deadline
+    scheduler.start()
+
+    assert done.wait(2)
+    time.sleep(0.1)
+    assert fired == ["VN", "JTJ"]
+    assert scheduler.pending() == {}
+
+
+def test_cancelled_key_does_not_fire():
+    fired = []
+    scheduler = RefreshScheduler(fired.append)
+    scheduler.schedule("VN", time.time() + 0.05)
+    scheduler.cancel("VN")
+    scheduler.start()
+    time.sleep(0.2)
+    assert fired == []
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Tests for the per-snapshot train number / name index.
+"""
+
+from datetime import datetime, timedelta
+
+import pytz
+
+from railway_app_v2.models import TrainETA
+from railway_app_v2.search import TrainIndex
+
+IST = pytz.timezone('Asia/Kolkata')
+T0 = IST.localize(datetime(2025, 8, 26, 8, 0))
+
+
+def train(no, name, minutes):
+    eta = T0 + timedelta(minutes=minutes)
+    return TrainETA(train_no=no, name=name, eta_at_station=eta, eta_at_crossing=eta, source="test")
+
+
+TRAINS = [
+    train("12658", "Bengaluru Mail", 5),
+    train("12640", "Brindavan Express", 10),
+    train("12658", "Bengaluru Mail", 1445),
+    train("22691", "Rajdhani Express", 20),
+]
+
+
+def test_lookup_by_number_returns_every_run():
+    index = TrainIndex.build(TRAINS)
+    assert [t.eta_at_crossing for t in index.lookup("12658")] == [T0 + timedelta(minutes=5),
+                                                                  T0 + timedelta(minutes=1445)]
+    assert index.lookup("99999") == []
+
+
+def test_search_matches_word_prefixes_and_number_prefixes():
+    index = TrainIndex.build(TRAINS)
+    assert index.search("expr") == ["12640", "22691"]
+    assert index.search("bri exp") == ["12640"]
+    assert index.search("BENGALURU-mail") == ["12658"]
+    assert index.search("126") == ["12658", "12640"]
+    assert index.search("nothing") == []
+
+
+def test_incremental_build_matches_full_build():
+    previous = TrainIndex.build(TRAINS)
+    # 12658's first run has passed, 12640 was renamed and 16525 is new
+    refreshed = [train("12640", "Brindavan Superfast", 10)] + TRAINS[2:] + [train("16525", "Island Express", 30)]
+    incremental = TrainIndex.build(refreshed, previous)
+    assert incremental.tokens == TrainIndex.build(refreshed).tokens
+    assert incremental.search("super") == ["12640"]
+
+
+def test_search_ranks_by_the_next_run_still_to_come():
+    index = TrainIndex.build(TRAINS)
+    now = T0 + timedelta(minutes=7)
+    # 12658's first run has passed; its next is tomorrow, after 12640
+    assert index.search("126", now=now) == ["12640", "12658"]
+    assert index.search("1", limit=1, now=now) == ["12640"]
+    # Trains with nothing left to come are dropped before the limit
+    assert index.search("126", limit=1, now=T0 + timedelta(minutes=12)) == ["12658"]
+    assert index.search("126", now=T0 + timedelta(days=2)) == []
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Tests for the synthetic timetable generator and the replay fetcher.
+"""
+
+import os
+from datetime import datetime
+
+import pytz
+
+from railway_app_v2.fetchers.erail import ErailFetcher
+from railway_app_v2.fetchers.replay import ReplayFetcher, VirtualClock
+from railway_app_v2.fetchers.simulation import DelayModel, TimetableGenerator
+
+IST = pytz.timezone('Asia/Kolkata')
+
+
+def test_generator_is_deterministic_and_sorted():
+    base = IST.localize(datetime(2025, 8, 26, 8, 0))
+    first = TimetableGenerator(n_trains=500, seed=7).upcoming("VN", base, 3)
+    second = TimetableGenerator(n_trains=500, seed=7).upcoming("VN", base, 3)
+
+    assert first and [t.train_no for t in first] == [t.train_no for t in second]
+    etas = [t.eta_at_crossing for t in first]
+    assert etas == sorted(etas)
+    assert all(base <= eta for eta in etas)
+
+
+def test_generated_payload_round_trips_through_erail_parser():
+    generator = TimetableGenerator(n_trains=300, delay_model=DelayModel(kind="none"), seed=3)
+    base = IST.localize(datetime(2025, 8, 26, 8, 0))
+    parsed = ErailFetcher()._parse_erail_response(generator.to_erail_payload("VN"), "VN", 4, base=base)
+    expected = generator.upcoming("VN", base, 4)
+
+    assert {t.train_no for t in parsed} == {t.train_no for t in expected}
+
+
+def test_replay_uses_virtual_clock(tmp_path):
+    generator = TimetableGenerator(n_trains=300, delay_model=DelayModel(kind="none"), seed=3)
+    with open(os.path.join(tmp_path, "VN-20250826T080000.txt"), "w", encoding="utf-8") as f:
+        f.write(generator.to_erail_payload("VN"))
+
+    start = IST.localize(datetime(2025, 8, 26, 8, 0))
+    fetcher = ReplayFetcher(str(tmp_path), clock=VirtualClock(start, speed=1.0), realtime=False)
+    trains = fetcher.fetch("VN", 2)
+
+    assert trains and all(t.source == "replay" for t in trains)
+    assert all(start <= t.eta_at_crossing.astimezone(IST) for t in trains)
+    assert fetcher.fetch("JTJ", 2) == []
+
+
+def test_departure_rolls_over_the_hour_and_midnight():
+    generator = TimetableGenerator(n_trains=500, delay_model=DelayModel(kind="none"), seed=3)
+    for record in generator.to_erail_payload("VN").split("^")[1:]:
+        fields = record.split("~")
+        arr_h, arr_m = map(int, fields[10].split("."))
+        dep_h, dep_m = map(int, fields[11].split("."))
+        assert (dep_h * 60 + dep_m - arr_h * 60 - arr_m) % (24 * 60) == 2
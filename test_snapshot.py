@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Tests for snapshot encodings and /api/trains content negotiation.
+"""
+
+import json
+from datetime import datetime, timedelta
+
+import pytest
+import pytz
+from werkzeug.datastructures import MIMEAccept
+
+import app as railway_app
+from railway_app_v2.config import Config
+from railway_app_v2.fetchers.simulation import SimulationFetcher, TimetableGenerator
+from railway_app_v2.models import TrainETA
+from railway_app_v2.snapshot import JSON, MSGPACK, TrainSnapshot, encode_envelope, negotiate
+
+IST = pytz.timezone('Asia/Kolkata')
+BASE = IST.localize(datetime(2025, 9, 17, 17, 0))
+
+
+def snapshot_of(n):
+    trains = [TrainETA(str(12600 + i), f"Train {i}", BASE + timedelta(minutes=i), BASE + timedelta(minutes=i), "test")
+              for i in range(n)]
+    return TrainSnapshot("VN", trains)
+
+
+def test_negotiate_prefers_msgpack_only_when_asked():
+    pytest.importorskip("msgpack")
+    assert negotiate(MIMEAccept([("application/msgpack", 1)])) == MSGPACK
+    assert negotiate(MIMEAccept([("application/x-msgpack", 1), ("application/json", 0.5)])) == MSGPACK
+    assert negotiate(MIMEAccept([("application/json", 1), ("application/msgpack", 0.5)])) == JSON
+    assert negotiate(MIMEAccept([("*/*", 1)])) == JSON
+
+
+def test_envelope_splices_into_valid_documents():
+    snapshot = snapshot_of(3)
+    envelope = {"success": True, "total_trains": 3}
+    doc = json.loads(encode_envelope(JSON, envelope, snapshot.encoded_trains(JSON, "iso")))
+    assert doc["success"] and [t["train_no"] for t in doc["trains"]] == ["12600", "12601", "12602"]
+    assert doc["trains"][0]["eta_at_crossing"] == BASE.isoformat()
+
+    msgpack = pytest.importorskip("msgpack")
+    doc = msgpack.unpackb(encode_envelope(MSGPACK, envelope, snapshot.encoded_trains(MSGPACK, "epoch", 1)))
+    assert doc["total_trains"] == 3 and len(doc["trains"]) == 2
+    assert doc["trains"][0]["eta"] == int((BASE + timedelta(minutes=1)).timestamp())
+
+
+def test_encodings_for_passed_starts_are_dropped():
+    snapshot = snapshot_of(5)
+    for start in range(5):
+        snapshot.encoded_trains(JSON, "iso", start)
+        snapshot.etag(JSON, "iso", start)
+    assert [k for k in snapshot._derived if k[0] in ("trains", "etag")] == \
+        [("trains", JSON, "iso", 4), ("etag", JSON, "iso", 4)]
+
+
+def test_upcoming_start_is_the_first_train_not_yet_passed():
+    snapshot = snapshot_of(5)
+    assert snapshot.upcoming_start(BASE - timedelta(minutes=1)) == 0
+    assert snapshot.upcoming_start(BASE + timedelta(minutes=2)) == 2  # Due now: still upcoming
+    assert snapshot.upcoming_start(BASE + timedelta(minutes=2, seconds=1)) == 3
+    assert snapshot.upcoming_start(BASE + timedelta(hours=1)) == 5
+
+
+def test_api_negotiates_format_and_schema(monkeypatch):
+    msgpack = pytest.importorskip("msgpack")
+    monkeypatch.setattr(railway_app, "train_fetcher", SimulationFetcher(TimetableGenerator(n_trains=50, seed=5)))
+    railway_app.TRAIN_CACHE.invalidate(Config.STATION_CODE)
+    with railway_app.app.test_client() as client:
+        packed = client.get('/api/trains', headers={"Accept": "application/msgpack"})
+        assert packed.mimetype == MSGPACK
+        doc = msgpack.unpackb(packed.data)
+        assert "eta" in doc["trains"][0] and "eta_at_crossing" not in doc["trains"][0]
+
+        iso = client.get('/api/trains?schema=iso', headers={"Accept": "application/msgpack"})
+        assert "eta_at_crossing" in msgpack.unpackb(iso.data)["trains"][0]
+
+        plain = client.get('/api/trains?schema=epoch').get_json()
+        assert plain["trains"] == doc["trains"]
+        assert client.get('/api/trains?schema=xml').status_code == 400
+    railway_app.TRAIN_CACHE.invalidate(Config.STATION_CODE)
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Tests for the crossings R-tree.
+"""
+
+import random
+
+import pytest
+
+from railway_app_v2.spatial import PointRTree, parse_bbox, radius_bbox, to_geojson
+from railway_app_v2.utils import haversine_km
+
+
+def point(c):
+    return c["lat"], c["lon"]
+
+
+def make_crossings(n, seed=1):
+    rng = random.Random(seed)
+    return [{"id": i, "lat": 12.5 + rng.random() * 0.4, "lon": 78.4 + rng.random() * 0.4} for i in range(n)]
+
+
+def test_bbox_search_matches_linear_scan():
+    crossings = make_crossings(5000)
+    tree = PointRTree(crossings, point)
+    for bbox in [(12.6, 78.5, 12.65, 78.58), (12.0, 78.0, 13.0, 79.0), (14.0, 80.0, 14.1, 80.1)]:
+        south, west, north, east = bbox
+        expected = {c["id"] for c in crossings if south <= c["lat"] <= north and west <= c["lon"] <= east}
+        assert {c["id"] for c in tree.search(*bbox)} == expected
+
+
+def test_nearby_is_sorted_and_within_radius():
+    crossings = make_crossings(2000)
+    tree = PointRTree(crossings, point)
+    hits = tree.nearby(12.7, 78.6, 1.5, point)
+    expected = {c["id"] for c in crossings if haversine_km(78.6, 12.7, c["lon"], c["lat"]) <= 1.5}
+
+    assert {c["id"] for _, c in hits} == expected
+    assert [d for d, _ in hits] == sorted(d for d, _ in hits)
+
+
+def test_empty_tree_and_helpers():
+    assert PointRTree([], point).search(0, 0, 1, 1) == []
+    assert parse_bbox("12.6,78.5,12.7,78.7") == (12.6, 78.5, 12.7, 78.7)
+    feature = to_geojson([{"id": 1, "lat": 12.6, "lon": 78.5, "label": "X"}])["features"][0]
+    assert feature["geometry"]["coordinates"] == [78.5, 12.6]
+
+
+def test_non_finite_or_malformed_bboxes_are_rejected():
+    for value in ("nan,78.5,12.7,78.7", "12.6,-inf,12.7,78.7", "12.6,78.5,12.7", "12.7,78.5,12.6,78.7"):
+        with pytest.raises(ValueError):
+            parse_bbox(value)
+    south, west, north, east = radius_bbox(12.65, 78.6, 1.0)
+    assert haversine_km(78.6, south, 78.6, north) == pytest.approx(2.0, rel=0.01)
+
+
+def test_api_answers_400_for_non_finite_queries():
+    import app as railway_app
+    with railway_app.app.test_client() as client:
+        assert client.get('/api/crossings?station=none&bbox=nan,78.5,12.7,78.7').status_code == 400
+        assert client.get('/api/crossings?station=none&near=12.6,inf').status_code == 400
+        assert client.get('/api/crossings?station=none&near=12.6,78.5&radius=nan').status_code == 400
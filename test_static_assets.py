@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+Tests for the fingerprinted static asset pipeline.
+"""
+
+from flask import url_for
+
+from app import app
+
+
+def test_static_urls_are_fingerprinted_and_immutable():
+    """Templates link hashed names which are served with immutable caching."""
+    with app.test_request_context():
+        url = url_for('static', filename='main.js')
+    assert url.startswith('/static/main.') and url != '/static/main.js'
+
+    with app.test_client() as client:
+        response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+        assert response.status_code == 200
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'immutable' in response.headers['Cache-Control']
+        assert response.headers['Vary'] == 'Accept-Encoding'
+
+        plain = client.get(url, headers={'Accept-Encoding': 'identity'})
+        assert 'Content-Encoding' not in plain.headers
+
+        revalidated = client.get(url, headers={'If-None-Match': plain.headers['ETag']})
+        assert revalidated.status_code == 304
+
+        # Unhashed names keep working through Flask's own static handler
+        assert client.get('/static/main.js').status_code == 200
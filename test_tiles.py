@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Tests for the tiled crossing cache.
+"""
+
+import re
+import threading
+import time
+
+import pytest
+
+from railway_app_v2.cache import KeyedTTLCache
+from railway_app_v2.tiles import CrossingTiles, TilesUnavailable, tile_keys
+
+NODES = [
+    {"type": "node", "id": 1, "lat": 12.65, "lon": 78.55, "tags": {"railway": "level_crossing"}},
+    {"type": "node", "id": 2, "lat": 12.75, "lon": 78.65, "tags": {"railway": "level_crossing", "name": "LC 12"}},
+    # Exactly on the corner shared by four tiles: matched by all four bboxes
+    {"type": "node", "id": 3, "lat": 12.7, "lon": 78.6, "tags": {"railway": "crossing"}},
+    {"type": "node", "id": 4, "lat": 12.68, "lon": 78.62, "tags": {"railway": "station", "name": "Vaniyambadi"}},
+    {"type": "node", "id": 5, "lat": 12.85, "lon": 78.75, "tags": {"railway": "level_crossing"}},
+]
+
+
+class FakeOverpass:
+    def __init__(self):
+        self.queries = []
+        self.fail = False
+
+    def post(self, url, data, timeout):
+        if self.fail:
+            raise OSError("overpass down")
+        self.queries.append(data)
+        bboxes = [tuple(map(float, b.split(","))) for b in re.findall(r"\(([-\d.,]+)\);", data)]
+        elements = [n for n in NODES
+                    if any(s <= n["lat"] <= nn and w <= n["lon"] <= e for s, w, nn, e in bboxes)]
+        return FakeResponse({"elements": elements})
+
+
+class FakeResponse:
+    def __init__(self, body):
+        self.body = body
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.body
+
+
+@pytest.fixture
+def overpass(monkeypatch):
+    fake = FakeOverpass()
+    monkeypatch.setattr("railway_app_v2.tiles.requests.post", fake.post)
+    monkeypatch.setattr("railway_app_v2.tiles.budget.acquire", lambda *a, **kw: None)
+    return fake
+
+
+def test_tile_keys_are_aligned_to_the_grid():
+    assert tile_keys((12.61, 78.51, 12.79, 78.69), 0.1) == [(126, 785), (126, 786), (127, 785), (127, 786)]
+
+
+def test_queries_fetch_only_missing_tiles_and_dedupe_edges(overpass, tmp_path):
+    tiles = CrossingTiles("http://overpass", size_deg=0.1, directory=str(tmp_path))
+    area = tiles.query((12.61, 78.51, 12.79, 78.69))
+    assert len(overpass.queries) == 1
+    assert sorted(c["id"] for c in area["crossings"]) == [1, 2, 3]
+    assert [s["name"] for s in area["stations"]] == ["Vaniyambadi"]
+
+    # Grow the area north-east: only the five new tiles are fetched
+    area = tiles.query((12.61, 78.51, 12.89, 78.79))
+    assert len(overpass.queries) == 2
+    assert overpass.queries[1].count("node[") == 5
+    assert sorted(c["id"] for c in area["crossings"]) == [1, 2, 3, 5]
+
+
+def test_tiles_are_reused_from_disk_and_served_stale_on_failure(overpass, tmp_path):
+    CrossingTiles("http://overpass", size_deg=0.1, directory=str(tmp_path)).query((12.61, 78.51, 12.69, 78.59))
+    assert len(overpass.queries) == 1
+
+    restarted = CrossingTiles("http://overpass", size_deg=0.1, directory=str(tmp_path))
+    assert [c["id"] for c in restarted.query((12.61, 78.51, 12.69, 78.59))["crossings"]] == [1]
+    assert len(overpass.queries) == 1
+
+    expired = CrossingTiles("http://overpass", size_deg=0.1, ttl_secs=0, directory=str(tmp_path))
+    overpass.fail = True
+    assert [c["id"] for c in expired.query((12.61, 78.51, 12.69, 78.59))["crossings"]] == [1]
+    with pytest.raises(TilesUnavailable):
+        expired.query((12.81, 78.71, 12.89, 78.79))
+
+
+def test_slow_fetch_only_blocks_requests_for_the_same_tiles(overpass, tmp_path, monkeypatch):
+    tiles = CrossingTiles("http://overpass", size_deg=0.1, directory=str(tmp_path))
+    started, release = threading.Event(), threading.Event()
+    fast = overpass.post
+
+    def post(url, data, timeout):
+        if "12.6," in data:  # The south-west tile hangs until released
+            started.set()
+            release.wait(5)
+        return fast(url, data, timeout)
+
+    monkeypatch.setattr("railway_app_v2.tiles.requests.post", post)
+    slow = threading.Thread(target=tiles.query, args=((12.61, 78.51, 12.69, 78.59),))
+    slow.start()
+    assert started.wait(5)
+    # A disjoint tile is fetched while the slow one is still in flight
+    assert [c["id"] for c in tiles.query((12.81, 78.71, 12.89, 78.79))["crossings"]] == [5]
+
+    waiter = threading.Thread(target=tiles.query, args=((12.61, 78.51, 12.69, 78.59),))
+    waiter.start()
+    release.set()
+    slow.join(5)
+    waiter.join(5)
+    # The second request for the slow tile waited for it instead of fetching again
+    assert sum("12.6," in q for q in overpass.queries) == 1
+
+
+def test_region_index_is_reused_until_a_tile_is_refetched(overpass, tmp_path, monkeypatch):
+    import app as railway_app
+
+    tiles = CrossingTiles("http://overpass", size_deg=0.1, directory=str(tmp_path))
+    monkeypatch.setattr(railway_app, "crossing_tiles", tiles)
+    monkeypatch.setattr(railway_app, "_REGION_INDEXES", KeyedTTLCache(8, float("inf")))
+    first = railway_app.region_index((12.61, 78.51, 12.69, 78.59))
+    # Another bbox over the same tile shares the index, which is filtered per query
+    assert railway_app.region_index((12.62, 78.52, 12.63, 78.53)) is first
+    assert [c["id"] for c in first.search(12.61, 78.51, 12.69, 78.59)] == [1]
+
+    tiles.cache.put((126, 785), tiles.cache.peek((126, 785)).value, timestamp=time.time() + 1)
+    assert railway_app.region_index((12.61, 78.51, 12.69, 78.59)) is not first
+    assert len(overpass.queries) == 1
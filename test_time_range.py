@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Tests for time-range queries over train snapshots.
+"""
+
+from datetime import datetime, timedelta
+
+import pytz
+
+import app as railway_app
+from railway_app_v2.config import Config
+from railway_app_v2.fetchers.simulation import SimulationFetcher, TimetableGenerator
+from railway_app_v2.models import TrainETA
+from railway_app_v2.snapshot import TrainSnapshot
+
+IST = pytz.timezone('Asia/Kolkata')
+BASE = IST.localize(datetime(2025, 9, 17, 17, 0))
+
+
+def snapshot_of(minutes_and_numbers):
+    trains = [TrainETA(no, f"Train {no}", BASE + timedelta(minutes=m), BASE + timedelta(minutes=m), "test")
+              for m, no in minutes_and_numbers]
+    return TrainSnapshot("VN", trains)
+
+
+def epoch(minutes):
+    return int((BASE + timedelta(minutes=minutes)).timestamp())
+
+
+def test_range_is_inclusive_and_pages_through_ties():
+    snapshot = snapshot_of([(0, "3"), (10, "2"), (10, "1"), (10, "4"), (30, "5"), (60, "6")])
+    trains, cursor = snapshot.time_range(epoch(10), epoch(30))
+    assert [t.train_no for t in trains] == ["1", "2", "4", "5"]
+    assert cursor is None
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = snapshot.time_range(epoch(0), None, cursor, limit=2)
+        seen += [t.train_no for t in page]
+        if cursor is None:
+            break
+    assert seen == ["3", "1", "2", "4", "5", "6"]
+
+
+def test_cursor_survives_a_refresh():
+    before = snapshot_of([(0, "1"), (5, "2"), (10, "3"), (15, "4")])
+    _, cursor = before.time_range(limit=2)
+    # Train 1 passed and train 9 was added before the next page was asked for
+    after = snapshot_of([(5, "2"), (7, "9"), (10, "3"), (15, "4")])
+    trains, _ = after.time_range(after=cursor)
+    assert [t.train_no for t in trains] == ["9", "3", "4"]
+
+
+def test_api_pages_a_window(monkeypatch):
+    monkeypatch.setattr(railway_app, "train_fetcher", SimulationFetcher(TimetableGenerator(n_trains=300, seed=5)))
+    railway_app.TRAIN_CACHE.invalidate(Config.STATION_CODE)
+    with railway_app.app.test_client() as client:
+        full = client.get('/api/trains?schema=epoch').get_json()["trains"]
+        window = full[5:25]
+        start, end = window[0]["eta"], window[-1]["eta"]
+        expected = [t["train_no"] for t in full if start <= t["eta"] <= end]
+
+        got, cursor = [], None
+        while True:
+            url = f'/api/trains?schema=epoch&from={start}&to={end}&limit=7'
+            data = client.get(url + (f'&cursor={cursor}' if cursor else '')).get_json()
+            assert data["count"] <= 7
+            got += [t["train_no"] for t in data["trains"]]
+            cursor = data["next_cursor"]
+            if cursor is None:
+                break
+        assert sorted(got) == sorted(expected)
+        assert client.get('/api/trains?cursor=bogus').status_code == 400
+        assert client.get('/api/trains?from=99999999999999999').status_code == 400
+    railway_app.TRAIN_CACHE.invalidate(Config.STATION_CODE)
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Tests for the railway track graph and along-track crossing distances.
+"""
+
+import pytest
+
+from railway_app_v2.trackgraph import SpeedProfile, TrackGraph
+from railway_app_v2.utils import haversine_km
+
+# A main line running east along lat 12.68 with a siding branching off at node 3,
+# and a disconnected spur further north
+NODES = {1: (12.68, 78.600), 2: (12.68, 78.610), 3: (12.68, 78.620), 4: (12.68, 78.630),
+         5: (12.68, 78.640), 6: (12.685, 78.625), 7: (12.70, 78.600), 8: (12.70, 78.610)}
+ELEMENTS = ([{"type": "node", "id": i, "lat": lat, "lon": lon} for i, (lat, lon) in NODES.items()] +
+            [{"type": "way", "id": 100, "nodes": [1, 2, 3, 4, 5]},
+             {"type": "way", "id": 101, "nodes": [3, 6]},
+             {"type": "way", "id": 102, "nodes": [7, 8]}])
+
+
+def km(a, b):
+    return haversine_km(NODES[a][1], NODES[a][0], NODES[b][1], NODES[b][0])
+
+
+def test_distances_follow_the_track_not_a_straight_line():
+    graph = TrackGraph.from_overpass(ELEMENTS)
+    assert len(graph) == 8
+    crossings = [{"id": 5, "lat": 12.68, "lon": 78.640},
+                 {"id": 6, "lat": 12.685, "lon": 78.625},
+                 {"id": 999, "lat": 12.6801, "lon": 78.6101},  # Not a graph node: snapped to 2
+                 {"id": 8, "lat": 12.70, "lon": 78.610}]       # Off the station's track
+    # Station just beside node 1
+    distances = graph.distances_to(12.6805, 78.600, crossings)
+
+    assert distances[5] == pytest.approx(km(1, 2) + km(2, 3) + km(3, 4) + km(4, 5))
+    assert distances[6] == pytest.approx(km(1, 2) + km(2, 3) + km(3, 6))
+    assert distances[6] > haversine_km(78.600, 12.68, 78.625, 12.685)
+    assert distances[999] == pytest.approx(km(1, 2))
+    assert 8 not in distances
+
+
+def test_station_far_from_any_track_measures_nothing():
+    graph = TrackGraph.from_overpass(ELEMENTS)
+    assert graph.distances_to(12.50, 78.40, [{"id": 5, "lat": 12.68, "lon": 78.640}]) == {}
+
+
+def test_speed_profile_integrates_over_bands():
+    profile = SpeedProfile(((1.0, 30), (3.0, 60), (None, 120)))
+    assert profile.minutes(0.5) == pytest.approx(1.0)
+    assert profile.minutes(2.0) == pytest.approx(2.0 + 1.0)
+    assert profile.minutes(5.0) == pytest.approx(2.0 + 2.0 + 1.0)